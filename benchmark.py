@@ -0,0 +1,246 @@
+#!/usr/bin/python -B
+#
+#  benchmark.py
+#  
+#  Copyright 2013 Spencer J. McIntyre <SMcIntyre [at] SecureState [dot] net>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+import json
+import logging
+import platform
+import sys
+import time
+import traceback
+from argparse import ArgumentParser
+
+__version__ = '0.1.0'
+
+BENCHMARKS = []
+
+def benchmark(name, iterations = 10000, batch = 100):
+	"""
+	Register a benchmark.  The decorated function is called once to set
+	up and must return the function to be timed.
+	
+	@type name: String
+	@param name: The name the results are reported under.
+	
+	@type iterations: Integer
+	@param iterations: The number of times to call the timed function.
+	
+	@type batch: Integer
+	@param batch: The number of calls to time together as one sample.
+	"""
+	def decorator(setup):
+		BENCHMARKS.append((name, setup, iterations, batch))
+		return setup
+	return decorator
+
+def percentile(samples, percent):
+	index = int(round((percent / 100.0) * (len(samples) - 1)))
+	return samples[index]
+
+def time_function(function, iterations, batch):
+	"""
+	Time a function and return a dictionary of the results, latencies are
+	in microseconds.
+	"""
+	samples = []
+	batch = max(min(batch, iterations), 1)
+	batches = max(iterations // batch, 1)
+	total = 0.0
+	for i in xrange(batches):
+		start = time.time()
+		for j in xrange(batch):
+			function()
+		elapsed = time.time() - start
+		total += elapsed
+		samples.append(elapsed / batch)
+	samples.sort()
+	ops = batches * batch
+	return {
+		'ops': ops,
+		'ops_per_sec': (ops / total) if total else 0.0,
+		'p50_usec': percentile(samples, 50) * 1000000,
+		'p99_usec': percentile(samples, 99) * 1000000,
+	}
+
+###############################################################################
+# c12.18 benchmarks
+###############################################################################
+TABLE_DATA = ''.join(chr(i & 0xff) for i in xrange(1024))
+
+@benchmark('c1218.utils.crc_str')
+def bench_crc_str():
+	from c1218.utils import crc_str
+	return lambda: crc_str(TABLE_DATA[:256])
+
+@benchmark('c1218.utils.data_chksum')
+def bench_data_chksum():
+	from c1218.utils import data_chksum
+	return lambda: data_chksum(TABLE_DATA)
+
+@benchmark('c1218.utils.find_strings', iterations = 2000, batch = 20)
+def bench_find_strings():
+	from c1218.utils import find_strings
+	data = ('METER-0001\x00\x01\x02' * 80)[:1024]
+	return lambda: find_strings(data)
+
+@benchmark('c1218.data.C1218Packet.do_build')
+def bench_c1218_packet_build():
+	from c1218.data import C1218Packet, C1218ReadRequest
+	packet = C1218Packet(C1218ReadRequest(23, 0, 256))
+	return packet.do_build
+
+@benchmark('c1218.data.C1218Packet.parse')
+def bench_c1218_packet_parse():
+	from c1218.data import C1218Packet, C1218WriteRequest
+	data = str(C1218Packet(C1218WriteRequest(23, TABLE_DATA[:256])))
+	return lambda: C1218Packet.parse(data)
+
+@benchmark('c1218.data.C1218WriteRequest.parse')
+def bench_c1218_write_parse():
+	from c1218.data import C1218WriteRequest
+	data = str(C1218WriteRequest(23, TABLE_DATA[:256], 16))
+	return lambda: C1218WriteRequest.parse(data)
+
+###############################################################################
+# c12.22 benchmarks
+###############################################################################
+@benchmark('c1222.data.C1222Packet.do_build', iterations = 2000, batch = 20)
+def bench_c1222_packet_build():
+	from c1222.data import C1222Packet, C1222UserInformation, C1222EPSEM, C1222ReadRequest
+	packet = C1222Packet('1.2.840.10066.1.2.3', '1.2.840.10066.4.5.6', 1234, data = C1222UserInformation(C1222EPSEM(C1222ReadRequest(23))))
+	return packet.do_build
+
+@benchmark('c1222.data.C1222Packet.parse', iterations = 2000, batch = 20)
+def bench_c1222_packet_parse():
+	from c1222.data import C1222Packet, C1222UserInformation, C1222EPSEM, C1222ReadRequest
+	data = str(C1222Packet('1.2.840.10066.1.2.3', '1.2.840.10066.4.5.6', 1234, data = C1222UserInformation(C1222EPSEM(C1222ReadRequest(23)))))
+	return lambda: C1222Packet.parse(data)
+
+###############################################################################
+# full cycle benchmarks against the emulator
+###############################################################################
+class EmulatorSession(object):
+	emulator = None
+	conn = None
+	
+	@classmethod
+	def get_connection(cls):
+		if cls.conn != None:
+			return cls.conn
+		from c1218.connection import Connection
+		from c1218.emulator import C1218Emulator
+		cls.emulator = C1218Emulator()
+		cls.emulator.tables[23] = TABLE_DATA
+		device = cls.emulator.start_pty()
+		cls.conn = Connection(device, c1218_settings = {'pktsize': 512, 'nbrpkts': 8}, enable_cache = False)
+		cls.conn.serial_h.timeout = 1
+		cls.conn.start()
+		cls.conn.login('0000', 0, '')
+		return cls.conn
+	
+	@classmethod
+	def close(cls):
+		if cls.conn == None:
+			return
+		cls.conn.close()
+		cls.emulator.stop()
+		cls.conn = None
+		cls.emulator = None
+
+@benchmark('c1218.connection.Connection.get_table_data', iterations = 200, batch = 1)
+def bench_cycle_read():
+	conn = EmulatorSession.get_connection()
+	return lambda: conn.get_table_data(23)
+
+@benchmark('c1218.connection.Connection.set_table_data', iterations = 200, batch = 1)
+def bench_cycle_write():
+	conn = EmulatorSession.get_connection()
+	return lambda: conn.set_table_data(24, TABLE_DATA[:256])
+
+@benchmark('c1218.connection.Connection.run_procedure', iterations = 200, batch = 1)
+def bench_cycle_procedure():
+	conn = EmulatorSession.get_connection()
+	return lambda: conn.run_procedure(6, False, '\x01')
+
+###############################################################################
+# reporting
+###############################################################################
+def compare_results(results, baseline):
+	print('')
+	fmt_string = "{0:<48} {1:>14} {2:>14} {3:>8}"
+	print(fmt_string.format('Benchmark', 'Baseline op/s', 'Current op/s', 'Change'))
+	print(fmt_string.format('---------', '-------------', '------------', '------'))
+	for name, result in sorted(results.items()):
+		if not name in baseline or not 'ops_per_sec' in result or not 'ops_per_sec' in baseline[name]:
+			continue
+		before = baseline[name]['ops_per_sec']
+		after = result['ops_per_sec']
+		change = ((after - before) / before) * 100 if before else 0.0
+		print(fmt_string.format(name, "{0:.1f}".format(before), "{0:.1f}".format(after), "{0:+.1f}%".format(change)))
+
+def main():
+	parser = ArgumentParser(description = 'Termineter: Protocol Stack Benchmarks', conflict_handler='resolve')
+	parser.add_argument('-v', '--version', action = 'version', version = parser.prog + ' Version: ' + __version__)
+	parser.add_argument('-o', '--output', dest = 'output', action = 'store', default = None, help = 'write the results to a json file')
+	parser.add_argument('-c', '--compare', dest = 'compare', action = 'store', default = None, help = 'compare the results to a previous json file')
+	parser.add_argument('-f', '--filter', dest = 'filter', action = 'store', default = '', help = 'only run benchmarks containing this string')
+	parser.add_argument('-s', '--scale', dest = 'scale', action = 'store', type = float, default = 1.0, help = 'scale the number of iterations')
+	arguments = parser.parse_args()
+	logging.getLogger('').addHandler(logging.NullHandler())
+	
+	results = {}
+	fmt_string = "{0:<48} {1:>14} {2:>12} {3:>12}"
+	print(fmt_string.format('Benchmark', 'op/s', 'p50 (usec)', 'p99 (usec)'))
+	print(fmt_string.format('---------', '----', '----------', '----------'))
+	for name, setup, iterations, batch in BENCHMARKS:
+		if not arguments.filter in name:
+			continue
+		try:
+			function = setup()
+			result = time_function(function, max(int(iterations * arguments.scale), 1), batch)
+		except Exception as error:
+			results[name] = {'error': error.__class__.__name__ + ': ' + str(error)}
+			print(fmt_string.format(name, 'error', '', '') + ' ' + results[name]['error'])
+			logging.getLogger('').debug(traceback.format_exc())
+			continue
+		results[name] = result
+		print(fmt_string.format(name, "{0:.1f}".format(result['ops_per_sec']), "{0:.1f}".format(result['p50_usec']), "{0:.1f}".format(result['p99_usec'])))
+	EmulatorSession.close()
+	
+	if arguments.output:
+		report = {
+			'version': __version__,
+			'python': platform.python_version(),
+			'platform': platform.platform(),
+			'time': int(time.time()),
+			'results': results
+		}
+		output_h = open(arguments.output, 'w')
+		json.dump(report, output_h, indent = 2, sort_keys = True)
+		output_h.close()
+	if arguments.compare:
+		compare_h = open(arguments.compare, 'r')
+		baseline = json.load(compare_h)['results']
+		compare_h.close()
+		compare_results(results, baseline)
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
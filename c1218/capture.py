@@ -0,0 +1,161 @@
+#  c1218/capture.py
+#  
+#  Copyright 2013 Spencer J. McIntyre <SMcIntyre [at] SecureState [dot] net>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+import logging
+from c1218.trace import HexData, TraceReader, TraceWriter, DIRECTION_SENT, DIRECTION_RECEIVED
+
+REPLAY_SCHEME = 'replay://'
+
+class CaptureSerial(object):
+	"""
+	Wrap a PySerial instance and record the raw bytes written to and read
+	from it, in both directions, to a binary trace file.  All other
+	attributes are passed through to the wrapped instance.
+	"""
+	def __init__(self, serial_h, capture_file):
+		"""
+		@type serial_h: serial.Serial
+		@param serial_h: The serial instance to wrap.
+		
+		@type capture_file: String
+		@param capture_file: The path of the file to write the capture to.
+		"""
+		object.__setattr__(self, 'serial_h', serial_h)
+		object.__setattr__(self, 'trace', TraceWriter(capture_file))
+		object.__setattr__(self, 'logger', logging.getLogger('c1218.capture'))
+		self.logger.info('capturing the serial session to: ' + capture_file)
+	
+	def __getattr__(self, name):
+		return getattr(self.serial_h, name)
+	
+	def __setattr__(self, name, value):
+		setattr(self.serial_h, name, value)
+	
+	def write(self, data):
+		self.trace.write(DIRECTION_SENT, data)
+		return self.serial_h.write(data)
+	
+	def read(self, size = 1):
+		data = self.serial_h.read(size)
+		if data:
+			self.trace.write(DIRECTION_RECEIVED, data)
+		return data
+	
+	def close(self):
+		self.trace.close()
+		self.logger.info('captured ' + str(self.trace.records) + ' records')
+		return self.serial_h.close()
+
+class ReplaySerial(object):
+	"""
+	A stand in for a PySerial instance which plays back the data received
+	in a capture created by CaptureSerial.  Data is only made available to
+	read once everything that was sent before it in the capture has been
+	written, reads that can not be satisfied return short as if they had
+	timed out.
+	"""
+	def __init__(self, capture_file, strict = False):
+		"""
+		@type capture_file: String
+		@param capture_file: The path of the capture file to replay.
+		
+		@type strict: Boolean
+		@param strict: Raise an IOError when data is written that differs
+		from the capture instead of just logging it.
+		"""
+		self.logger = logging.getLogger('c1218.capture')
+		reader = TraceReader(capture_file)
+		self.records = [(direction, data) for timestamp, direction, data in reader]
+		reader.close()
+		self.logger.info('replaying ' + str(len(self.records)) + ' records from: ' + capture_file)
+		self.strict = strict
+		self.mismatches = 0
+		self.position = 0
+		self.offset = 0
+		self.timeout = None
+		self.port = REPLAY_SCHEME + capture_file
+		self.is_open = True
+	
+	def __remaining__(self, direction):
+		while self.position < len(self.records):
+			record_direction, data = self.records[self.position]
+			if self.offset < len(data):
+				if record_direction == direction:
+					return data[self.offset:]
+				return None
+			self.position += 1
+			self.offset = 0
+		return None
+	
+	def write(self, data):
+		expected = ''
+		while len(expected) < len(data):
+			pending = self.__remaining__(DIRECTION_SENT)
+			if pending == None:
+				if self.__remaining__(DIRECTION_RECEIVED) == None:
+					break
+				self.logger.debug('discarding unread replay data: %s', HexData(self.records[self.position][1][self.offset:]))
+				self.position += 1
+				self.offset = 0
+				continue
+			pending = pending[:len(data) - len(expected)]
+			expected += pending
+			self.offset += len(pending)
+		if expected != data:
+			self.mismatches += 1
+			self.logger.warning('written data differs from the capture, expected: %s received: %s', HexData(expected), HexData(data))
+			if self.strict:
+				raise IOError('written data differs from the capture')
+		return len(data)
+	
+	def read(self, size = 1):
+		data = ''
+		while len(data) < size:
+			pending = self.__remaining__(DIRECTION_RECEIVED)
+			if pending == None:
+				break
+			pending = pending[:size - len(data)]
+			data += pending
+			self.offset += len(pending)
+		return data
+	
+	def inWaiting(self):
+		pending = self.__remaining__(DIRECTION_RECEIVED)
+		return len(pending or '')
+	
+	def flushInput(self):
+		while self.__remaining__(DIRECTION_RECEIVED) != None:
+			self.position += 1
+			self.offset = 0
+	
+	def flushOutput(self):
+		pass
+	
+	def setRTS(self, level = True):
+		pass
+	
+	def setDTR(self, level = True):
+		pass
+	
+	def close(self):
+		self.is_open = False
+	
+	@property
+	def finished(self):
+		return self.__remaining__(DIRECTION_SENT) == None and self.__remaining__(DIRECTION_RECEIVED) == None
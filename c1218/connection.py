@@ -17,14 +17,17 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #  MA 02110-1301, USA.
 
-from binascii import hexlify, unhexlify
+from binascii import unhexlify
 from struct import pack, unpack
 from random import randint
-from time import sleep
+from time import sleep, time
 import logging
 import serial
 from c1218.data import *
 from c1218.utils import find_strings, data_chksum_str
+from c1218.capture import CaptureSerial, ReplaySerial, REPLAY_SCHEME
+from c1218.metrics import ConnectionMetrics
+from c1218.trace import HexData
 from c1218.errors import C1218NegotiateError, C1218IOError, C1218ReadTableError, C1218WriteTableError
 from c1219.data import C1219ProcedureInit
 from c1219.errors import C1219ProcedureError
@@ -33,7 +36,7 @@ if hasattr(logging, 'NullHandler'):
 	logging.getLogger('c1218').addHandler(logging.NullHandler())
 
 class ConnectionRaw:
-	def __init__(self, device, c1218_settings = {}, serial_settings = None, toggle_control = True, **kwargs):
+	def __init__(self, device, c1218_settings = {}, serial_settings = None, toggle_control = True, capture_file = None, **kwargs):
 		"""
 		This is a C12.18 driver for serial connections.  It relies on PySerial
 		to communicate with an ANSI Type-2 Optical probe to communciate
@@ -56,17 +59,26 @@ class ConnectionRaw:
 		@type toggle_control: Boolean
 		@param toggle_control: Enables or diables automatically settings
 		the toggle bit in C12.18 frames.
+		
+		@type capture_file: String
+		@param capture_file: Record the raw bytes sent and received to this
+		file so the session can be replayed later by using a device of
+		replay://<capture_file>.
 		"""
 		self.logger = logging.getLogger('c1218.connection')
 		self.loggerio = logging.getLogger('c1218.connection.io')
 		self.toggle_control = toggle_control
 		self.__toggle_bit__ = False
-		if hasattr(serial, 'serial_for_url'):
+		if device.startswith(REPLAY_SCHEME):
+			self.serial_h = ReplaySerial(device[len(REPLAY_SCHEME):])
+		elif hasattr(serial, 'serial_for_url'):
 			self.serial_h = serial.serial_for_url(device)
 		else:
 			self.logger.warning('serial library does not have serial_for_url functionality, it\'s not the latest version')
 			self.serial_h = serial.Serial(device)
 		self.logger.debug('successfully opened serial device: ' + device)
+		if capture_file:
+			self.serial_h = CaptureSerial(self.serial_h, capture_file)
 		self.device = device
 		
 		self.c1218_pktsize = (c1218_settings.get('pktsize') or 512)
@@ -99,10 +111,22 @@ class ConnectionRaw:
 		self.logged_in = False
 		self.__initialized__ = False
 		self.c1219_endian = '<'
+		self.metrics = ConnectionMetrics()
+		self.__last_service__ = None
+		self.__last_send_time__ = None
 	
 	def __repr__(self):
 		return '<' + self.__class__.__name__ + ' Device: ' + self.device + ' >'
 	
+	def __service_name__(self, packet):
+		data = packet.data
+		if isinstance(data, C1218Request) and not isinstance(data, C1218Packet):
+			return data.name
+		data = str(data)
+		if data and ord(data[0]) in C1218_REQUEST_IDS:
+			return C1218_REQUEST_IDS[ord(data[0])].__name__[5:-7]
+		return 'Unknown'
+	
 	def send(self, data):
 		"""
 		This sends a raw C12.18 frame and waits checks for an ACK response.
@@ -126,12 +150,20 @@ class ConnectionRaw:
 				self.__toggle_bit__ = True
 		elif self.toggle_control and not isinstance(data, C1218Packet):
 			self.loggerio.warning('toggle bit is on but the data is not a C1218Packet instance')
+		service = self.__service_name__(data)
+		metrics = self.metrics.get(service)
+		metrics.count += 1
 		data = str(data)
-		self.loggerio.debug("sending frame,  length: {0:<3} data: {1}".format(len(data), hexlify(data)))
+		self.loggerio.debug('sending frame,  length: %-3d data: %s', len(data), HexData(data))
 		for pktcount in xrange(0, 3):
+			if pktcount:
+				metrics.retries += 1
+			metrics.bytes_out += len(data)
+			sent_time = time()
 			self.write(data)
 			response = self.serial_h.read(1)
 			if response == NACK:
+				metrics.nacks += 1
 				self.loggerio.warning('received a NACK after writing data')
 				sleep(0.10)
 			elif response == '':
@@ -140,7 +172,12 @@ class ConnectionRaw:
 			elif response != ACK:
 				self.loggerio.error('received unknown response: ' + hex(ord(response)) + ' after writing data')
 			else:
+				metrics.ack_latency.record(time() - sent_time)
+				self.__last_service__ = service
+				self.__last_send_time__ = sent_time
 				return
+		metrics.failures += 1
+		self.__last_service__ = None
 		self.loggerio.critical('failed 3 times to correctly send a frame')
 		raise C1218IOError('failed 3 times to correctly send a frame')
 	
@@ -154,11 +191,12 @@ class ConnectionRaw:
 		"""
 		payloadbuffer = ''
 		tries = 3
+		metrics = self.metrics.get(self.__last_service__ or 'Unknown')
 		while tries:
 			tmpbuffer = self.serial_h.read(1)
 			if tmpbuffer != '\xee':
 				self.loggerio.error('did not receive \\xee as the first byte of the frame')
-				self.loggerio.debug('received \\x' + tmpbuffer.encode('hex') + ' instead')
+				self.loggerio.debug('received \\x%s instead', HexData(tmpbuffer))
 				tries -= 1
 				continue
 			tmpbuffer += self.serial_h.read(3)
@@ -169,12 +207,16 @@ class ConnectionRaw:
 			payload = self.serial_h.read(length)
 			tmpbuffer += payload
 			chksum = self.serial_h.read(2)
+			metrics.bytes_in += len(tmpbuffer) + len(chksum)
 			if chksum == crc_str(tmpbuffer):
 				self.serial_h.write(ACK)
 				data = tmpbuffer + chksum
-				self.loggerio.debug("received frame, length: {0:<3} data: {1}".format(len(data), hexlify(data)))
+				self.loggerio.debug('received frame, length: %-3d data: %s', len(data), HexData(data))
 				payloadbuffer += payload
 				if sequence == 0:
+					if self.__last_send_time__ != None:
+						metrics.response_latency.record(time() - self.__last_send_time__)
+						self.__last_send_time__ = None
 					if full_frame:
 						return data
 					return payloadbuffer
@@ -182,8 +224,10 @@ class ConnectionRaw:
 					tries = 3
 			else:
 				self.serial_h.write(NACK)
+				metrics.crc_failures += 1
 				self.loggerio.warning('crc does not match on received frame')
 				tries -= 1
+		metrics.failures += 1
 		self.loggerio.critical('failed 3 times to correctly receive a frame')
 		raise C1218IOError('failed 3 times to correctly receive a frame')
 	
@@ -207,7 +251,7 @@ class ConnectionRaw:
 		@param size: The number of bytes to read from the serial connection.
 		"""
 		data = self.serial_h.read(size)
-		self.logger.debug('read data, length: ' + str(len(data)) + ' data: ' + hexlify(data))
+		self.logger.debug('read data, length: %d data: %s', len(data), HexData(data))
 		self.serial_h.write(ACK)
 		return data
 		
@@ -352,6 +396,26 @@ class Connection(ConnectionRaw):
 			return True
 		return False
 	
+	def send_password(self, password, userid = 0):
+		"""
+		Send a security request without a logon request, the response code
+		from the device is returned and 0 indicates that the password was
+		accepted.  C12.18 security requests do not include the userid.
+		
+		@type password: String (len(password) <= 20)
+		@param password: password to send
+		
+		@type userid: Integer (0x0000 <= userid <= 0xffff)
+		@param userid: the userid to send the password for
+		"""
+		self.send(C1218SecurityRequest(password))
+		data = self.recv()
+		if not data:
+			return None
+		if data[0] == '\x00':
+			self.logged_in = True
+		return ord(data[0])
+	
 	def get_table_data(self, tableid, octetcount = None, offset = None):
 		"""
 		Read data from a table. If successful, all of the data from the 
@@ -398,6 +462,25 @@ class Connection(ConnectionRaw):
 			self.__tbl_cache__[tableid] = data
 		return data
 
+	def get_table_data_raw(self, tableid, octetcount = None, offset = None):
+		"""
+		Send a read request and return the response as it was received, the
+		first byte is the response code from the device.  Unlike
+		get_table_data, no error is raised if the request is rejected and
+		the table cache is not used.
+		
+		@type tableid: Integer (0x0000 <= tableid <= 0xffff)
+		@param tableid: The table number to read from
+		
+		@type octetcount: Integer (0x0000 <= tableid <= 0xffff)
+		@param octetcount: Limit the amount of data read.
+		
+		@type offset: Integer (0x000000 <= octetcount <= 0xffffff)
+		@param offset: The offset at which to start to read the data from.
+		"""
+		self.send(C1218ReadRequest(tableid, offset, octetcount))
+		return self.recv()
+
 	def set_table_data(self, tableid, data, offset = None):
 		"""
 		Write data to a table.
@@ -439,11 +522,16 @@ class Connection(ConnectionRaw):
 		seqnum = randint(2, 254)
 		self.logger.info('starting procedure: ' + str(process_number) + ' (' + hex(process_number) + ') sequence number: ' + str(seqnum) + ' (' + hex(seqnum) + ')')
 		procedure_request = str(C1219ProcedureInit(self.c1219_endian, process_number, std_vs_mfg, 0, seqnum, params))
+		metrics = self.metrics.get('Procedure')
+		metrics.count += 1
+		start_time = time()
 		self.set_table_data(7, procedure_request)
 		
 		response = self.get_table_data(8)
+		metrics.response_latency.record(time() - start_time)
 		if response[:3] == procedure_request[:3]:
 			return ord(response[3]), response[4:]
 		else:
+			metrics.failures += 1
 			self.logger.error('invalid response from procedure response table (table #8)')
 			raise C1219ProcedureError('invalid response from procedure response table (table #8)')
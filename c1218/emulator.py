@@ -0,0 +1,443 @@
+#  c1218/emulator.py
+#  
+#  Copyright 2013 Spencer J. McIntyre <SMcIntyre [at] SecureState [dot] net>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+#  This library provides a software C12.18 device which answers requests
+#  from a c1218.connection.Connection instance using tables loaded from a
+#  CSV file created by the dump_tables module.  It can be reached through a
+#  pseudo terminal or through PySerial's socket:// URL handler and is meant
+#  for testing and benchmarking without an optical probe and meter.
+
+from binascii import unhexlify
+from struct import pack, unpack
+from select import select
+from time import sleep
+import logging
+import os
+import random
+import socket
+import threading
+import tty
+from c1218.data import *
+from c1218.utils import crc_str, data_chksum_str
+from c1219.constants import GEN_CONFIG_TBL, PROC_INITIATE_TBL, PROC_RESPONSE_TBL
+
+if hasattr(logging, 'NullHandler'):
+	logging.getLogger('c1218').addHandler(logging.NullHandler())
+
+def default_tables():
+	"""
+	Return a minimal set of tables which is enough for the framework to
+	connect to the emulator.
+	"""
+	tables = {}
+	# GEN_CONFIG_TBL, little-endian, ISO 646 characters, 16 byte serial
+	# numbers, tables 0 and 1 used
+	tables[0] = '\x02\x02\x00' + 'EMUL' + '\x02\x00\xff\xff\x01\x00\x01\x00\x00\x00\x00\x00' + '\x03'
+	# GENERAL_MFG_ID_TBL
+	tables[1] = 'EMUL' + 'EMULATOR' + '\x01\x00\x01\x00' + '0000000000000001'
+	return tables
+
+def load_tables(csv_file):
+	"""
+	Load tables from a CSV file created by the dump_tables module and
+	return them in a dictionary keyed by table id.
+	
+	@type csv_file: String
+	@param csv_file: The path to the CSV file to load.
+	"""
+	tables = {}
+	csv_file_h = open(csv_file, 'r')
+	for line in csv_file_h:
+		line = line.strip().split(',')
+		if len(line) < 4:
+			continue
+		tables[int(line[0])] = unhexlify(line[-1])
+	csv_file_h.close()
+	return tables
+
+class EmulatorTransport(object):
+	"""
+	The base class for the byte streams that the emulator is served over.
+	"""
+	def read_ready(self, timeout):
+		readys = select([self.fileno()], [], [], timeout)
+		return len(readys[0]) == 1
+	
+	def read(self, size, timeout = None):
+		"""
+		Read up to size bytes, less data is returned if the timeout
+		expires.  An EOFError is raised if the other end is closed.
+		"""
+		data = ''
+		while len(data) < size:
+			if not self.read_ready(timeout):
+				break
+			chunk = self.recv(size - len(data))
+			if not chunk:
+				raise EOFError('the transport has been closed')
+			data += chunk
+		return data
+
+class FileDescriptorTransport(EmulatorTransport):
+	def __init__(self, fd):
+		self.fd = fd
+	
+	def fileno(self):
+		return self.fd
+	
+	def recv(self, size):
+		try:
+			return os.read(self.fd, size)
+		except OSError:
+			return ''
+	
+	def write(self, data):
+		while data:
+			data = data[os.write(self.fd, data):]
+	
+	def close(self):
+		os.close(self.fd)
+
+class SocketTransport(EmulatorTransport):
+	def __init__(self, sock_h):
+		self.sock_h = sock_h
+	
+	def fileno(self):
+		return self.sock_h.fileno()
+	
+	def recv(self, size):
+		return self.sock_h.recv(size)
+	
+	def write(self, data):
+		self.sock_h.sendall(data)
+	
+	def close(self):
+		self.sock_h.close()
+
+class C1218Emulator(object):
+	def __init__(self, tables = None, password = None, latency = 0.0, nack_rate = 0.0, crc_error_rate = 0.0, baudrate = None, timeout = 1.0, seed = None):
+		"""
+		This is a software C12.18 device, it answers the requests defined
+		in c1218.data using the tables that it has been loaded with.
+		
+		@type tables: Dictionary or String
+		@param tables: The tables to serve keyed by table id or the path to
+		a CSV file created by the dump_tables module.  If None, a minimal
+		set of tables is used.
+		
+		@type password: String or None
+		@param password: The password that security requests must present
+		before tables can be written to, if None all passwords are accepted.
+		
+		@type latency: Float
+		@param latency: The time in seconds to wait before each response.
+		
+		@type nack_rate: Float (0.0 <= nack_rate <= 1.0)
+		@param nack_rate: The probability that a valid frame is answered
+		with a NACK.
+		
+		@type crc_error_rate: Float (0.0 <= crc_error_rate <= 1.0)
+		@param crc_error_rate: The probability that a response frame is
+		sent with an invalid CRC.
+		
+		@type baudrate: Integer or None
+		@param baudrate: If set, delays are added to emulate the time frames
+		take to be transmitted at this baud rate.
+		
+		@type timeout: Float
+		@param timeout: The time in seconds to wait for the remainder of a
+		frame or for an acknowledgement.
+		
+		@type seed: Integer or None
+		@param seed: A seed for the error injection so runs can be repeated.
+		"""
+		self.logger = logging.getLogger('c1218.emulator')
+		if tables == None:
+			tables = default_tables()
+		elif isinstance(tables, str):
+			tables = load_tables(tables)
+		self.tables = tables
+		self.password = password
+		self.latency = latency
+		self.nack_rate = nack_rate
+		self.crc_error_rate = crc_error_rate
+		self.baudrate = baudrate
+		self.timeout = timeout
+		self.random = random.Random(seed)
+		self.c1219_endian = '<'
+		if GEN_CONFIG_TBL in self.tables and (ord(self.tables[GEN_CONFIG_TBL][0]) & 1):
+			self.c1219_endian = '>'
+		
+		self.pktsize = 64
+		self.nbrpkts = 1
+		self.identified = False
+		self.authenticated = False
+		self.__toggle_bit__ = False
+		self.__running__ = False
+		self.__threads__ = []
+		self.__server_sock_h__ = None
+		self.__pty_fds__ = []
+		self.__lock__ = threading.Lock()
+	
+	def __repr__(self):
+		return '<' + self.__class__.__name__ + ' Tables: ' + str(len(self.tables)) + ' >'
+	
+	def reset(self):
+		"""
+		Reset the session state, this is done after a terminate request.
+		"""
+		self.pktsize = 64
+		self.nbrpkts = 1
+		self.identified = False
+		self.authenticated = False
+	
+	def emulate_transmission(self, size):
+		if self.baudrate:
+			sleep((size * 10.0) / self.baudrate)
+	
+	def handle_request(self, data):
+		"""
+		Process the payload of a request frame and return the payload of
+		the response frame.
+		
+		@type data: String
+		@param data: The payload of the request frame.
+		"""
+		request_id = ord(data[0])
+		if not request_id in C1218_REQUEST_IDS:
+			return chr(C1218_RESPONSE_CODES['sns'])
+		try:
+			request = C1218_REQUEST_IDS[request_id].parse(data)
+		except Exception as error:
+			self.logger.warning('failed to parse request: ' + str(error))
+			return chr(C1218_RESPONSE_CODES['err'])
+		
+		if isinstance(request, C1218IdentRequest):
+			self.reset()
+			self.identified = True
+			# ok, standard (C12.18), version 1, revision 0, end of feature list
+			return '\x00\x00\x01\x00\x00'
+		if isinstance(request, C1218TerminateRequest):
+			self.reset()
+			return '\x00'
+		if not self.identified:
+			return chr(C1218_RESPONSE_CODES['isss'])
+		if isinstance(request, C1218NegotiateRequest):
+			self.pktsize = min(unpack('>H', data[1:3])[0], 8191)
+			self.nbrpkts = ord(data[3])
+			return '\x00' + pack('>H', self.pktsize) + chr(self.nbrpkts) + data[4:5]
+		if isinstance(request, C1218WaitRequest):
+			return '\x00'
+		if isinstance(request, C1218LogonRequest):
+			return '\x00'
+		if isinstance(request, C1218SecurityRequest):
+			if self.password != None and request.password.rstrip(' ') != self.password.rstrip(' '):
+				return chr(C1218_RESPONSE_CODES['err'])
+			self.authenticated = True
+			return '\x00'
+		if isinstance(request, C1218LogoffRequest):
+			self.authenticated = False
+			return '\x00'
+		if isinstance(request, C1218ReadRequest):
+			return self.handle_read(request)
+		if isinstance(request, C1218WriteRequest):
+			return self.handle_write(request)
+		return chr(C1218_RESPONSE_CODES['sns'])
+	
+	def handle_read(self, request):
+		if not request.tableid in self.tables:
+			return chr(C1218_RESPONSE_CODES['onp'])
+		data = self.tables[request.tableid]
+		if request.offset != None:
+			data = data[request.offset:request.offset + request.octetcount]
+		return '\x00' + pack('>H', len(data)) + data + data_chksum_str(data)
+	
+	def handle_write(self, request):
+		if self.password != None and not self.authenticated:
+			return chr(C1218_RESPONSE_CODES['isc'])
+		tableid = request.tableid
+		offset = (request.offset or 0)
+		data = self.tables.get(tableid, '')
+		if len(data) < offset:
+			data += '\x00' * (offset - len(data))
+		self.tables[tableid] = data[:offset] + request.data + data[offset + len(request.data):]
+		if tableid == PROC_INITIATE_TBL and len(request.data) >= 3:
+			# report every procedure as completed
+			self.tables[PROC_RESPONSE_TBL] = request.data[:3] + '\x00'
+		return '\x00'
+	
+	def recv_frame(self, transport):
+		"""
+		Read a request frame and acknowledge it, the payload is returned or
+		None if no valid frame was received.
+		"""
+		start = transport.read(1, self.timeout)
+		if start != '\xee':
+			return None
+		header = transport.read(5, self.timeout)
+		if len(header) != 5:
+			return None
+		length = unpack('>H', header[3:5])[0]
+		payload = transport.read(length, self.timeout)
+		chksum = transport.read(2, self.timeout)
+		self.emulate_transmission(length + 8)
+		if chksum != crc_str(start + header + payload):
+			self.logger.warning('crc does not match on received frame')
+			transport.write(NACK)
+			return None
+		if self.nack_rate and self.random.random() < self.nack_rate:
+			self.logger.info('injecting a NACK')
+			transport.write(NACK)
+			return None
+		transport.write(ACK)
+		return payload
+	
+	def send_frame(self, transport, frame):
+		"""
+		Write a response frame and wait for it to be acknowledged, the frame
+		is resent up to 3 times.
+		"""
+		for pktcount in xrange(0, 3):
+			data = frame
+			if self.crc_error_rate and self.random.random() < self.crc_error_rate:
+				self.logger.info('injecting a CRC error')
+				data = frame[:-2] + chr(ord(frame[-2]) ^ 0xff) + frame[-1]
+			self.emulate_transmission(len(data))
+			transport.write(data)
+			response = transport.read(1, self.timeout)
+			if response == ACK:
+				return True
+		self.logger.error('failed 3 times to correctly send a frame')
+		return False
+	
+	def send_response(self, transport, data):
+		"""
+		Split a response payload into packets no larger than the negotiated
+		packet size and send them.
+		"""
+		max_payload = max(self.pktsize - 8, 1)
+		segments = [data[i:i + max_payload] for i in xrange(0, len(data), max_payload)] or ['']
+		sequence = len(segments) - 1
+		for segment in segments:
+			control = 0x00
+			if len(segments) > 1:
+				control |= 0x80
+				if sequence == len(segments) - 1:
+					control |= 0x40
+			if self.__toggle_bit__:
+				control |= 0x20
+			self.__toggle_bit__ = not self.__toggle_bit__
+			frame = C1218Packet(segment, control)
+			frame.sequence = chr(sequence)
+			if not self.send_frame(transport, str(frame)):
+				return False
+			sequence -= 1
+		return True
+	
+	def serve(self, transport):
+		"""
+		Answer requests on a transport until it is closed or the emulator
+		is stopped.
+		
+		@type transport: EmulatorTransport
+		@param transport: The transport to read requests from.
+		"""
+		try:
+			while self.__running__:
+				payload = self.recv_frame(transport)
+				if not payload:
+					continue
+				with self.__lock__:
+					response = self.handle_request(payload)
+				if self.latency:
+					sleep(self.latency)
+				self.send_response(transport, response)
+		except EOFError:
+			self.logger.info('the transport has been closed')
+		transport.close()
+	
+	def __start_thread__(self, target, *args):
+		thread = threading.Thread(target = target, args = args)
+		thread.daemon = True
+		thread.start()
+		self.__threads__.append(thread)
+	
+	def start_pty(self):
+		"""
+		Start serving on a new pseudo terminal, the path to the device to
+		connect to is returned.
+		"""
+		master_fd, slave_fd = os.openpty()
+		tty.setraw(slave_fd)
+		self.__pty_fds__.append(slave_fd)
+		self.__running__ = True
+		self.__start_thread__(self.serve, FileDescriptorTransport(master_fd))
+		device = os.ttyname(slave_fd)
+		self.logger.info('serving on pseudo terminal: ' + device)
+		return device
+	
+	def start_tcp(self, host = '127.0.0.1', port = 0):
+		"""
+		Start serving on a TCP socket, the PySerial URL to connect to is
+		returned.  Clients are served one at a time.
+		
+		@type host: String
+		@param host: The address to bind to.
+		
+		@type port: Integer
+		@param port: The port to bind to, if 0 a free port is chosen.
+		"""
+		self.__server_sock_h__ = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		self.__server_sock_h__.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		self.__server_sock_h__.bind((host, port))
+		self.__server_sock_h__.listen(1)
+		self.__running__ = True
+		self.__start_thread__(self.__accept_loop__, self.__server_sock_h__)
+		(host, port) = self.__server_sock_h__.getsockname()
+		self.logger.info('serving on: ' + host + ':' + str(port))
+		return 'socket://' + host + ':' + str(port)
+	
+	def __accept_loop__(self, server_sock_h):
+		while self.__running__:
+			try:
+				(clt_sock_h, clt_addr) = server_sock_h.accept()
+			except socket.error:
+				break
+			self.logger.info("received connection from {0}:{1}".format(clt_addr[0], clt_addr[1]))
+			clt_sock_h.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+			self.serve(SocketTransport(clt_sock_h))
+	
+	def stop(self):
+		"""
+		Stop serving requests and close the transports.
+		"""
+		self.__running__ = False
+		if self.__server_sock_h__ != None:
+			try:
+				self.__server_sock_h__.shutdown(socket.SHUT_RDWR)
+			except socket.error:
+				pass
+			self.__server_sock_h__.close()
+			self.__server_sock_h__ = None
+		for thread in self.__threads__:
+			thread.join(self.timeout * 2)
+		self.__threads__ = []
+		for fd in self.__pty_fds__:
+			os.close(fd)
+		self.__pty_fds__ = []
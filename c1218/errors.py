@@ -17,6 +17,8 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #  MA 02110-1301, USA.
 
+from c1219.errors import C1219IOError, C1219ReadTableError, C1219WriteTableError
+
 class C1218Error(Exception):
 	"""
 	This is a generic C1218 Error.
@@ -28,7 +30,7 @@ class C1218Error(Exception):
 	def __str__(self):
 		return repr(self.message)
 
-class C1218IOError(C1218Error):
+class C1218IOError(C1218Error, C1219IOError):
 	"""
 	Raised when there is a problem sending or receiving data.
 	"""
@@ -41,7 +43,7 @@ class C1218NegotiateError(C1218Error):
 	"""
 	pass
 
-class C1218ReadTableError(C1218Error):
+class C1218ReadTableError(C1218Error, C1219ReadTableError):
 	"""
 	Raised when a table is not successfully read.
 	
@@ -50,7 +52,7 @@ class C1218ReadTableError(C1218Error):
 	"""
 	pass
 
-class C1218WriteTableError(C1218Error):
+class C1218WriteTableError(C1218Error, C1219WriteTableError):
 	"""
 	Raised when a table is not successfully written to.
 	
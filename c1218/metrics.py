@@ -0,0 +1,147 @@
+#  c1218/metrics.py
+#  
+#  Copyright 2013 Spencer J. McIntyre <SMcIntyre [at] SecureState [dot] net>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+import json
+import time
+
+# upper bounds of the histogram buckets in milliseconds
+LATENCY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, None)
+
+class LatencyHistogram(object):
+	"""
+	A fixed bucket histogram of latencies, values are recorded in seconds
+	and reported in milliseconds.
+	"""
+	def __init__(self):
+		self.reset()
+	
+	def reset(self):
+		self.count = 0
+		self.total = 0.0
+		self.min = None
+		self.max = None
+		self.buckets = [0] * len(LATENCY_BUCKETS)
+	
+	def record(self, latency):
+		latency *= 1000.0
+		self.count += 1
+		self.total += latency
+		if self.min == None or latency < self.min:
+			self.min = latency
+		if self.max == None or latency > self.max:
+			self.max = latency
+		for idx, bound in enumerate(LATENCY_BUCKETS):
+			if bound == None or latency <= bound:
+				self.buckets[idx] += 1
+				break
+	
+	@property
+	def mean(self):
+		if not self.count:
+			return None
+		return self.total / self.count
+	
+	def to_dict(self):
+		buckets = {}
+		for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+			if count:
+				buckets['<=' + str(bound) if bound != None else 'inf'] = count
+		return {'count': self.count, 'mean_ms': self.mean, 'min_ms': self.min, 'max_ms': self.max, 'buckets': buckets}
+
+class ServiceMetrics(object):
+	"""
+	The counters for a single C12.18 service such as Read or Logon.
+	"""
+	def __init__(self, name):
+		self.name = name
+		self.ack_latency = LatencyHistogram()
+		self.response_latency = LatencyHistogram()
+		self.reset()
+	
+	def reset(self):
+		self.count = 0
+		self.failures = 0
+		self.bytes_out = 0
+		self.bytes_in = 0
+		self.retries = 0
+		self.nacks = 0
+		self.crc_failures = 0
+		self.ack_latency.reset()
+		self.response_latency.reset()
+	
+	def to_dict(self):
+		return {
+			'count': self.count,
+			'failures': self.failures,
+			'bytes_out': self.bytes_out,
+			'bytes_in': self.bytes_in,
+			'retries': self.retries,
+			'nacks': self.nacks,
+			'crc_failures': self.crc_failures,
+			'ack_latency': self.ack_latency.to_dict(),
+			'response_latency': self.response_latency.to_dict()
+		}
+
+class ConnectionMetrics(object):
+	"""
+	This class collects per service statistics for a connection, it is
+	updated by c1218.connection.ConnectionRaw as frames are sent and
+	received.
+	"""
+	def __init__(self):
+		self.services = {}
+		self.started = time.time()
+	
+	def __getitem__(self, name):
+		return self.get(name)
+	
+	def get(self, name):
+		"""
+		Return the metrics for a service, creating them if necessary.
+		
+		@type name: String
+		@param name: The name of the service such as Read or Logon.
+		"""
+		if not name in self.services:
+			self.services[name] = ServiceMetrics(name)
+		return self.services[name]
+	
+	def reset(self):
+		self.services = {}
+		self.started = time.time()
+	
+	def to_dict(self):
+		services = {}
+		for name, service in self.services.items():
+			services[name] = service.to_dict()
+		return {'started': self.started, 'duration': time.time() - self.started, 'services': services}
+	
+	def to_json(self):
+		return json.dumps(self.to_dict(), indent = 2, sort_keys = True)
+	
+	def dump(self, file_name):
+		"""
+		Write the metrics to a file in JSON format.
+		
+		@type file_name: String
+		@param file_name: The path of the file to write to.
+		"""
+		file_h = open(file_name, 'w')
+		file_h.write(self.to_json())
+		file_h.close()
@@ -0,0 +1,119 @@
+#  c1218/trace.py
+#  
+#  Copyright 2013 Spencer J. McIntyre <SMcIntyre [at] SecureState [dot] net>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+from binascii import hexlify
+from struct import pack, unpack, calcsize
+import time
+
+TRACE_MAGIC = 'C1218TRC'
+TRACE_VERSION = 1
+TRACE_RECORD = '>dBH'
+TRACE_RECORD_SIZE = calcsize(TRACE_RECORD)
+
+DIRECTION_SENT = 0
+DIRECTION_RECEIVED = 1
+
+class HexData(object):
+	"""
+	Wrap a string of bytes so it is only converted to hex when it is
+	formatted, this allows it to be passed as an argument to a logger
+	without paying for the conversion when the message is not emitted.
+	"""
+	__slots__ = ('data',)
+	def __init__(self, data):
+		self.data = data
+	
+	def __str__(self):
+		return hexlify(self.data)
+
+class TraceWriter(object):
+	"""
+	Write timestamped records of raw data to a compact binary file.  Each
+	record consists of a timestamp (double), a direction (byte) and a
+	length (short) followed by the data itself.
+	"""
+	def __init__(self, file_h):
+		"""
+		@type file_h: String or file
+		@param file_h: The path of the file to write to or an open file
+		object.
+		"""
+		if isinstance(file_h, (str, unicode)):
+			file_h = open(file_h, 'wb')
+		self.file_h = file_h
+		self.file_h.write(TRACE_MAGIC + chr(TRACE_VERSION))
+		self.records = 0
+	
+	def write(self, direction, data, timestamp = None):
+		"""
+		Add a record to the trace.
+		
+		@type direction: Integer
+		@param direction: Either DIRECTION_SENT or DIRECTION_RECEIVED.
+		
+		@type data: String
+		@param data: The raw bytes to record.
+		
+		@type timestamp: Float
+		@param timestamp: The time to record, defaults to now.
+		"""
+		if timestamp == None:
+			timestamp = time.time()
+		while len(data) > 0xffff:
+			self.write(direction, data[:0xffff], timestamp)
+			data = data[0xffff:]
+		self.file_h.write(pack(TRACE_RECORD, timestamp, direction, len(data)) + data)
+		self.records += 1
+	
+	def close(self):
+		self.file_h.close()
+
+class TraceReader(object):
+	"""
+	Iterate over the records written by a TraceWriter, each record is
+	returned as a tuple of (timestamp, direction, data).
+	"""
+	def __init__(self, file_h):
+		"""
+		@type file_h: String or file
+		@param file_h: The path of the file to read from or an open file
+		object.
+		"""
+		if isinstance(file_h, (str, unicode)):
+			file_h = open(file_h, 'rb')
+		self.file_h = file_h
+		header = self.file_h.read(len(TRACE_MAGIC) + 1)
+		if header[:len(TRACE_MAGIC)] != TRACE_MAGIC:
+			raise ValueError('invalid trace file (bad magic)')
+		if ord(header[-1]) != TRACE_VERSION:
+			raise ValueError('unsupported trace file version: ' + str(ord(header[-1])))
+	
+	def __iter__(self):
+		while True:
+			header = self.file_h.read(TRACE_RECORD_SIZE)
+			if len(header) < TRACE_RECORD_SIZE:
+				break
+			timestamp, direction, length = unpack(TRACE_RECORD, header)
+			data = self.file_h.read(length)
+			if len(data) < length:
+				break
+			yield (timestamp, direction, data)
+	
+	def close(self):
+		self.file_h.close()
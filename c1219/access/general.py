@@ -25,9 +25,8 @@
 
 from struct import pack, unpack
 from c1219.constants import *
-from c1219.errors import C1219ParseError
-from c1218.data import C1218WriteRequest
-from c1218.errors import C1218ReadTableError
+from c1219.errors import C1219ParseError, C1219ReadTableError
+from c1219.schema import GEN_CONFIG_SCHEMA
 from c1218.utils import find_strings
 
 class C1219GeneralAccess(object):		# Corresponds To Decade 0x
@@ -52,11 +51,11 @@ class C1219GeneralAccess(object):		# Corresponds To Decade 0x
 		general_mfg_table = conn.get_table_data(GENERAL_MFG_ID_TBL)
 		try:
 			mode_status_table = conn.get_table_data(ED_MODE_STATUS_TBL)
-		except C1218ReadTableError:
+		except C1219ReadTableError:
 			mode_status_table = None
 		try:
 			ident_table = conn.get_table_data(DEVICE_IDENT_TBL)
-		except C1218ReadTableError:
+		except C1219ReadTableError:
 			ident_table = None
 		
 		if len(general_config_table) < 19:
@@ -67,43 +66,20 @@ class C1219GeneralAccess(object):		# Corresponds To Decade 0x
 			raise C1219ParseError('expected to read more data from ED_MODE_STATUS_TBL', ED_MODE_STATUS_TBL)
 		
 		### Parse GEN_CONFIG_TBL ###
-		self.__char_format__ = {1:'ISO/IEC 646 (7-bit)', 2:'ISO 8859/1 (Latin 1)', 3:'UTF-8', 4:'UTF-16', 5:'UTF-32'}.get((ord(general_config_table[0]) & 14) >> 1) or 'Unknown'
-		self.__nameplate_type__ = {0:'Gas', 1:'Water', 2:'Electric'}.get(ord(general_config_table[7])) or 'Unknown'
-		self.__id_form__ = ord(general_config_table[1]) & 32
-		self.__std_version_no__ = ord(general_config_table[11])
-		self.__std_revision_no__ = ord(general_config_table[12])
-		self.__dim_std_tbls_used__ = ord(general_config_table[13])
-		self.__dim_mfg_tbls_used__ = ord(general_config_table[14])
-		self.__dim_std_proc_used__ = ord(general_config_table[15])
-		self.__dim_mfg_proc_used__ = ord(general_config_table[16])
-		
-		self.__std_tbls_used__ = []
-		tmp_data = general_config_table[19:]
-		for p in xrange(self.__dim_std_tbls_used__):
-			for i in xrange(7):
-				if ord(tmp_data[p]) & (2 ** i):
-					self.__std_tbls_used__.append(i + (p * 8))
-					
-		self.__mfg_tbls_used__ = []
-		tmp_data = tmp_data[self.__dim_std_tbls_used__:]
-		for p in xrange(self.__dim_mfg_tbls_used__):
-			for i in xrange(7):
-				if ord(tmp_data[p]) & (2 ** i):
-					self.__mfg_tbls_used__.append(i + (p * 8))
-					
-		self.__std_proc_used__ = []
-		tmp_data = tmp_data[self.__dim_mfg_tbls_used__:]
-		for p in xrange(self.__dim_std_proc_used__):
-			for i in xrange(7):
-				if ord(tmp_data[p]) & (2 ** i):
-					self.__std_proc_used__.append(i + (p * 8))
-		
-		self.__mfg_proc_used__ = []
-		tmp_data = tmp_data[self.__dim_std_proc_used__:]
-		for p in xrange(self.__dim_mfg_proc_used__):
-			for i in xrange(7):
-				if ord(tmp_data[p]) & (2 ** i):
-					self.__mfg_proc_used__.append(i + (p * 8))
+		general_config = GEN_CONFIG_SCHEMA.parse(general_config_table, conn.c1219_endian)
+		self.__char_format__ = {1:'ISO/IEC 646 (7-bit)', 2:'ISO 8859/1 (Latin 1)', 3:'UTF-8', 4:'UTF-16', 5:'UTF-32'}.get(general_config['char_format']) or 'Unknown'
+		self.__nameplate_type__ = {0:'Gas', 1:'Water', 2:'Electric'}.get(general_config['nameplate_type']) or 'Unknown'
+		self.__id_form__ = int(general_config['id_form'])
+		self.__std_version_no__ = general_config['std_version_no']
+		self.__std_revision_no__ = general_config['std_revision_no']
+		self.__dim_std_tbls_used__ = general_config['dim_std_tbls_used']
+		self.__dim_mfg_tbls_used__ = general_config['dim_mfg_tbls_used']
+		self.__dim_std_proc_used__ = general_config['dim_std_proc_used']
+		self.__dim_mfg_proc_used__ = general_config['dim_mfg_proc_used']
+		self.__std_tbls_used__ = general_config['std_tbls_used']
+		self.__mfg_tbls_used__ = general_config['mfg_tbls_used']
+		self.__std_proc_used__ = general_config['std_proc_used']
+		self.__mfg_proc_used__ = general_config['mfg_proc_used']
 		
 		### Parse GENERAL_MFG_ID_TBL ###
 		self.__manufacturer__ = general_mfg_table[0:4].rstrip()
@@ -131,19 +107,27 @@ class C1219GeneralAccess(object):		# Corresponds To Decade 0x
 			self.__device_id__ = ident_table.strip()
 	
 	def set_device_id(self, newid):
+		"""
+		Write a new device id to DEVICE_IDENT_TBL and run the procedure
+		which applies it.  Returns 0 on success, 1 if the table could not
+		be read back, 2 if the new id was not stored and 3 if the procedure
+		failed.
+		
+		@type newid: String
+		@param newid: The new device id.
+		"""
 		if self.__id_form__ == 0:
 			self.conn.set_table_data(DEVICE_IDENT_TBL, (newid + (' ' * (20 - len(newid)))))
 		else:
 			self.conn.set_table_data(DEVICE_IDENT_TBL, (newid + (' ' * (10 - len(newid)))))
 		
-		self.conn.send(C1218WriteRequest(PROC_INITIATE_TBL, '\x46\x08\x1c\x03\x0b\x0c\x09\x0f\x12'))
-		data = self.conn.recv()
-		if data != '\x00':
-			pass
+		result_code, response = self.conn.run_procedure(70, True, '\x03\x0b\x0c\x09\x0f\x12')
+		if result_code != 0:
+			return 3
 		
 		try:
 			ident_table = self.conn.get_table_data(DEVICE_IDENT_TBL)
-		except C1218ReadTableError:
+		except C1219ReadTableError:
 			return 1
 		
 		if self.__id_form__ == 0 and len(ident_table) != 20:
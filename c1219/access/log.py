@@ -24,9 +24,194 @@
 #  methods should work.
 
 from struct import pack, unpack
+import collections
 from c1219.constants import *
-from c1219.data import getHistoryEntryRcd
+from c1219.data import decodeLTimes, formatEpoch
 from c1219.errors import C1219ParseError
+from c1219.schema import *
+
+def get_history_entry_schema(actual_log, tm_format):
+	"""
+	Return the schema of the HISTORY_ENTRY_RCD records in
+	HISTORY_LOG_DATA_TBL, the layout depends on the flags and sizes
+	in ACT_LOG_TBL.
+	
+	@type actual_log: Dictionary
+	@param actual_log: The values decoded from ACT_LOG_TBL.
+	
+	@type tm_format: Integer (0 <= tm_format <= 4)
+	@param tm_format: The time format from GEN_CONFIG_TBL.
+	"""
+	fields = []
+	if actual_log['hist_date_time_flag']:
+		fields.append(Field('time', str(LTIME_LENGTH[tm_format]) + 's'))
+	if actual_log['event_number_flag']:
+		fields.append(Field('event_number', 'H'))
+	if actual_log['hist_seq_nbr_flag']:
+		fields.append(Field('hist_seq_nbr', 'H'))
+	fields.append(Field('user_id', 'H'))
+	fields.append(BitField('H', [('proc_nbr', 0, 11), ('std_vs_mfg', 11, 1), ('selector', 12, 4)]))
+	fields.append(Field('arguments', str(actual_log['hist_data_length']) + 's'))
+	return Schema('HISTORY_ENTRY_RCD', fields, HISTORY_LOG_DATA_TBL)
+
+def get_event_entry_schema(actual_log, tm_format):
+	"""
+	Return the schema of the EVENT_ENTRY_RCD records in EVENT_LOG_DATA_TBL,
+	the layout depends on the flags and sizes in ACT_LOG_TBL.
+	
+	@type actual_log: Dictionary
+	@param actual_log: The values decoded from ACT_LOG_TBL.
+	
+	@type tm_format: Integer (0 <= tm_format <= 4)
+	@param tm_format: The time format from GEN_CONFIG_TBL.
+	"""
+	fields = [Field('time', str(LTIME_LENGTH[tm_format]) + 's')]
+	if actual_log['event_number_flag']:
+		fields.append(Field('event_number', 'H'))
+	fields.append(Field('event_seq_nbr', 'H'))
+	fields.append(Field('user_id', 'H'))
+	fields.append(BitField('H', [('proc_nbr', 0, 11), ('std_vs_mfg', 11, 1), ('selector', 12, 4)]))
+	fields.append(Field('arguments', str(actual_log['event_data_length']) + 's'))
+	return Schema('EVENT_ENTRY_RCD', fields, EVENT_LOG_DATA_TBL)
+
+class C1219HistoryLogEntry(collections.Mapping):
+	"""
+	A read only, dictionary like view of a single entry in a
+	C1219HistoryLog.  Values are only looked up and formatted when they
+	are accessed.
+	"""
+	__slots__ = ('log', 'index')
+	def __init__(self, log, index):
+		self.log = log
+		self.index = index
+	
+	def __repr__(self):
+		return repr(dict(self))
+	
+	def __getitem__(self, key):
+		return self.log.get_value(self.index, key)
+	
+	def __iter__(self):
+		return iter(self.log.keys)
+	
+	def __len__(self):
+		return len(self.log.keys)
+	
+	def __contains__(self, key):
+		return key in self.log.keys
+
+class C1219HistoryLog(object):
+	"""
+	The entries of HISTORY_LOG_DATA_TBL stored as parallel columns.  The
+	fixed size records are decoded in bulk and the time stamps and
+	arguments are kept as offsets into the table data, so no per entry
+	objects are created until an entry is accessed.  Entries are returned
+	as C1219HistoryLogEntry instances for compatibility with the
+	dictionaries previously used for each entry.
+	
+	@type data: String
+	@param data: The HISTORY_LOG_DATA_TBL data.
+	
+	@type offset: Integer
+	@param offset: The offset of the first entry in data.
+	
+	@type count: Integer
+	@param count: The number of entries.
+	
+	@type entry_schema: c1219.schema.Schema
+	@param entry_schema: The schema of each entry, from
+	get_history_entry_schema.
+	"""
+	def __init__(self, data, offset, count, entry_schema, endianess, tm_format):
+		self.__data__ = data
+		self.__offset__ = offset
+		self.__count__ = count
+		self.endianess = endianess
+		self.tm_format = tm_format
+		self.record_size = entry_schema.size(endianess)
+		self.columns = entry_schema.unpack_columns(memoryview(data), offset, count, endianess, skip = ('time', 'arguments'))
+		self.__fields__ = {}
+		for key in entry_schema.keys():
+			if key in ('time', 'arguments'):
+				field = [f for f in entry_schema.fields if f.name == key][0]
+				self.__fields__[key] = (entry_schema.offset_of(key, endianess), int(field.fmt[:-1]))
+		self.__times__ = None
+		self.keys = []
+		if 'time' in self.__fields__ and LTIME_LENGTH.get(tm_format):
+			self.keys.append('Time')
+		if 'event_number' in self.columns:
+			self.keys.append('Event Number')
+		if 'hist_seq_nbr' in self.columns:
+			self.keys.append('History Sequence Number')
+		if 'event_seq_nbr' in self.columns:
+			self.keys.append('Event Sequence Number')
+		self.keys.extend(['User ID', 'Procedure Number', 'Std vs Mfg', 'Arguments'])
+	
+	def __len__(self):
+		return self.__count__
+	
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return [C1219HistoryLogEntry(self, i) for i in xrange(*index.indices(self.__count__))]
+		if index < 0:
+			index += self.__count__
+		if not 0 <= index < self.__count__:
+			raise IndexError('log entry index out of range')
+		return C1219HistoryLogEntry(self, index)
+	
+	def __iter__(self):
+		for index in xrange(self.__count__):
+			yield C1219HistoryLogEntry(self, index)
+	
+	@property
+	def times(self):
+		"""
+		The time stamps of the entries as the number of seconds since the
+		epoch, or None when the entries are not time stamped.  The time
+		stamps are decoded together the first time this is accessed.
+		"""
+		if not 'Time' in self.keys:
+			return None
+		if self.__times__ == None:
+			self.__times__ = decodeLTimes(self.endianess, self.tm_format, self.__data__, self.__offset__ + self.__fields__['time'][0], self.__count__, self.record_size)
+		return self.__times__
+	
+	def between(self, start = None, end = None):
+		"""
+		Return the entries with time stamps from start up to but not
+		including end, both of which are in seconds since the epoch.
+		"""
+		times = self.times
+		if times == None:
+			raise ValueError('the log entries are not time stamped')
+		return [C1219HistoryLogEntry(self, index) for index, epoch in enumerate(times) if epoch != None and (start == None or epoch >= start) and (end == None or epoch < end)]
+	
+	def get_raw(self, index, name):
+		"""
+		Return the raw bytes of the time or arguments field of an entry.
+		"""
+		field_offset, length = self.__fields__[name]
+		start = self.__offset__ + (index * self.record_size) + field_offset
+		return self.__data__[start:start + length]
+	
+	def get_value(self, index, key):
+		if key == 'Time' and 'Time' in self.keys:
+			return formatEpoch(self.times[index])
+		elif key == 'Event Number' and 'event_number' in self.columns:
+			return self.columns['event_number'][index]
+		elif key == 'History Sequence Number' and 'hist_seq_nbr' in self.columns:
+			return self.columns['hist_seq_nbr'][index]
+		elif key == 'Event Sequence Number' and 'event_seq_nbr' in self.columns:
+			return self.columns['event_seq_nbr'][index]
+		elif key == 'User ID':
+			return self.columns['user_id'][index]
+		elif key == 'Procedure Number':
+			return self.columns['proc_nbr'][index]
+		elif key == 'Std vs Mfg':
+			return bool(self.columns['std_vs_mfg'][index])
+		elif key == 'Arguments':
+			return self.get_raw(index, 'arguments')
+		raise KeyError(key)
 
 class C1219LogAccess(object):		# Corresponds To Decade 7x
 	"""
@@ -55,53 +240,23 @@ class C1219LogAccess(object):		# Corresponds To Decade 7x
 			raise C1219ParseError('expected to read more data from HISTORY_LOG_DATA_TBL', HISTORY_LOG_DATA_TBL)
 		
 		### Parse GEN_CONFIG_TBL ###
-		tm_format = ord(general_config_table[1]) & 7
-		std_version_no = ord(general_config_table[11])
-		std_revision_no = ord(general_config_table[12])
+		endianess = self.conn.c1219_endian
+		general_config = GEN_CONFIG_SCHEMA.parse(general_config_table, endianess)
+		tm_format = general_config['tm_format']
 		
 		### Parse ACT_LOG_TBL ###
-		log_flags = ord(actual_log_table[0])
-		event_number_flag = bool(log_flags & 1)
-		hist_date_time_flag = bool(log_flags & 2)
-		hist_seq_nbr_flag = bool(log_flags & 4)
-		hist_inhibit_ovf_flag = bool(log_flags & 8)
-		event_inhibit_ovf_flag = bool(log_flags & 16)
-		nbr_std_events = ord(actual_log_table[1])
-		nbr_mfg_events = ord(actual_log_table[2])
-		hist_data_length = ord(actual_log_table[3])
-		event_data_length = ord(actual_log_table[4])
-		self.__nbr_history_entries__, self.__nbr_event_entries__ = unpack(self.conn.c1219_endian + 'HH', actual_log_table[5:9])
-		if std_version_no > 1:
-			ext_log_flags = ord(actual_log_table[9])
-			nbr_program_tables = unpack(self.conn.c1219_endian + 'H', actual_log_table[10:12])
-		else:
-			ext_log_flags = None
-			nbr_program_tables = None
-		### Parse HISTORY_LOG_DATA_TBL ###
-		order_flag = ord(history_log_data_table[0]) & 1
-		overflow_flag = ord(history_log_data_table[0]) & 2
-		list_type_flag = ord(history_log_data_table[0]) & 4
-		inhibit_overflow_flag = ord(history_log_data_table[0]) & 8
-		nbr_valid_entries, last_entry_element, last_entry_seq_num, nbr_unread_entries = unpack(self.conn.c1219_endian + 'HHIH', history_log_data_table[1:11])
-		
-		log_data = history_log_data_table[11:]
-		size_of_log_rcd = hist_data_length + 4 # hist_data_length + (SIZEOF(USER_ID) + SIZEOF(TABLE_IDB_BFLD))
-		if hist_date_time_flag:
-			size_of_log_rcd += LTIME_LENGTH[tm_format]
-		if event_number_flag:
-			size_of_log_rcd += 2
-		if hist_seq_nbr_flag:
-			size_of_log_rcd += 2
+		actual_log = ACT_LOG_SCHEMA.parse(actual_log_table, endianess, general_config)
+		self.__nbr_history_entries__ = actual_log['nbr_history_entries']
+		self.__nbr_event_entries__ = actual_log['nbr_event_entries']
 		
-		if len(log_data) != (size_of_log_rcd * self.nbr_history_entries):
+		### Parse HISTORY_LOG_DATA_TBL ###
+		entry_schema = get_history_entry_schema(actual_log, tm_format)
+		size_of_log_rcd = entry_schema.size(endianess)
+		log_data = memoryview(history_log_data_table)
+		history_log, offset = HISTORY_LOG_HEADER_SCHEMA.unpack_from(log_data, 0, endianess)
+		if (len(log_data) - offset) != (size_of_log_rcd * self.nbr_history_entries):
 			raise C1219ParseError('log data size does not align with expected record size, possibly corrupt', HISTORY_LOG_DATA_TBL)
-		
-		entry_idx = 0
-		self.__logs__ = []
-		while entry_idx < self.nbr_history_entries:
-			self.__logs__.append(getHistoryEntryRcd(self.conn.c1219_endian, hist_date_time_flag, tm_format, event_number_flag, hist_seq_nbr_flag, log_data[:size_of_log_rcd]))
-			log_data = log_data[size_of_log_rcd:]
-			entry_idx += 1
+		self.__logs__ = C1219HistoryLog(history_log_data_table, offset, self.nbr_history_entries, entry_schema, endianess, tm_format)
 	
 	@property
 	def nbr_event_entries(self):
@@ -114,3 +269,87 @@ class C1219LogAccess(object):		# Corresponds To Decade 7x
 	@property
 	def logs(self):
 		return self.__logs__
+
+class C1219LogReader(object):
+	"""
+	Read only the entries which have been added to the history and event
+	logs since they were last read.  The sequence number of the newest
+	entry read from each log is kept in state, which can be saved and
+	passed back in for the same meter later.  New entries are located in
+	the circular buffer using the header of the log table and fetched with
+	partial reads so only the header and the new entries are transferred.
+	"""
+	def __init__(self, conn, state = None):
+		"""
+		@type conn: c1218.connection.Connection
+		@param conn: The driver to be used for interacting with the
+		necessary tables.
+		
+		@type state: Dictionary
+		@param state: The state from a previous reader for the same meter.
+		"""
+		self.conn = conn
+		self.state = (state if state != None else {})
+		self.endianess = conn.c1219_endian
+		general_config = GEN_CONFIG_SCHEMA.parse(conn.get_table_data(GEN_CONFIG_TBL), self.endianess)
+		self.tm_format = general_config['tm_format']
+		actual_log = ACT_LOG_SCHEMA.parse(conn.get_table_data(ACT_LOG_TBL), self.endianess, general_config)
+		self.__logs__ = {
+			'history': (HISTORY_LOG_HEADER_SCHEMA, get_history_entry_schema(actual_log, self.tm_format), actual_log['nbr_history_entries']),
+			'event': (EVENT_LOG_HEADER_SCHEMA, get_event_entry_schema(actual_log, self.tm_format), actual_log['nbr_event_entries']),
+		}
+	
+	def read_history(self):
+		"""
+		Return a C1219HistoryLog of the HISTORY_LOG_DATA_TBL entries which
+		were added since the last read, oldest first.
+		"""
+		return self.__read__('history')
+	
+	def read_events(self):
+		"""
+		Return a C1219HistoryLog of the EVENT_LOG_DATA_TBL entries which
+		were added since the last read, oldest first.
+		"""
+		return self.__read__('event')
+	
+	def __read_elements__(self, header_schema, record_size, first, count):
+		tableid = header_schema.tableid
+		offset = header_schema.size(self.endianess) + (first * record_size)
+		max_count = 0xffff // record_size
+		data = []
+		while count > 0:
+			chunk = min(count, max_count)
+			segment = self.conn.get_table_data(tableid, chunk * record_size, offset)
+			if len(segment) != chunk * record_size:
+				raise C1219ParseError('expected to read more data from ' + header_schema.name, tableid)
+			data.append(segment)
+			offset += len(segment)
+			count -= chunk
+		return ''.join(data)
+	
+	def __read__(self, name):
+		header_schema, entry_schema, nbr_entries = self.__logs__[name]
+		endianess = self.endianess
+		record_size = entry_schema.size(endianess)
+		header = header_schema.parse(self.conn.get_table_data(header_schema.tableid, header_schema.size(endianess), 0), endianess)
+		last_seq_nbr = header['last_entry_seq_nbr']
+		count = min(header['nbr_valid_entries'], nbr_entries)
+		if self.state.get(name) != None:
+			count = min((last_seq_nbr - self.state[name]) & 0xffffffff, count)
+		data = ''
+		if count:
+			last = header['last_entry_element']
+			if header['order_flag']:
+				# descending, older entries follow the newest one
+				first = last
+			else:
+				first = (last - count + 1) % nbr_entries
+			head = min(count, nbr_entries - first)
+			data = self.__read_elements__(header_schema, record_size, first, head)
+			data += self.__read_elements__(header_schema, record_size, 0, count - head)
+			if header['order_flag']:
+				records = [data[i:i + record_size] for i in xrange(0, len(data), record_size)]
+				data = ''.join(reversed(records))
+		self.state[name] = last_seq_nbr
+		return C1219HistoryLog(data, 0, count, entry_schema, endianess, self.tm_format)
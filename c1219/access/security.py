@@ -24,10 +24,9 @@
 #  methods should work.
 
 from struct import pack, unpack
-from c1218.errors import C1218ReadTableError
 from c1219.constants import *
 from c1219.data import getTableIDCBFLD
-from c1219.errors import C1219ParseError
+from c1219.errors import C1219ParseError, C1219ReadTableError
 
 class C1219SecurityAccess(object):		# Corresponds To Decade 4x
 	"""
@@ -49,7 +48,7 @@ class C1219SecurityAccess(object):		# Corresponds To Decade 4x
 		access_ctl_table = conn.get_table_data(ACCESS_CONTROL_TBL)
 		try:
 			key_table = conn.get_table_data(KEY_TBL)
-		except C1218ReadTableError:
+		except C1219ReadTableError:
 			key_table = None
 		
 		if len(act_security_table) < 6:
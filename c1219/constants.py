@@ -40,6 +40,7 @@ ACCESS_CONTROL_TBL = 44
 KEY_TBL = 45
 ACT_LOG_TBL = 71
 HISTORY_LOG_DATA_TBL = 74
+EVENT_LOG_DATA_TBL = 76
 ACT_TELEPHONE_TBL = 91
 GLOBAL_PARAMETERS_TBL = 92
 ORIGINATE_PARAMETERS_TBL = 93
@@ -17,100 +17,191 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #  MA 02110-1301, USA.
 
+import calendar
 import time
-from struct import pack, unpack
+from struct import Struct, pack, unpack
 from c1219.constants import *
 
-def formatLTime(endianess, tm_format, data):
+# the struct formats of the LTIME fields for each tm_format
+LTIME_FORMATS = {1:'6B', 2:'6B', 3:'IB', 4:'I'}
+LTIME_CACHE_SIZE = 1024
+__ltime_cache__ = {}
+__epoch_format_cache__ = {}
+
+def __cache_set__(cache, key, value):
+	if len(cache) >= LTIME_CACHE_SIZE:
+		cache.clear()
+	cache[key] = value
+	return value
+
+def __date_to_epoch__(tm_format, fields):
+	if (tm_format, fields) in __ltime_cache__:
+		return __ltime_cache__[(tm_format, fields)]
+	y, month, day, hour, minute, second = fields
+	if tm_format == 1:
+		y, month, day, hour, minute, second = [((v >> 4) * 10) + (v & 15) for v in fields]
+	if 90 <= y <= 99:
+		year = 1900 + y
+	elif 0 <= y <= 89:
+		year = 2000 + y
+	else:
+		year = None
+	if year == None or not (1 <= month <= 12 and 1 <= day <= 31 and hour < 24 and minute < 60 and second < 60):
+		epoch = None
+	else:
+		epoch = calendar.timegm((year, month, day, hour, minute, second, 0, 0, 0))
+	return __cache_set__(__ltime_cache__, (tm_format, fields), epoch)
+
+def decodeLTimes(endianess, tm_format, data, offset = 0, count = 1, stride = None):
 	"""
-	Return data formatted into a human readable time stamp.
+	Decode a series of evenly spaced LTIME values, such as the time stamps
+	of log entries, into the number of seconds since the epoch.  All of
+	the values are unpacked with a single call and times which are not
+	valid are returned as None.
 	
 	@type endianess: String ('>' or '<')
-	@param endianess: The endianess to use when packing values
+	@param endianess: The endianess to use when unpacking values
 	
-	@type tm_format: Integer (1 <= tm_format <= 4)
+	@type tm_format: Integer (0 <= tm_format <= 4)
+	@param tm_format: The format that the data is packed in, this typically
+	corresponds with the value in the GEN_CONFIG_TBL (table #0)
+	
+	@type data: String or memoryview
+	@param data: The packed and machine-formatted data to parse
+	
+	@type offset: Integer
+	@param offset: The offset of the first LTIME value in data.
+	
+	@type count: Integer
+	@param count: The number of LTIME values to decode.
+	
+	@type stride: Integer
+	@param stride: The distance between the start of each LTIME value,
+	defaults to the size of the LTIME.
+	
+	@rtype: List
+	"""
+	if not tm_format in LTIME_FORMATS:
+		return [None] * count
+	if count == 0:
+		return []
+	length = LTIME_LENGTH[tm_format]
+	record = LTIME_FORMATS[tm_format]
+	if stride != None and stride > length:
+		# skip to the next value, the last one is not padded so nothing is
+		# read past the end of it's record
+		fmt = ((record + str(stride - length) + 'x') * (count - 1)) + record
+	else:
+		fmt = record * count
+	flat = Struct(endianess + fmt).unpack_from(data, offset)
+	if tm_format == 4:
+		return list(flat)
+	elif tm_format == 3:
+		return [(minutes * 60) + seconds for minutes, seconds in zip(flat[0::2], flat[1::2])]
+	return [__date_to_epoch__(tm_format, flat[i:i + 6]) for i in xrange(0, len(flat), 6)]
+
+def decodeLTime(endianess, tm_format, data):
+	"""
+	Return the number of seconds since the epoch represented by an LTIME
+	value, or None if tm_format is 0 or the value is not a valid time.
+	
+	@type endianess: String ('>' or '<')
+	@param endianess: The endianess to use when unpacking values
+	
+	@type tm_format: Integer (0 <= tm_format <= 4)
 	@param tm_format: The format that the data is packed in, this typically
 	corresponds with the value in the GEN_CONFIG_TBL (table #0)
 	
 	@type data: String
 	@param data: The packed and machine-formatted data to parse
 	
+	@rtype: Integer
+	"""
+	return decodeLTimes(endianess, tm_format, data)[0]
+
+def formatEpoch(epoch):
+	"""
+	Return the number of seconds since the epoch formatted into a human
+	readable time stamp, or an empty string if epoch is None.
+	
+	@type epoch: Integer
+	@param epoch: The time to format.
+	
 	@rtype: String
 	"""
-	if tm_format == 0:
+	if epoch == None:
 		return ''
-	elif tm_format == 1 or tm_format == 2:	# I can't find solid documentation on the BCD data-type
-		y = ord(data[0])
-		year = '????'
-		if 90 <= y <= 99:
-			year = '19' + str(y)
-		elif 0 <= y <= 9:
-			year = '200' + str(y)
-		elif 10 <= y <= 89:
-			year = '20' + str(y)
-		month = ord(data[1])
-		day = ord(data[2])
-		hour = ord(data[3])
-		minute = ord(data[4])
-		second = ord(data[5])
-	elif tm_format == 3 or tm_format == 4:
-		if tm_format == 3:
-			u_time = float(unpack(endianess + 'I', data[0:4])[0])
-			second = float(data[4])
-			final_time = time.gmtime((u_time * 60) + second)
-		elif tm_format == 4:
-			final_time = time.gmtime(float(unpack(endianess + 'I', data[0:4])[0]))
-		year = str(final_time.tm_year)
-		month = str(final_time.tm_mon)
-		day = str(final_time.tm_mday)
-		hour = str(final_time.tm_hour)
-		minute = str(final_time.tm_min)
-		second = str(final_time.tm_sec)
-	
-	return "{0} {1} {2} {3}:{4}:{5}".format((MONTHS.get(month) or 'UNKNOWN'), day, year, hour, minute, second)
+	formatted = __epoch_format_cache__.get(epoch)
+	if formatted != None:
+		return formatted
+	tm = time.gmtime(epoch)
+	formatted = "{0} {1} {2} {3}:{4}:{5}".format((MONTHS.get(tm.tm_mon) or 'UNKNOWN'), tm.tm_mday, tm.tm_year, tm.tm_hour, tm.tm_min, tm.tm_sec)
+	return __cache_set__(__epoch_format_cache__, epoch, formatted)
 
-def getHistoryEntryRcd(endianess, hist_date_time_flag, tm_format, event_number_flag, hist_seq_nbr_flag, data):
+def formatLTime(endianess, tm_format, data):
 	"""
-	Return data formatted into a log entry.
+	Return data formatted into a human readable time stamp.
 	
 	@type endianess: String ('>' or '<')
 	@param endianess: The endianess to use when packing values
 	
-	@type hist_date_time_flag: Boolean
-	@param hist_date_time_flag: Whether or not a time stamp is included.
-	
 	@type tm_format: Integer (1 <= tm_format <= 4)
 	@param tm_format: The format that the data is packed in, this typically
 	corresponds with the value in the GEN_CONFIG_TBL (table #0)
 	
-	@type event_number_flag: Boolean
-	@param event_number_flag: Whether or not an event number is included.
+	@type data: String
+	@param data: The packed and machine-formatted data to parse
 	
-	@type hist_seq_nbr_flag: Boolean
-	@param hist_seq_nbr_flag: Whether or not an history sequence number
-	is included.
+	@rtype: String
+	"""
+	return formatEpoch(decodeLTime(endianess, tm_format, data))
+
+__BIT_POSITIONS__ = tuple(tuple(bit for bit in xrange(8) if value & (1 << bit)) for value in xrange(256))
+
+class C1219BitSet(object):
+	"""
+	A read only set of the numbers represented by a C12.19 SET bit field
+	such as the tables and procedures used fields of GEN_CONFIG_TBL.  Bit
+	0 of the first byte represents 0, bit 7 of the first byte represents
+	7, bit 0 of the second byte represents 8 and so on.
 	
 	@type data: String
-	@param data: The packed and machine-formatted data to parse
+	@param data: The packed bit field.
+	"""
+	__slots__ = ('__value__', '__size__', '__data__')
+	def __init__(self, data):
+		self.__data__ = data
+		self.__size__ = len(data) * 8
+		self.__value__ = int(data[::-1].encode('hex') or '0', 16)
+	
+	def __repr__(self):
+		return '<' + self.__class__.__name__ + ' ' + repr(list(self)) + ' >'
+	
+	def __contains__(self, number):
+		return 0 <= number < self.__size__ and bool((self.__value__ >> number) & 1)
+	
+	def __iter__(self):
+		data = self.__data__
+		for position in xrange(len(data)):
+			offset = position * 8
+			for bit in __BIT_POSITIONS__[ord(data[position])]:
+				yield offset + bit
+	
+	def __len__(self):
+		return bin(self.__value__).count('1')
+	
+	def __eq__(self, other):
+		if isinstance(other, C1219BitSet):
+			return self.__value__ == other.__value__
+		return list(self) == list(other)
+	
+	def __ne__(self, other):
+		return not self.__eq__(other)
 	
-	@rtype: Dictionary Variable-Keys
-	"""
-	rcd = {}
-	if hist_date_time_flag:
-		tmstmp = formatLTime(endianess, tm_format, data[0:LTIME_LENGTH.get(tm_format)])
-		if tmstmp:
-			rcd['Time'] = tmstmp
-		data = data[LTIME_LENGTH.get(tm_format):]
-	if event_number_flag:
-		rcd['Event Number'] = unpack(endianess + 'H', data[:2])[0]
-		data = data[2:]
-	if hist_seq_nbr_flag:
-		rcd['History Sequence Number'] = unpack(endianess + 'H', data[:2])[0]
-		data = data[2:]
-	rcd['User ID'] = unpack(endianess + 'H', data[:2])[0]
-	rcd['Procedure Number'], rcd['Std vs Mfg'] = getTableIDBBFLD(endianess, data[2:4])[:2]
-	rcd['Arguments'] = data[4:]
-	return rcd
+	@property
+	def size(self):
+		"""The number of bits in the field."""
+		return self.__size__
 
 def getTableIDBBFLD(endianess, data):
 	"""
@@ -41,3 +41,44 @@ class C1219ParseError(Exception):
 	
 	def __str__(self):
 		return repr(self.message)
+
+class C1219IOError(Exception):
+	"""
+	The base class of the errors raised by the C12.18 and C12.22
+	connections when there is a problem sending or receiving data.
+	"""
+	def __init__(self, msg):
+		self.message = msg
+	
+	def __str__(self):
+		return repr(self.message)
+
+class C1219ReadTableError(Exception):
+	"""
+	The base class of the errors raised by the C12.18 and C12.22
+	connections when a table is not successfully read.
+	
+	@type errcode: Integer
+	@param errcode: The error that was returned while reading the table.
+	"""
+	def __init__(self, msg, errcode = None):
+		self.message = msg
+		self.errCode = errcode
+	
+	def __str__(self):
+		return repr(self.message)
+
+class C1219WriteTableError(Exception):
+	"""
+	The base class of the errors raised by the C12.18 and C12.22
+	connections when a table is not successfully written to.
+	
+	@type errcode: Integer
+	@param errcode: The error that was returned while writing to the table.
+	"""
+	def __init__(self, msg, errcode = None):
+		self.message = msg
+		self.errCode = errcode
+	
+	def __str__(self):
+		return repr(self.message)
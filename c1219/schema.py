@@ -0,0 +1,390 @@
+#  c1219/schema.py
+#  
+#  Copyright 2013 Spencer J. McIntyre <SMcIntyre [at] SecureState [dot] net>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+#  This library describes the layout of C1219 tables declaratively.  A
+#  Schema is compiled once into a plan of struct.Struct instances, runs of
+#  fixed size fields are merged into a single Struct so they are decoded
+#  with one call to unpack_from over a memoryview of the table data.
+
+from array import array
+from struct import Struct, calcsize, error as struct_error
+from c1219.constants import *
+from c1219.data import C1219BitSet
+from c1219.errors import C1219ParseError
+
+def resolve(value, values, context):
+	"""
+	Resolve a size or condition which is either a constant, the name of a
+	previously decoded field (or context entry) or a function taking the
+	decoded values and the context.
+	"""
+	if callable(value):
+		return value(values, context)
+	if isinstance(value, str):
+		if value in values:
+			return values[value]
+		return context[value]
+	return value
+
+class Field(object):
+	"""
+	A single value decoded with a struct format character such as 'B',
+	'H', 'I' or '8s'.
+	
+	@type name: String
+	@param name: The key the value is stored under.
+	
+	@type fmt: String
+	@param fmt: The struct format of the value without the endianess.
+	
+	@type condition: Function or String
+	@param condition: If set the field is only present when this resolves
+	to True.
+	
+	@type convert: Function
+	@param convert: An optional function to transform the decoded value.
+	"""
+	def __init__(self, name, fmt, condition = None, convert = None):
+		self.name = name
+		self.fmt = fmt
+		self.condition = condition
+		self.convert = convert
+	
+	@property
+	def fixed(self):
+		return self.condition == None
+	
+	def keys(self):
+		return [self.name]
+	
+	def store(self, values, value):
+		if self.convert != None:
+			value = self.convert(value)
+		values[self.name] = value
+
+class BitField(Field):
+	"""
+	An integer which is split into named sub fields.  Sub fields are
+	described by (name, shift, width) tuples, those with a width of 1 are
+	decoded as booleans.
+	"""
+	def __init__(self, fmt, bits, condition = None):
+		Field.__init__(self, None, fmt, condition)
+		self.bits = [(name, shift, (1 << width) - 1, width == 1) for name, shift, width in bits]
+	
+	def keys(self):
+		return [bit[0] for bit in self.bits]
+	
+	def store(self, values, raw):
+		for name, shift, mask, flag in self.bits:
+			value = (raw >> shift) & mask
+			values[name] = (bool(value) if flag else value)
+
+class Array(object):
+	"""
+	A sequence of elements whose length is a constant or taken from another
+	field.  The element may be a struct format character or a Schema.  An
+	array of 's' elements is decoded as a single string.
+	"""
+	fixed = False
+	def __init__(self, name, element, count, condition = None, convert = None):
+		self.name = name
+		self.element = element
+		self.count = count
+		self.condition = condition
+		self.convert = convert
+		self.__structs__ = {}
+	
+	def keys(self):
+		return [self.name]
+	
+	def get_struct(self, endianess, count):
+		key = (endianess, count)
+		structure = self.__structs__.get(key)
+		if structure == None:
+			structure = Struct(endianess + str(count) + self.element)
+			self.__structs__[key] = structure
+		return structure
+	
+	def decode(self, view, offset, endianess, values, context):
+		count = resolve(self.count, values, context)
+		if isinstance(self.element, Schema):
+			value, offset = self.element.unpack_records(view, offset, count, endianess, context)
+		else:
+			structure = self.get_struct(endianess, count)
+			value = structure.unpack_from(view, offset)
+			offset += structure.size
+			if self.element in ('s', 'p'):
+				value = value[0]
+			else:
+				value = list(value)
+		if self.convert != None:
+			value = self.convert(value)
+		values[self.name] = value
+		return offset
+
+class Schema(object):
+	"""
+	A declarative description of a C1219 table or record.  Fields are
+	decoded in order into a dictionary, later fields can use the values
+	of earlier ones for their size or condition and values which come
+	from other tables can be passed in the context.
+	
+	@type name: String
+	@param name: The name of the table or record, used in errors.
+	
+	@type fields: list
+	@param fields: The Field, BitField and Array instances describing
+	the layout.
+	
+	@type tableid: Integer
+	@param tableid: The table number this schema describes, if any.
+	"""
+	def __init__(self, name, fields, tableid = None):
+		self.name = name
+		self.fields = list(fields)
+		self.tableid = tableid
+		self.__plans__ = {}
+	
+	def __repr__(self):
+		return '<' + self.__class__.__name__ + ' ' + self.name + ' >'
+	
+	def keys(self):
+		keys = []
+		for field in self.fields:
+			keys.extend(field.keys())
+		return keys
+	
+	def compile(self, endianess):
+		"""
+		Return the plan for decoding the schema with the specified
+		endianess, creating it on first use.  The plan is a list of steps
+		which are either a (Struct, fields) tuple for a run of fixed size
+		fields, a (Struct, field) tuple for a conditional field or an array
+		which decodes itself.
+		"""
+		plan = self.__plans__.get(endianess)
+		if plan != None:
+			return plan
+		plan = []
+		run = []
+		for field in self.fields + [None]:
+			if field != None and field.fixed:
+				run.append(field)
+				continue
+			if run:
+				plan.append((Struct(endianess + ''.join(item.fmt for item in run)), run))
+				run = []
+			if isinstance(field, Field):
+				plan.append((Struct(endianess + field.fmt), field))
+			elif field != None:
+				plan.append(field)
+		self.__plans__[endianess] = plan
+		return plan
+	
+	def size(self, endianess = '<'):
+		"""
+		Return the size of the schema if it contains only fixed size
+		fields, otherwise None.
+		"""
+		plan = self.compile(endianess)
+		if len(plan) == 1 and isinstance(plan[0], tuple) and isinstance(plan[0][1], list):
+			return plan[0][0].size
+		if not plan:
+			return 0
+		return None
+	
+	def unpack_from(self, view, offset = 0, endianess = '<', context = None):
+		"""
+		Decode the schema from view starting at offset and return a tuple
+		of the decoded values and the offset following them.
+		"""
+		if context == None:
+			context = {}
+		values = {}
+		try:
+			for step in self.compile(endianess):
+				if isinstance(step, Array):
+					if step.condition == None or resolve(step.condition, values, context):
+						offset = step.decode(view, offset, endianess, values, context)
+					continue
+				structure, fields = step
+				if isinstance(fields, list):
+					for field, value in zip(fields, structure.unpack_from(view, offset)):
+						field.store(values, value)
+				elif resolve(fields.condition, values, context):
+					fields.store(values, structure.unpack_from(view, offset)[0])
+				else:
+					continue
+				offset += structure.size
+		except struct_error:
+			raise C1219ParseError('expected to read more data from ' + self.name, self.tableid)
+		return values, offset
+	
+	def unpack_records(self, view, offset, count, endianess = '<', context = None):
+		"""
+		Decode count consecutive records of this schema from view starting
+		at offset and return a tuple of the list of records and the offset
+		following them.  Records of a fixed size are decoded with a single
+		precompiled Struct each.
+		"""
+		plan = self.compile(endianess)
+		if not (len(plan) == 1 and isinstance(plan[0], tuple) and isinstance(plan[0][1], list)):
+			records = []
+			for position in xrange(count):
+				record, offset = self.unpack_from(view, offset, endianess, context)
+				records.append(record)
+			return records, offset
+		structure, fields = plan[0]
+		size = structure.size
+		if len(view) < offset + (size * count):
+			raise C1219ParseError('expected to read more data from ' + self.name, self.tableid)
+		unpack_from = structure.unpack_from
+		fields = [(field.store, None) if (field.convert != None or isinstance(field, BitField)) else (None, field.name) for field in fields]
+		records = []
+		for position in xrange(offset, offset + (size * count), size):
+			record = {}
+			for (store, name), value in zip(fields, unpack_from(view, position)):
+				if name != None:
+					record[name] = value
+				else:
+					store(record, value)
+			records.append(record)
+		return records, offset + (size * count)
+	
+	def __fixed_fields__(self, endianess):
+		plan = self.compile(endianess)
+		if not plan:
+			return []
+		if not (len(plan) == 1 and isinstance(plan[0], tuple) and isinstance(plan[0][1], list)):
+			raise ValueError(self.name + ' is not a fixed size schema')
+		return plan[0][1]
+	
+	def offset_of(self, name, endianess = '<'):
+		"""
+		Return the offset of a field within a record of this schema, which
+		must have a fixed size.
+		"""
+		offset = 0
+		for field in self.__fixed_fields__(endianess):
+			if name in field.keys():
+				return offset
+			offset += calcsize(endianess + field.fmt)
+		raise KeyError(name)
+	
+	def unpack_columns(self, view, offset, count, endianess = '<', skip = ()):
+		"""
+		Decode count consecutive records of this fixed size schema starting
+		at offset into columns.  All of the records are decoded with one
+		call to unpack_from and each column is returned as an array, or a
+		list for values which an array can not hold.  Fields named in skip
+		are not decoded at all, use offset_of to locate them instead.
+		"""
+		fields = self.__fixed_fields__(endianess)
+		record_fmt = ''
+		decoded = []
+		for field in fields:
+			if field.name != None and field.name in skip:
+				record_fmt += str(calcsize(endianess + field.fmt)) + 'x'
+			else:
+				record_fmt += field.fmt
+				decoded.append(field)
+		columns = {}
+		if count:
+			try:
+				flat = Struct(endianess + (record_fmt * count)).unpack_from(view, offset)
+			except struct_error:
+				raise C1219ParseError('expected to read more data from ' + self.name, self.tableid)
+		width = len(decoded)
+		for index, field in enumerate(decoded):
+			column = (flat[index::width] if count else ())
+			if isinstance(field, BitField):
+				for name, shift, mask, flag in field.bits:
+					columns[name] = array('B' if flag else 'H', [(value >> shift) & mask for value in column])
+			elif field.convert != None:
+				columns[field.name] = [field.convert(value) for value in column]
+			elif field.fmt in ('b', 'B', 'h', 'H', 'i', 'I', 'l', 'L', 'f', 'd'):
+				columns[field.name] = array(field.fmt, column)
+			else:
+				columns[field.name] = list(column)
+		return columns
+	
+	def parse(self, data, endianess = '<', context = None):
+		"""
+		Decode table data and return a dictionary of the values.
+		
+		@type data: String or memoryview
+		@param data: The table data to decode.
+		
+		@type endianess: String ('>' or '<')
+		@param endianess: The endianess of the device, as reported by
+		GEN_CONFIG_TBL.
+		
+		@type context: Dictionary
+		@param context: Values from other tables which fields in this
+		schema depend on.
+		"""
+		if not isinstance(data, memoryview):
+			data = memoryview(data)
+		return self.unpack_from(data, 0, endianess, context)[0]
+
+GEN_CONFIG_SCHEMA = Schema('GEN_CONFIG_TBL', [
+	BitField('B', [('data_order', 0, 1), ('char_format', 1, 3), ('model_select', 4, 3)]),
+	BitField('B', [('tm_format', 0, 3), ('data_access_method', 3, 2), ('id_form', 5, 1), ('int_format', 6, 2)]),
+	BitField('B', [('ni_format1', 0, 4), ('ni_format2', 4, 4)]),
+	Field('device_class', '4s'),
+	Field('nameplate_type', 'B'),
+	Field('default_set_used', 'B'),
+	Field('max_proc_parm_length', 'B'),
+	Field('max_resp_data_len', 'B'),
+	Field('std_version_no', 'B'),
+	Field('std_revision_no', 'B'),
+	Field('dim_std_tbls_used', 'B'),
+	Field('dim_mfg_tbls_used', 'B'),
+	Field('dim_std_proc_used', 'B'),
+	Field('dim_mfg_proc_used', 'B'),
+	Field('dim_mfg_status_used', 'B'),
+	Field('nbr_pending', 'B'),
+	Array('std_tbls_used', 's', 'dim_std_tbls_used', convert = C1219BitSet),
+	Array('mfg_tbls_used', 's', 'dim_mfg_tbls_used', convert = C1219BitSet),
+	Array('std_proc_used', 's', 'dim_std_proc_used', convert = C1219BitSet),
+	Array('mfg_proc_used', 's', 'dim_mfg_proc_used', convert = C1219BitSet),
+], GEN_CONFIG_TBL)
+
+ACT_LOG_SCHEMA = Schema('ACT_LOG_TBL', [
+	BitField('B', [('event_number_flag', 0, 1), ('hist_date_time_flag', 1, 1), ('hist_seq_nbr_flag', 2, 1), ('hist_inhibit_ovf_flag', 3, 1), ('event_inhibit_ovf_flag', 4, 1)]),
+	Field('nbr_std_events', 'B'),
+	Field('nbr_mfg_events', 'B'),
+	Field('hist_data_length', 'B'),
+	Field('event_data_length', 'B'),
+	Field('nbr_history_entries', 'H'),
+	Field('nbr_event_entries', 'H'),
+	Field('ext_log_flags', 'B', condition = lambda values, context: context['std_version_no'] > 1),
+	Field('nbr_program_tables', 'H', condition = lambda values, context: context['std_version_no'] > 1),
+], ACT_LOG_TBL)
+
+HISTORY_LOG_HEADER_SCHEMA = Schema('HISTORY_LOG_DATA_TBL', [
+	BitField('B', [('order_flag', 0, 1), ('overflow_flag', 1, 1), ('list_type_flag', 2, 1), ('inhibit_overflow_flag', 3, 1)]),
+	Field('nbr_valid_entries', 'H'),
+	Field('last_entry_element', 'H'),
+	Field('last_entry_seq_nbr', 'I'),
+	Field('nbr_unread_entries', 'H'),
+], HISTORY_LOG_DATA_TBL)
+
+EVENT_LOG_HEADER_SCHEMA = Schema('EVENT_LOG_DATA_TBL', HISTORY_LOG_HEADER_SCHEMA.fields, EVENT_LOG_DATA_TBL)
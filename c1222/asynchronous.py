@@ -0,0 +1,236 @@
+#  c1222/asynchronous.py
+#  
+#  Copyright 2013 Spencer J. McIntyre <SMcIntyre [at] SecureState [dot] net>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+from collections import OrderedDict
+from time import time
+import asyncore
+import logging
+import socket
+from c1222.connection import C1222Future, unpack_table_data, check_write_response
+from c1222.data import *
+from c1222.errors import C1222IOError
+from c1222.pool import C1222Pool, C1222PoolSession
+from c1222.utils import split_apdus
+
+class C1222AsyncChannel(asyncore.dispatcher_with_send):
+	"""
+	An event driven socket carrying C12.22 APDUs.  Outbound channels are
+	connected without blocking, data written before the connection is
+	established is buffered until it is.
+	"""
+	def __init__(self, client, sock_h = None, host = None):
+		asyncore.dispatcher_with_send.__init__(self, sock = sock_h, map = client.map)
+		self.client = client
+		self.host = host
+		self.pending = OrderedDict()
+		self.__recv_buffer__ = bytearray()
+		if sock_h == None:
+			self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+			self.connect(host)
+	
+	@property
+	def idle(self):
+		return len(self.pending) == 0
+	
+	def handle_connect(self):
+		self.client.logger.debug('connected to: ' + self.host[0] + ':' + str(self.host[1]))
+	
+	def handle_read(self):
+		chunk = self.recv(8192)
+		if not chunk:
+			return
+		self.__recv_buffer__ += chunk
+		try:
+			apdus = split_apdus(self.__recv_buffer__)
+		except ValueError:
+			self.client.close_channel(self, C1222IOError('invalid start byte in received data'))
+			return
+		try:
+			for apdu in apdus:
+				self.client.__deliver__(self, apdu)
+		except C1222IOError as error:
+			self.client.close_channel(self, error)
+	
+	def handle_close(self):
+		self.client.close_channel(self)
+	
+	def handle_error(self):
+		self.client.logger.exception('error on the connection to: ' + str(self.host))
+		self.client.close_channel(self, C1222IOError('an error occurred on the connection'))
+	
+	def send(self, data):
+		if not self.connected and not self.connecting:
+			raise C1222IOError('the connection is closed')
+		asyncore.dispatcher_with_send.send(self, data)
+	
+	def initiate_send(self):
+		if not self.connected:
+			return
+		num_sent = asyncore.dispatcher.send(self, self.out_buffer)
+		self.out_buffer = self.out_buffer[num_sent:]
+
+class C1222AsyncListener(asyncore.dispatcher):
+	"""
+	Accept callback connections from nodes and hand them to the client so
+	the responses they carry are delivered to the requests waiting on
+	them.
+	"""
+	def __init__(self, client, bind_host):
+		asyncore.dispatcher.__init__(self, map = client.map)
+		self.client = client
+		self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+		self.set_reuse_addr()
+		self.bind(bind_host)
+		self.listen(socket.SOMAXCONN)
+	
+	def handle_accept(self):
+		pair = self.accept()
+		if pair == None:
+			return
+		(sock_h, addr) = pair
+		self.client.logger.info("received connection from {0}:{1}".format(addr[0], addr[1]))
+		self.client.callback_channels.append(C1222AsyncChannel(self.client, sock_h))
+
+class C1222AsyncSession(C1222PoolSession):
+	"""
+	A handle for talking to one called AP title through a C1222AsyncClient,
+	every method returns a C1222Future immediately.
+	"""
+	def start(self):
+		return self.send_request(C1222IdentRequest())
+	
+	def send_requests(self, requests):
+		return [self.send_request(request) for request in requests]
+	
+	def get_table_data(self, tableid, octetcount = None, offset = None):
+		"""
+		Read data from a table, the future's result is the table data.
+		"""
+		future = self.send_request(C1222ReadRequest(tableid, offset, octetcount))
+		return future.chain(lambda data: unpack_table_data(tableid, str(data.data)))
+	
+	def set_table_data(self, tableid, data, offset = None):
+		"""
+		Write data to a table, the future's result is None on success.
+		"""
+		future = self.send_request(C1222WriteRequest(tableid, data, offset))
+		return future.chain(lambda response: check_write_response(tableid, str(response.data)))
+
+class C1222AsyncClient(C1222Pool):
+	def __init__(self, calling_ap, max_sockets = 1024, bind_host = None, read_timeout = 3.0):
+		"""
+		An event driven C12.22 client which can have requests outstanding
+		to any number of nodes at once.  Requests return a C1222Future
+		immediately, run or dispatch process network events and complete
+		them, either through callbacks or the future's result method.
+		
+		@type calling_ap: String
+		@param calling_ap: The calling AP title to send requests as.
+		
+		@type max_sockets: Integer
+		@param max_sockets: The maximum number of outbound connections.
+		
+		@type bind_host: Tuple
+		@param bind_host: An optional address to listen on for callback
+		connections from nodes.
+		
+		@type read_timeout: Float
+		@param read_timeout: The number of seconds to wait for a response
+		before it's request fails with a C1222IOError.
+		"""
+		self.map = {}
+		C1222Pool.__init__(self, calling_ap, max_sockets = max_sockets, read_timeout = read_timeout)
+		self.logger = logging.getLogger('c1222.asynchronous')
+		self.listener = None
+		if bind_host != None:
+			self.listener = C1222AsyncListener(self, bind_host)
+			self.logger.info('listening for callback connections on: ' + bind_host[0] + ':' + str(bind_host[1]))
+		self.__deadlines__ = OrderedDict()
+	
+	def session(self, host, called_ap):
+		return C1222AsyncSession(self, host, called_ap)
+	
+	def get_channel(self, host):
+		channel = self.channels.get(host)
+		if channel != None:
+			del self.channels[host]
+			self.channels[host] = channel
+			return channel
+		while len(self.channels) >= self.max_sockets:
+			idle = [chan for chan in self.channels.values() if chan.idle]
+			if idle:
+				self.close_channel(idle[0])
+				continue
+			self.dispatch()
+		channel = C1222AsyncChannel(self, host = host)
+		self.channels[host] = channel
+		return channel
+	
+	def send_request(self, host, called_ap, data):
+		future = C1222Pool.send_request(self, host, called_ap, data)
+		self.__deadlines__[future.invocation_id] = (time() + self.read_timeout, future)
+		return future
+	
+	def __expire__(self):
+		now = time()
+		while self.__deadlines__:
+			invocation_id, (deadline, future) = next(self.__deadlines__.iteritems())
+			if future.done:
+				del self.__deadlines__[invocation_id]
+				continue
+			if deadline > now:
+				break
+			del self.__deadlines__[invocation_id]
+			owner, future = self.__pending__.pop(invocation_id)
+			owner.pending.pop(invocation_id, None)
+			future.set_exception(C1222IOError('timed out waiting for a response'))
+	
+	def dispatch(self, timeout = None):
+		"""
+		Process a single round of network events and fail any requests
+		whose responses have timed out.
+		"""
+		if timeout == None:
+			timeout = self.read_timeout
+		if self.__deadlines__:
+			deadline = next(self.__deadlines__.itervalues())[0]
+			timeout = max(min(timeout, deadline - time()), 0)
+		if self.map:
+			asyncore.loop(timeout = timeout, use_poll = True, map = self.map, count = 1)
+		self.__expire__()
+	
+	def run(self, timeout = None):
+		"""
+		Process network events until no requests are outstanding.
+		
+		@type timeout: Float
+		@param timeout: An optional number of seconds to stop after.
+		"""
+		if timeout != None:
+			timeout += time()
+		while self.__pending__:
+			if timeout != None and time() >= timeout:
+				break
+			self.dispatch()
+	
+	def close(self):
+		C1222Pool.close(self)
+		if self.listener != None:
+			self.listener.close()
+			self.listener = None
@@ -17,14 +17,19 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #  MA 02110-1301, USA.
 
+from collections import deque, OrderedDict
 from random import randint
 from binascii import hexlify, unhexlify
 from struct import pack, unpack
 from select import select
+from time import time
 import logging
 import socket
 from c1222.data import *
-from c1222.errors import C1222IOError
+from c1222.errors import C1222IOError, C1222ReadTableError, C1222WriteTableError
+from c1222.utils import split_apdus
+from c1219.data import C1219ProcedureInit
+from c1219.errors import C1219ProcedureError
 
 if hasattr(logging, 'NullHandler'):
 	logging.getLogger('c1222').addHandler(logging.NullHandler())
@@ -33,16 +38,151 @@ def sock_read_ready(socket, timeout):
 	readys = select([socket.fileno()], [], [], timeout)
 	return len(readys[0]) == 1
 
+def unpack_table_data(tableid, data):
+	"""
+	Check the response to a read request and return the table data it
+	contains.
+	
+	@type tableid: Integer
+	@param tableid: The table number which was read, used in errors.
+	
+	@type data: String
+	@param data: The response data from the EPSEM.
+	"""
+	if len(data) == 0:
+		raise C1222ReadTableError('could not read table id: ' + str(tableid) + ', error: no data was returned')
+	try:
+		response = C1222ReadResponse.parse(data)
+	except Exception as error:
+		raise C1222ReadTableError('could not read table id: ' + str(tableid) + ', error: data read was corrupt, ' + str(error))
+	if not response.ok:
+		details = (C1222_RESPONSE_CODES.get(response.status) or 'unknown response code')
+		raise C1222ReadTableError('could not read table id: ' + str(tableid) + ', error: ' + details, response.status)
+	return response.data
+
+def check_write_response(tableid, data):
+	"""
+	Check the response to a write request.
+	
+	@type tableid: Integer
+	@param tableid: The table number which was written, used in errors.
+	
+	@type data: String
+	@param data: The response data from the EPSEM.
+	"""
+	if len(data) == 0:
+		raise C1222WriteTableError('could not write data to table id: ' + str(tableid) + ', error: no data was returned')
+	status = ord(data[0])
+	if status != 0:
+		details = (C1222_RESPONSE_CODES.get(status) or 'unknown response code')
+		raise C1222WriteTableError('could not write data to table id: ' + str(tableid) + ', error: ' + details, status)
+	return None
+
+class C1222Future(object):
+	"""
+	A response to a request which has been sent but not necessarily
+	received yet.  Calling result will receive and dispatch responses from
+	the connection until this one has arrived.
+	"""
+	def __init__(self, connection, invocation_id, request):
+		self.connection = connection
+		self.invocation_id = invocation_id
+		self.request = request
+		self.done = False
+		self.__result__ = None
+		self.__error__ = None
+		self.__callbacks__ = []
+	
+	def __repr__(self):
+		return '<' + self.__class__.__name__ + ' invocation_id=' + str(self.invocation_id) + ' done=' + str(self.done) + ' >'
+	
+	def __complete__(self):
+		self.done = True
+		callbacks = self.__callbacks__
+		self.__callbacks__ = []
+		for callback in callbacks:
+			callback(self)
+	
+	def set_result(self, result):
+		self.__result__ = result
+		self.__complete__()
+	
+	def set_exception(self, error):
+		self.__error__ = error
+		self.__complete__()
+	
+	def exception(self):
+		return self.__error__
+	
+	def add_done_callback(self, callback):
+		"""
+		Call callback with this future as it's only argument once it is
+		done, immediately if it already is.
+		"""
+		if self.done:
+			callback(self)
+		else:
+			self.__callbacks__.append(callback)
+	
+	def chain(self, function):
+		"""
+		Return a new future which is completed with the result of calling
+		function on the result of this one.  Errors are passed through.
+		
+		@type function: Function
+		@param function: The function to transform the result with.
+		"""
+		future = C1222Future(self.connection, self.invocation_id, self.request)
+		def on_done(done):
+			if done.__error__ != None:
+				future.set_exception(done.__error__)
+				return
+			try:
+				future.set_result(function(done.__result__))
+			except Exception as error:
+				future.set_exception(error)
+		self.add_done_callback(on_done)
+		return future
+	
+	def result(self):
+		"""
+		Return the response, blocking until it has been received.
+		"""
+		while not self.done:
+			self.connection.dispatch()
+		if self.__error__ != None:
+			raise self.__error__
+		return self.__result__
+	
+	def response(self):
+		"""
+		Return the response parsed into the c1222.data.C1222Response class
+		for the request, blocking until it has been received.  When several
+		requests were sent together a list of responses is returned.
+		"""
+		result = self.result()
+		if not isinstance(self.request, list):
+			return self.request.parse_response(str(result.data))
+		return [request.parse_response(str(service)) for request, service in zip(self.request, result.services)]
+
 class Connection:
 	def __init__(self, host, called_ap, calling_ap, enable_cache = True, bind_host = ('', 1153)):
 		self.logger = logging.getLogger('c1222.connection')
 		self.loggerio = logging.getLogger('c1222.connection.io')
 		
 		self.read_timeout = 3.0
+		self.max_segment_size = 4096
 		self.server_sock_h = None
 		self.read_sock_h = None
+		self.__recv_buffer__ = bytearray()
+		self.__recv_apdus__ = deque()
+		self.__recv_chunk__ = bytearray(8192)
+		self.__pending__ = OrderedDict()
+		self.__untracked__ = OrderedDict()
+		self.__unsolicited__ = deque()
 		self.bind_host = bind_host
-		self.start_listener()
+		if bind_host != None:
+			self.start_listener()
 		
 		self.host = host
 		self.sock_h = socket.create_connection(host)
@@ -57,6 +197,8 @@ class Connection:
 		self.calling_ap = calling_ap
 		
 		self.logged_in = False
+		self.identity = None
+		self.session_idle_timeout = None
 		self.__initialized__ = False
 		self.c1219_endian = '<'
 		self.caching_enabled = enable_cache
@@ -79,48 +221,527 @@ class Connection:
 		self.server_sock_h.close()
 		self.server_sock_h = None
 
-	def recv(self):
+	def select_read_sock(self):
+		"""
+		Wait for either the outbound socket or a connection to the listener
+		to become readable and use it for reading responses.
+		"""
+		if self.server_sock_h == None:
+			self.read_sock_h = self.sock_h
+			return
+		readable = select([self.sock_h.fileno(), self.server_sock_h.fileno()], [], [], self.read_timeout)
+		readable = readable[0]
+		if len(readable) > 1:
+			raise C1222IOError('too many file handles available for reading')
+		if len(readable) < 1:
+			raise C1222IOError('not enough file handles available for reading')
+		readable = readable[0]
+		if readable == self.server_sock_h.fileno():
+			(self.read_sock_h, addr) = self.server_sock_h.accept()
+			self.logger.info("received connection from {0}:{1}".format(addr[0], addr[1]))
+			self.stop_listener()
+		elif readable == self.sock_h.fileno():
+			self.read_sock_h = self.sock_h
+			self.stop_listener()
+		else:
+			raise C1222IOError('unknown file handle is available for reading')
+
+	def __split_apdus__(self):
+		try:
+			self.__recv_apdus__.extend(split_apdus(self.__recv_buffer__))
+		except ValueError as error:
+			del self.__recv_buffer__[:]
+			raise C1222IOError('invalid data received: ' + str(error))
+
+	def __pop_apdu__(self):
+		if not self.__recv_apdus__:
+			self.__split_apdus__()
+		if not self.__recv_apdus__:
+			return None
+		return self.__recv_apdus__.popleft()
+
+	@property
+	def apdus_pending(self):
+		"""
+		Whether or not a complete APDU has already been received and is
+		waiting to be returned by recv_apdu.
+		"""
+		if not self.__recv_apdus__:
+			self.__split_apdus__()
+		return len(self.__recv_apdus__) > 0
+
+	def recv_apdu(self):
+		"""
+		Receive a single, complete ACSE APDU.  The tag and BER length are
+		used to determine how much data to read so this returns as soon as
+		the APDU has arrived, any additional data that was received is kept
+		for subsequent calls.
+		"""
+		apdu = self.__pop_apdu__()
+		if apdu != None:
+			return apdu
 		if self.read_sock_h == None:
-			readable = select([self.sock_h.fileno(), self.server_sock_h.fileno()], [], [], self.read_timeout)
-			readable = readable[0]
-			if len(readable) > 1:
-				raise C1222IOError('too many file handles available for reading')
-			if len(readable) < 1:
-				raise C1222IOError('not enough file handles available for reading')
-			readable = readable[0]
-			if readable == self.server_sock_h.fileno():
-				(self.read_sock_h, addr) = self.server_sock_h.accept()
-				self.logger.info("received connection from {0}:{1}".format(addr[0], addr[1]))
-				self.stop_listener()
-			elif readable == self.sock_h.fileno():
-				self.read_sock_h = self.sock_h
-				self.stop_listener()
-			else:
-				raise C1222IOError('unknown file handle is available for reading')
-		data = ''
-		while sock_read_ready(self.read_sock_h, self.read_timeout):
-			tmp_data = self.read_sock_h.recv(8192)
-			data += tmp_data
-			if len(tmp_data) != 8192:
-				break
-		pkt = C1222Packet.parse(data)
+			self.select_read_sock()
+		chunk = self.__recv_chunk__
+		chunk_view = memoryview(chunk)
+		deadline = time() + self.read_timeout
+		while True:
+			timeout = deadline - time()
+			if timeout <= 0 or not sock_read_ready(self.read_sock_h, timeout):
+				raise C1222IOError('timed out waiting for a complete apdu')
+			size = self.read_sock_h.recv_into(chunk)
+			if size == 0:
+				raise C1222IOError('the connection was closed')
+			self.__recv_buffer__ += chunk_view[:size]
+			apdu = self.__pop_apdu__()
+			if apdu != None:
+				self.loggerio.debug('received apdu, length: %d', len(apdu))
+				return apdu
+
+	def __unpack__(self, pkt):
 		if not isinstance(pkt.data, C1222UserInformation):
 			return pkt.data
 		return C1222EPSEM.parse(pkt.data.data)
 
+	def dispatch(self):
+		"""
+		Receive a single packet and deliver it to the request it is in
+		response to.  Responses are matched by the called AP invocation ID
+		or, when the peer does not include it, to the oldest outstanding
+		request.  Packets which do not match a request are queued to be
+		returned by recv.  If receiving fails, all of the outstanding
+		requests are failed with the same error.
+		"""
+		try:
+			pkt = C1222Packet.parse(self.recv_apdu())
+		except C1222IOError as error:
+			self.__fail_pending__(error)
+			raise error
+		invocation_id = pkt.called_ap_invocation_id
+		if invocation_id != None:
+			invocation_id = int(invocation_id)
+		if invocation_id in self.__pending__:
+			future = self.__pending__.pop(invocation_id)
+		elif invocation_id in self.__untracked__:
+			del self.__untracked__[invocation_id]
+			self.__unsolicited__.append(pkt)
+			return None
+		elif invocation_id == None and len(self.__untracked__):
+			# the oldest send is assumed to be answered first
+			self.__untracked__.popitem(last = False)
+			self.__unsolicited__.append(pkt)
+			return None
+		elif invocation_id == None and len(self.__pending__):
+			future = self.__pending__.popitem(last = False)[1]
+		else:
+			self.__unsolicited__.append(pkt)
+			return None
+		try:
+			future.set_result(self.__unpack__(pkt))
+		except Exception as error:
+			future.set_exception(error)
+		return future
+
+	def __fail_pending__(self, error):
+		pending = self.__pending__.values()
+		self.__pending__.clear()
+		self.__untracked__.clear()
+		for future in pending:
+			future.set_exception(error)
+
+	def recv(self):
+		if self.__unsolicited__:
+			return self.__unpack__(self.__unsolicited__.popleft())
+		while not self.__unsolicited__:
+			self.dispatch()
+		return self.__unpack__(self.__unsolicited__.popleft())
+
+	@property
+	def requests_pending(self):
+		"""
+		The number of requests sent with send_request which have not
+		received a response yet.
+		"""
+		return len(self.__pending__)
+
+	def __new_invocation_id__(self):
+		invocation_id = randint(0, 999999)
+		while invocation_id in self.__pending__ or invocation_id in self.__untracked__:
+			invocation_id = randint(0, 999999)
+		return invocation_id
+
 	def send(self, data):
-		pkt = C1222Packet(self.called_ap, self.calling_ap, randint(0, 999999), data = C1222UserInformation(C1222EPSEM(data)))
-		self.sock_h.send(str(pkt))
+		"""
+		Send a request without tracking the response, it will be returned
+		by recv.  Returns the calling AP invocation ID used.
+		"""
+		invocation_id = self.__new_invocation_id__()
+		pkt = C1222Packet(self.called_ap, self.calling_ap, invocation_id, data = C1222UserInformation(C1222EPSEM(data)))
+		self.sock_h.sendall(str(pkt))
+		self.__untracked__[invocation_id] = None
+		return invocation_id
+
+	def send_request(self, data):
+		"""
+		Send a request without waiting for the response.  Any number of
+		requests may be outstanding at once, the returned C1222Future is
+		completed when the matching response is received.
+		
+		@type data: c1222.data.C1222Request
+		@param data: The request to send.
+		"""
+		invocation_id = self.__new_invocation_id__()
+		future = C1222Future(self, invocation_id, data)
+		self.__pending__[invocation_id] = future
+		pkt = C1222Packet(self.called_ap, self.calling_ap, invocation_id, data = C1222UserInformation(C1222EPSEM(data)))
+		try:
+			self.sock_h.sendall(str(pkt))
+		except socket.error:
+			del self.__pending__[invocation_id]
+			raise
+		return future
+
+	def send_requests(self, requests):
+		"""
+		Pipeline several requests and return their responses in the same
+		order once they have all been received.
+		
+		@type requests: list
+		@param requests: The c1222.data.C1222Request instances to send.
+		"""
+		futures = [self.send_request(request) for request in requests]
+		return [future.result() for future in futures]
+
+	def send_batch(self, requests):
+		"""
+		Send several requests together in a single EPSEM without waiting
+		for the response.  The node processes them in order and returns
+		all of the responses in a single EPSEM, which is the result of
+		the returned C1222Future.
+
+		@type requests: list
+		@param requests: The c1222.data.C1222Request instances to send.
+		"""
+		return self.send_request(list(requests))
+
+	def request_batch(self, requests):
+		"""
+		Send several requests in a single round trip and return the raw
+		response data for each of them in the same order.  If the node
+		stopped processing the requests early, the responses which were
+		not returned are None.
+
+		@type requests: list
+		@param requests: The c1222.data.C1222Request instances to send.
+		"""
+		requests = list(requests)
+		response = self.send_batch(requests).result()
+		if not isinstance(response, C1222EPSEM):
+			raise C1222IOError('received an invalid response to the batched requests')
+		responses = [str(service) for service in response.services]
+		if len(responses) > len(requests):
+			raise C1222IOError('received more responses than requests were sent')
+		responses.extend([None] * (len(requests) - len(responses)))
+		return responses
+
+	def flush_table_cache(self):
+		self.logger.info('flushing all cached tables')
+		self.__tbl_cache__ = {}
+
+	def set_table_cache_policy(self, cache_policy):
+		if self.caching_enabled == cache_policy:
+			return
+		self.caching_enabled = cache_policy
+		if cache_policy:
+			self.logger.info('selective table caching has been enabled')
+		else:
+			self.flush_table_cache()
+			self.logger.info('selective table caching has been disabled')
+		return
+
+	def request(self, data):
+		"""
+		Send a request and wait for it's response, the raw response data is
+		returned.
+		
+		@type data: c1222.data.C1222Request
+		@param data: The request to send.
+		"""
+		response = self.send_request(data).result()
+		if isinstance(response, C1222EPSEM):
+			response = response.data
+		return str(response)
 
 	def start(self):
-		self.send(C1222IdentRequest())
+		"""
+		Send an identity request.
+		"""
 		try:
-			data = self.recv()
+			response = self.send_request(C1222IdentRequest()).response()
 		except C1222IOError:
 			self.logger.error('received incorrect response to identification service request')
 			return False
+		except Exception as error:
+			self.logger.error('received invalid response to identification service request: ' + str(error))
+			return False
+		if not response.ok:
+			self.logger.error('received incorrect response to identification service request')
+			return False
+		self.identity = response
+		self.__initialized__ = True
 		return True
 
+	def stop(self):
+		"""
+		Send a terminate request.
+		"""
+		if self.__initialized__ == True:
+			data = self.request(C1222TerminateRequest())
+			if data == '\x00':
+				self.__initialized__ = False
+				self.logged_in = False
+				return True
+		return False
+
+	def login(self, username = '0000', userid = 0, password = None):
+		"""
+		Log into the connected device.
+		
+		@type username: String (len(username) <= 10)
+		@param username: the username to log in with
+		
+		@type userid: Integer (0x0000 <= userid <= 0xffff)
+		@param userid: the userid to log in with
+		
+		@type password: String (len(password) <= 20)
+		@param password: password to log in with
+		"""
+		if password != None and len(password) > 20:
+			self.logger.error('password longer than 20 characters received')
+			raise Exception('password longer than 20 characters, login failed')
+		
+		try:
+			response = self.send_request(C1222LogonRequest(username, userid)).response()
+		except C1222IOError:
+			raise
+		except Exception as error:
+			self.logger.error('login failed, received invalid response to logon service request: ' + str(error))
+			return False
+		if not response.ok:
+			self.logger.error('login failed, user name and user id rejected')
+			return False
+		self.session_idle_timeout = response.session_idle_timeout
+		
+		if password != None:
+			try:
+				response = self.send_request(C1222SecurityRequest(password, userid)).response()
+			except C1222IOError:
+				raise
+			except Exception as error:
+				self.logger.error('login failed, received invalid response to security service request: ' + str(error))
+				return False
+			if not response.ok:
+				self.logger.error('login failed, password rejected')
+				return False
+		
+		self.logged_in = True
+		return True
+
+	def logoff(self):
+		"""
+		Send a logoff request.
+		"""
+		data = self.request(C1222LogoffRequest())
+		if data == '\x00':
+			self.logged_in = False
+			return True
+		return False
+
+	def send_password(self, password, userid = 0):
+		"""
+		Send a security request without a logon request, the response code
+		from the device is returned and 0 indicates that the password was
+		accepted.
+		
+		@type password: String (len(password) <= 20)
+		@param password: password to send
+		
+		@type userid: Integer (0x0000 <= userid <= 0xffff)
+		@param userid: the userid to send the password for
+		"""
+		data = self.request(C1222SecurityRequest(password, userid))
+		if not data:
+			return None
+		if data[0] == '\x00':
+			self.logged_in = True
+		return ord(data[0])
+
+	def get_table_data(self, tableid, octetcount = None, offset = None):
+		"""
+		Read data from a table. If successful, all of the data from the 
+		requested table will be returned.
+		
+		@type tableid: Integer (0x0000 <= tableid <= 0xffff)
+		@param tableid: The table number to read from
+		
+		@type octetcount: Integer (0x0000 <= tableid <= 0xffff)
+		@param octetcount: Limit the amount of data read, only works if 
+		the meter supports this type of reading.
+		
+		@type offset: Integer (0x000000 <= octetcount <= 0xffffff)
+		@param offset: The offset at which to start to read the data from.
+		"""
+		if self.caching_enabled and tableid in self.__cacheable_tbls__ and tableid in self.__tbl_cache__:
+			self.logger.info('returning cached table #' + str(tableid))
+			return self.__tbl_cache__[tableid]
+		data = self.request(C1222ReadRequest(tableid, offset, octetcount))
+		try:
+			data = unpack_table_data(tableid, data)
+		except C1222ReadTableError as error:
+			if octetcount == None and error.errCode == C1222_RESPONSE_CODES['rstl']:
+				data = self.__get_table_data_segmented__(tableid, offset or 0)
+			else:
+				self.logger.error(error.message)
+				raise error
+		if self.caching_enabled and tableid in self.__cacheable_tbls__ and not tableid in self.__tbl_cache__:
+			self.logger.info('cacheing table #' + str(tableid))
+			self.__tbl_cache__[tableid] = data
+		return data
+
+	def get_table_data_raw(self, tableid, octetcount = None, offset = None):
+		"""
+		Send a read request and return the response as it was received, the
+		first byte is the response code from the device.  Unlike
+		get_table_data, no error is raised if the request is rejected and
+		the table cache is not used.
+		
+		@type tableid: Integer (0x0000 <= tableid <= 0xffff)
+		@param tableid: The table number to read from
+		
+		@type octetcount: Integer (0x0000 <= tableid <= 0xffff)
+		@param octetcount: Limit the amount of data read.
+		
+		@type offset: Integer (0x000000 <= octetcount <= 0xffffff)
+		@param offset: The offset at which to start to read the data from.
+		"""
+		return self.request(C1222ReadRequest(tableid, offset, octetcount))
+
+	def get_tables_data(self, tableids):
+		"""
+		Read several tables in a single round trip, the data of each table
+		is returned in the same order as tableids.  Cached tables are not
+		requested again.
+
+		@type tableids: list
+		@param tableids: The table numbers to read.
+		"""
+		tables = {}
+		requested = []
+		for tableid in tableids:
+			if self.caching_enabled and tableid in self.__cacheable_tbls__ and tableid in self.__tbl_cache__:
+				tables[tableid] = self.__tbl_cache__[tableid]
+			elif not tableid in requested:
+				requested.append(tableid)
+		if requested:
+			responses = self.request_batch([C1222ReadRequest(tableid) for tableid in requested])
+			for tableid, data in zip(requested, responses):
+				try:
+					if data == None:
+						raise C1222ReadTableError('could not read table id: ' + str(tableid) + ', error: no response was returned')
+					data = unpack_table_data(tableid, data)
+				except C1222ReadTableError as error:
+					if data == None or error.errCode != C1222_RESPONSE_CODES['rstl']:
+						self.logger.error(error.message)
+						raise error
+					data = self.__get_table_data_segmented__(tableid, 0)
+				if self.caching_enabled and tableid in self.__cacheable_tbls__:
+					self.logger.info('cacheing table #' + str(tableid))
+					self.__tbl_cache__[tableid] = data
+				tables[tableid] = data
+		return [tables[tableid] for tableid in tableids]
+
+	def __get_table_data_segmented__(self, tableid, offset):
+		self.logger.info('table #' + str(tableid) + ' is too large to read at once, reading it in segments of ' + str(self.max_segment_size) + ' bytes')
+		segments = []
+		while True:
+			try:
+				segment = unpack_table_data(tableid, self.request(C1222ReadRequest(tableid, offset, self.max_segment_size)))
+			except C1222ReadTableError as error:
+				# reading a segment which starts at the end of the table fails
+				if segments and error.errCode in (C1222_RESPONSE_CODES['onp'], C1222_RESPONSE_CODES['iar']):
+					break
+				self.logger.error(error.message)
+				raise error
+			segments.append(segment)
+			offset += len(segment)
+			if len(segment) < self.max_segment_size:
+				break
+		return ''.join(segments)
+
+	def set_table_data(self, tableid, data, offset = None):
+		"""
+		Write data to a table.
+		
+		@type tableid: Integer (0x0000 <= tableid <= 0xffff)
+		@param tableid: The table number to write to
+		
+		@type data: String
+		@param data: The data to write into the table.
+		
+		@type offset: Integer (0x000000 <= octetcount <= 0xffffff)
+		@param offset: The offset at which to start to write the data.
+		"""
+		if len(data) > self.max_segment_size:
+			return self.__set_table_data_segmented__(tableid, data, offset or 0)
+		data = self.request(C1222WriteRequest(tableid, data, offset))
+		try:
+			check_write_response(tableid, data)
+		except C1222WriteTableError as error:
+			self.logger.error(error.message)
+			raise error
+		return None
+
+	def __set_table_data_segmented__(self, tableid, data, offset):
+		self.logger.info('writing ' + str(len(data)) + ' bytes to table #' + str(tableid) + ' in segments of ' + str(self.max_segment_size) + ' bytes')
+		futures = []
+		for position in xrange(0, len(data), self.max_segment_size):
+			futures.append(self.send_request(C1222WriteRequest(tableid, data[position:position + self.max_segment_size], offset + position)))
+		for future in futures:
+			try:
+				check_write_response(tableid, str(future.result().data))
+			except C1222WriteTableError as error:
+				self.logger.error(error.message)
+				raise error
+		return None
+
+	def run_procedure(self, process_number, std_vs_mfg, params = ''):
+		"""
+		Initiate a C1219 procedure, the request is written to table 7 and
+		the response is read from table 8.
+		
+		@type process_number: Integer (0 <= process_number <= 2047)
+		@param process_number: The numeric procedure identifier.
+		
+		@type std_vs_mfg: Boolean
+		@param std_vs_mfg: Whether the procedure is manufacturer specified
+		or not.  True is manufacturer specified.
+		
+		@type params: String
+		@param params: The parameters to pass to the procedure initiation
+		request.
+		"""
+		seqnum = randint(2, 254)
+		self.logger.info('starting procedure: ' + str(process_number) + ' (' + hex(process_number) + ') sequence number: ' + str(seqnum) + ' (' + hex(seqnum) + ')')
+		procedure_request = str(C1219ProcedureInit(self.c1219_endian, process_number, std_vs_mfg, 0, seqnum, params))
+		self.set_table_data(7, procedure_request)
+		
+		response = self.get_table_data(8)
+		if response[:3] == procedure_request[:3]:
+			return ord(response[3]), response[4:]
+		else:
+			self.logger.error('invalid response from procedure response table (table #8)')
+			raise C1219ProcedureError('invalid response from procedure response table (table #8)')
+
 	def close(self):
 		self.sock_h.close()
 		if self.read_sock_h != None:
@@ -17,30 +17,115 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #  MA 02110-1301, USA.
 
-from struct import pack, unpack
-from c1222.utils import data_chksum, data_chksum_str
+from struct import pack, unpack, unpack_from
+from c1222.utils import data_chksum, data_chksum_str, ber_decode_length, ber_encode_length, ber_element_size
+from c1222.utils import ber_encode_context_oid, ber_decode_context_oid, ber_encode_context_integer, ber_decode_context_integer
 from pyasn1.type import tag
 from pyasn1.type import univ
 from pyasn1.codec.ber import encoder as ber_encoder
 from pyasn1.codec.ber import decoder as ber_decoder
 
+C1222_RESPONSE_CODES = {
+	0: 'ok (Acknowledge)',
+	1: 'err (Error)',
+	2: 'sns (Service Not Supported)',
+	3: 'isc (Insufficient Security Clearance)',
+	4: 'onp (Operation Not Possible)',
+	5: 'iar (Inappropriate Action Requested)',
+	6: 'bsy (Device Busy)',
+	7: 'dnr (Data Not Ready)',
+	8: 'dlk (Data Locked)',
+	9: 'rno (Renegotiate Request)',
+	10: 'isss (Invalid Service Sequence State)',
+	11: 'nett (Network Timeout)',
+	12: 'netr (Network Not Reachable)',
+	13: 'rqtl (Request Too Large)',
+	14: 'rstl (Response Too Large)',
+	15: 'sgnp (Segmentation Not Possible)',
+	16: 'sgerr (Segmentation Error)',
+
+	'ok':    0,
+	'err':   1,
+	'sns':   2,
+	'isc':   3,
+	'onp':   4,
+	'iar':   5,
+	'bsy':   6,
+	'dnr':   7,
+	'dlk':   8,
+	'rno':   9,
+	'isss':  10,
+	'nett':  11,
+	'netr':  12,
+	'rqtl':  13,
+	'rstl':  14,
+	'sgnp':  15,
+	'sgerr': 16,
+}
+
+C1222_IDENT_FEATURE_END = 0x00
+C1222_IDENT_FEATURE_SECURITY_MECHANISM = 0x04
+C1222_IDENT_FEATURE_SESSION_CTRL = 0x05
+C1222_IDENT_FEATURE_DEVICE_CLASS = 0x06
+C1222_IDENT_FEATURE_DEVICE_IDENTITY = 0x07
+
 class C1222CallingAPTitle(univ.ObjectIdentifier):
 	tagSet = univ.ObjectIdentifier.tagSet.tagExplicitly(tag.Tag(tag.tagClassContext, tag.tagFormatConstructed, 6))
 	
 	def encode(self):
-		return ber_encoder.encode(self)
+		try:
+			return ber_encode_context_oid(6, self.asTuple())
+		except ValueError:
+			return ber_encoder.encode(self)
+	
+	@classmethod
+	def decode(cls, data):
+		try:
+			return cls(ber_decode_context_oid(6, data))
+		except ValueError:
+			return ber_decoder.decode(data, asn1Spec = cls())[0]
 
 class C1222CallingAPInvocationID(univ.Integer):
 	tagSet = univ.Integer.tagSet.tagExplicitly(tag.Tag(tag.tagClassContext, tag.tagFormatConstructed, 8))
 	
 	def encode(self):
-		return ber_encoder.encode(self)
+		return ber_encode_context_integer(8, int(self))
+	
+	@classmethod
+	def decode(cls, data):
+		try:
+			return cls(ber_decode_context_integer(8, data))
+		except ValueError:
+			return ber_decoder.decode(data, asn1Spec = cls())[0]
+
+class C1222CalledAPInvocationID(univ.Integer):
+	tagSet = univ.Integer.tagSet.tagExplicitly(tag.Tag(tag.tagClassContext, tag.tagFormatConstructed, 4))
+	
+	def encode(self):
+		return ber_encode_context_integer(4, int(self))
+	
+	@classmethod
+	def decode(cls, data):
+		try:
+			return cls(ber_decode_context_integer(4, data))
+		except ValueError:
+			return ber_decoder.decode(data, asn1Spec = cls())[0]
 
 class C1222CalledAPTitle(univ.ObjectIdentifier):
 	tagSet = univ.ObjectIdentifier.tagSet.tagExplicitly(tag.Tag(tag.tagClassContext, tag.tagFormatConstructed, 2))
 	
 	def encode(self):
-		return ber_encoder.encode(self)
+		try:
+			return ber_encode_context_oid(2, self.asTuple())
+		except ValueError:
+			return ber_encoder.encode(self)
+	
+	@classmethod
+	def decode(cls, data):
+		try:
+			return cls(ber_decode_context_oid(2, data))
+		except ValueError:
+			return ber_decoder.decode(data, asn1Spec = cls())[0]
 
 class C1222Data(object):
 	"""
@@ -61,7 +146,17 @@ class C1222Data(object):
 
 class C1222EPSEM(C1222Data):
 	def __init__(self, data, ed_class = ''):
-		self.data = data
+		"""
+		An EPSEM envelope carrying one or more services.
+
+		@type data: C1222Request, String or list
+		@param data: The service to send or a list of services which are
+		sent together and processed by the node in order.
+		"""
+		if isinstance(data, (list, tuple)):
+			self.services = list(data)
+		else:
+			self.services = [data]
 		# flags
 		self.reserved = False
 		self.recovery = False
@@ -71,7 +166,17 @@ class C1222EPSEM(C1222Data):
 		self.response_mode = 0
 	
 	def __repr__(self):
+		if len(self.services) > 1:
+			return '<C1222EPSEM services=' + str(len(self.services)) + ' >'
 		return '<C1222EPSEM data=0x' + str(self.data).encode('hex') + ' data_len=' + str(len(self.data)) + ' >'
+
+	@property
+	def data(self):
+		return self.services[0]
+
+	@data.setter
+	def data(self, value):
+		self.services[0] = value
 	
 	@staticmethod
 	def parse(data):
@@ -87,15 +192,26 @@ class C1222EPSEM(C1222Data):
 		response_mode = (flags & 3)
 		if ed_class:
 			ed_class = data[1:5]
-			length = ord(data[5])
-			data = data[6:]
+			offset = 5
 		else:
 			ed_class = ''
-			length = ord(data[1])
-			data = data[2:]
-		if length != len(data):
+			offset = 1
+		services = []
+		while offset < len(data):
+			length = ber_decode_length(data, offset)
+			if length == None:
+				raise Exception('invalid data (size)')
+			offset += length[1]
+			length = length[0]
+			if length == 0:
+				break
+			if offset + length > len(data):
+				raise Exception('invalid data (size)')
+			services.append(data[offset:offset + length])
+			offset += length
+		if not services:
 			raise Exception('invalid data (size)')
-		epsem = C1222EPSEM(data, ed_class)
+		epsem = C1222EPSEM(services, ed_class)
 		epsem.reserved = reserved
 		epsem.recovery = recovery
 		epsem.proxy_service = proxy_service
@@ -111,8 +227,12 @@ class C1222EPSEM(C1222Data):
 		flags |= (int(bool(self.ed_class)) << 4)
 		flags |= (self.security_mode << 2)
 		flags |= (self.response_mode)
-		data = str(self.data)
-		return chr(flags) + self.ed_class + chr(len(data)) + data
+		packet = [chr(flags), self.ed_class]
+		for service in self.services:
+			service = str(service)
+			packet.append(ber_encode_length(len(service)))
+			packet.append(service)
+		return ''.join(packet)
 
 class C1222UserInformation(C1222Data):
 	def __init__(self, data):
@@ -122,27 +242,20 @@ class C1222UserInformation(C1222Data):
 	def parse(data):
 		if len(data) < 6:
 			raise Exception('invalid data (size)')
-		if data[0] != '\xbe':
-			raise Exception('invalid start byte')
-		if ord(data[1]) != len(data[2:]):
-			raise Exception('invalid data (size)')
-		
-		if data[2] != '\x28':
-			raise Exception('invalid start byte')
-		if ord(data[3]) != len(data[4:]):
-			raise Exception('invalid data (size)')
-		
-		if data[4] != '\x81':
-			raise Exception('invalid start byte')
-		if ord(data[5]) != len(data[6:]):
-			raise Exception('invalid data (size)')
-		return C1222UserInformation(data[6:])
+		for start_byte in ('\xbe', '\x28', '\x81'):
+			if data[:1] != start_byte:
+				raise Exception('invalid start byte')
+			length = ber_decode_length(data)
+			if length == None or length[0] != len(data) - 1 - length[1]:
+				raise Exception('invalid data (size)')
+			data = data[1 + length[1]:]
+		return C1222UserInformation(data)
 
 	def do_build(self):
 		data = str(self.data)
-		data = '\x81' + chr(len(data)) + data
-		data = '\x28' + chr(len(data)) + data
-		data = '\xbe' + chr(len(data)) + data
+		data = '\x81' + ber_encode_length(len(data)) + data
+		data = '\x28' + ber_encode_length(len(data)) + data
+		data = '\xbe' + ber_encode_length(len(data)) + data
 		return data
 
 class C1222Request(C1222Data):
@@ -176,6 +289,16 @@ class C1222Request(C1222Data):
 			raise ValueError('userid must be between 0x0000 and 0xffff')
 		self.__userid__ = pack(">H", userid)
 
+	def parse_response(self, data):
+		"""
+		Parse the response data to this request into an instance of the
+		appropriate C1222Response class.
+
+		@type data: String
+		@param data: The raw response data.
+		"""
+		return C1222_RESPONSE_TYPES.get(self.name, C1222Response).parse(data)
+
 class C1222DisconnectRequest(C1222Request):
 	disconnect = '\x22'
 	
@@ -228,9 +351,9 @@ class C1222ReadRequest(C1222Request):
 
 	def __init__(self, tableid, offset = None, octetcount = None):
 		self.set_tableid(tableid)
-		if (offset != None and offset != 0) and (octetcount != None and octetcount != 0):
+		if octetcount != None and octetcount != 0:
 			self.read = '\x3f'
-			self.set_offset(offset)
+			self.set_offset(offset or 0)
 			self.set_octetcount(octetcount)
 
 	def do_build(self):
@@ -311,7 +434,7 @@ class C1222WriteRequest(C1222Request):
 	def __init__(self, tableid, data, offset = None):
 		self.set_tableid(tableid)
 		self.set_data(data)
-		if offset != None and offset != 0:
+		if offset != None:
 			self.write = '\x4f'
 			self.set_offset(offset)
 	
@@ -334,6 +457,171 @@ class C1222WriteRequest(C1222Request):
 		self.__data__ = data
 		self.__datalen__ = pack('>H', len(data))
 
+class C1222Response(C1222Data):
+	"""
+	The response to a single service request.  Responses to services which
+	return nothing but the status code are instances of this class.
+	"""
+	def __init__(self, status = 0):
+		self.status = status
+
+	def __repr__(self):
+		return '<' + self.__class__.__name__ + ' status=' + self.status_name + ' >'
+
+	@property
+	def ok(self):
+		return self.status == 0
+
+	@property
+	def status_name(self):
+		return C1222_RESPONSE_CODES.get(self.status, 'unknown response code').split(' ', 1)[0]
+
+	@classmethod
+	def parse(cls, data):
+		"""
+		Parse the response data from an EPSEM service.  The body is only
+		parsed when the status is ok, error responses are returned as an
+		instance of cls without any of it's fields set.
+
+		@type data: String
+		@param data: The raw response data.
+		"""
+		if len(data) < 1:
+			raise Exception('invalid data (size)')
+		response = cls.__new__(cls)
+		C1222Response.__init__(response, ord(data[0]))
+		if response.status == 0:
+			response.parse_body(data, 1)
+		return response
+
+	def parse_body(self, data, offset):
+		if len(data) != offset:
+			raise Exception('invalid data (size)')
+
+	def do_build(self):
+		return chr(self.status)
+
+class C1222ReadResponse(C1222Response):
+	def __init__(self, data = '', status = 0):
+		C1222Response.__init__(self, status)
+		self.data = data
+
+	def __repr__(self):
+		if not self.ok:
+			return C1222Response.__repr__(self)
+		return '<' + self.__class__.__name__ + ' count=' + str(self.count) + ' >'
+
+	@property
+	def count(self):
+		return len(self.data)
+
+	def parse_body(self, data, offset):
+		if len(data) < offset + 3:
+			raise Exception('invalid data (size)')
+		count = unpack_from('>H', data, offset)[0]
+		offset += 2
+		if len(data) != offset + count + 1:
+			raise Exception('invalid data (size)')
+		self.data = data[offset:offset + count]
+		self.checksum = ord(data[offset + count])
+		if data_chksum(self.data) != self.checksum:
+			raise Exception('invalid data (checksum)')
+
+	def do_build(self):
+		if not self.ok:
+			return C1222Response.do_build(self)
+		return chr(self.status) + pack('>H', len(self.data)) + self.data + data_chksum_str(self.data)
+
+class C1222LogonResponse(C1222Response):
+	def __init__(self, session_idle_timeout = 0, status = 0):
+		C1222Response.__init__(self, status)
+		self.session_idle_timeout = session_idle_timeout
+
+	def parse_body(self, data, offset):
+		if len(data) != offset + 2:
+			raise Exception('invalid data (size)')
+		self.session_idle_timeout = unpack_from('>H', data, offset)[0]
+
+	def do_build(self):
+		if not self.ok:
+			return C1222Response.do_build(self)
+		return chr(self.status) + pack('>H', self.session_idle_timeout)
+
+class C1222IdentResponse(C1222Response):
+	"""
+	The response to an identification service request.  The features are
+	a list of (code, value) tuples in the order they were reported, the
+	values of the known features are also available as properties.
+	"""
+	def __init__(self, std = 0, ver = 1, rev = 0, features = None, status = 0):
+		C1222Response.__init__(self, status)
+		self.std = std
+		self.ver = ver
+		self.rev = rev
+		self.features = (features or [])
+
+	def __get_feature__(self, code):
+		for feature_code, value in self.features:
+			if feature_code == code:
+				return value
+		return None
+
+	@property
+	def security_mechanism(self):
+		return self.__get_feature__(C1222_IDENT_FEATURE_SECURITY_MECHANISM)
+
+	@property
+	def session_ctrl(self):
+		return self.__get_feature__(C1222_IDENT_FEATURE_SESSION_CTRL)
+
+	@property
+	def device_class(self):
+		return self.__get_feature__(C1222_IDENT_FEATURE_DEVICE_CLASS)
+
+	@property
+	def device_identity(self):
+		return self.__get_feature__(C1222_IDENT_FEATURE_DEVICE_IDENTITY)
+
+	def parse_body(self, data, offset):
+		if len(data) < offset + 3:
+			raise Exception('invalid data (size)')
+		(self.std, self.ver, self.rev) = unpack_from('BBB', data, offset)
+		offset += 3
+		self.features = []
+		while offset < len(data):
+			code = ord(data[offset])
+			offset += 1
+			if code == C1222_IDENT_FEATURE_END:
+				break
+			if code == C1222_IDENT_FEATURE_SESSION_CTRL:
+				size = 1
+			elif code == C1222_IDENT_FEATURE_DEVICE_IDENTITY:
+				if len(data) < offset + 2:
+					raise Exception('invalid data (size)')
+				size = 2 + ord(data[offset + 1])
+			else:
+				size = ber_element_size(data, offset)
+				if size == None:
+					raise Exception('invalid data (size)')
+			if len(data) < offset + size:
+				raise Exception('invalid data (size)')
+			self.features.append((code, data[offset:offset + size]))
+			offset += size
+
+	def do_build(self):
+		if not self.ok:
+			return C1222Response.do_build(self)
+		packet = chr(self.status) + pack('BBB', self.std, self.ver, self.rev)
+		for code, value in self.features:
+			packet += chr(code) + value
+		return packet + chr(C1222_IDENT_FEATURE_END)
+
+C1222_RESPONSE_TYPES = {
+	'Ident': C1222IdentResponse,
+	'Logon': C1222LogonResponse,
+	'Read': C1222ReadResponse,
+}
+
 class C1222Packet(C1222Request):
 	start = '\x60'
 	__length__ = '\x00'
@@ -343,30 +631,46 @@ class C1222Packet(C1222Request):
 	def parse(data):
 		if data[0] != '\x60':
 			raise Exception('invalid start byte')
-			
-		(called_ap, data) = ber_decoder.decode(data)
-		(called_ap_invocation_id, data) = ber_decoder.decode(data)
-		(calling_ap, data) = ber_decoder.decode(data)
-		(calling_ap_invocation_id , data) = ber_decoder.decode(data)
+		length = ber_decode_length(data)
+		if length == None or len(data) < 1 + length[1] + length[0]:
+			raise Exception('invalid data (size)')
+		data = data[1 + length[1]:1 + length[1] + length[0]]
+		
+		elements = {}
+		while data and data[0] != '\xbe':
+			size = ber_element_size(data)
+			if size == None or size > len(data):
+				raise Exception('invalid data (size)')
+			elements[data[0]] = data[:size]
+			data = data[size:]
 		
-		if data[0] == '\xbe':
+		if data:
 			try:
 				data = C1222UserInformation.parse(data)
 			except:
 				pass
 		
-		called_ap = C1222CalledAPTitle(called_ap)
-		calling_ap = C1222CallingAPTitle(calling_ap)
-		calling_ap_invocation_id = C1222CallingAPInvocationID(calling_ap_invocation_id)
+		if not '\xa2' in elements or not '\xa6' in elements or not '\xa8' in elements:
+			raise Exception('invalid data (missing required elements)')
+		called_ap = C1222CalledAPTitle.decode(elements['\xa2'])
+		calling_ap = C1222CallingAPTitle.decode(elements['\xa6'])
+		calling_ap_invocation_id = C1222CallingAPInvocationID.decode(elements['\xa8'])
+		called_ap_invocation_id = None
+		if '\xa4' in elements:
+			called_ap_invocation_id = C1222CalledAPInvocationID.decode(elements['\xa4'])
 		
-		frame = C1222Packet(called_ap, calling_ap, calling_ap_invocation_id, data)
+		frame = C1222Packet(called_ap, calling_ap, calling_ap_invocation_id, data, called_ap_invocation_id = called_ap_invocation_id)
 		return frame
 	
-	def __init__(self, called_ap, calling_ap, calling_ap_invocation_id, data = None, length = None):
+	def __init__(self, called_ap, calling_ap, calling_ap_invocation_id, data = None, length = None, called_ap_invocation_id = None):
 		if not isinstance(called_ap, C1222CalledAPTitle):
 			called_ap = C1222CalledAPTitle(called_ap)
 		self.called_ap = called_ap
 		
+		if called_ap_invocation_id != None and not isinstance(called_ap_invocation_id, C1222CalledAPInvocationID):
+			called_ap_invocation_id = C1222CalledAPInvocationID(called_ap_invocation_id)
+		self.called_ap_invocation_id = called_ap_invocation_id
+		
 		if not isinstance(calling_ap, C1222CallingAPTitle):
 			calling_ap = C1222CallingAPTitle(calling_ap)
 		self.calling_ap = calling_ap
@@ -399,18 +703,22 @@ class C1222Packet(C1222Request):
 	def set_data(self, value):
 		self.__data__ = value
 		length  = len(self.called_ap.encode())
+		if self.called_ap_invocation_id != None:
+			length += len(self.called_ap_invocation_id.encode())
 		length += len(self.calling_ap.encode())
 		length += len(self.calling_ap_invocation_id.encode())
 		length += len(str(self.__data__))
 		self.set_length(length)
 	
 	def set_length(self, length):
-		self.__length__ = chr(length)
+		self.__length__ = ber_encode_length(length)
 	
 	def do_build(self):
 		packet  = self.start
 		packet += self.__length__
 		packet += self.called_ap.encode()
+		if self.called_ap_invocation_id != None:
+			packet += self.called_ap_invocation_id.encode()
 		packet += self.calling_ap.encode()
 		packet += self.calling_ap_invocation_id.encode()
 		packet += str(self.__data__)
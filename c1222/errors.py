@@ -17,6 +17,8 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #  MA 02110-1301, USA.
 
+from c1219.errors import C1219IOError, C1219ReadTableError, C1219WriteTableError
+
 class C1222Error(Exception):
 	"""
 	This is a generic C1222 Error.
@@ -28,7 +30,7 @@ class C1222Error(Exception):
 	def __str__(self):
 		return repr(self.message)
 
-class C1222IOError(C1222Error):
+class C1222IOError(C1222Error, C1219IOError):
 	"""
 	Raised when there is a problem sending or receiving data.
 	"""
@@ -41,7 +43,7 @@ class C1222NegotiateError(C1222Error):
 	"""
 	pass
 
-class C1222ReadTableError(C1222Error):
+class C1222ReadTableError(C1222Error, C1219ReadTableError):
 	"""
 	Raised when a table is not successfully read.
 	
@@ -50,7 +52,7 @@ class C1222ReadTableError(C1222Error):
 	"""
 	pass
 
-class C1222WriteTableError(C1222Error):
+class C1222WriteTableError(C1222Error, C1219WriteTableError):
 	"""
 	Raised when a table is not successfully written to.
 	
@@ -0,0 +1,316 @@
+#  c1222/pool.py
+#  
+#  Copyright 2013 Spencer J. McIntyre <SMcIntyre [at] SecureState [dot] net>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+from collections import deque, OrderedDict
+from random import randint
+from select import select
+from time import time
+import logging
+import socket
+from c1222.connection import C1222Future
+from c1222.data import *
+from c1222.errors import C1222IOError
+from c1222.utils import split_apdus
+
+# the number of unsolicited packets kept until they are read with
+# get_unsolicited, older ones are discarded
+UNSOLICITED_QUEUE_SIZE = 256
+
+class C1222Channel(object):
+	"""
+	A single socket carrying C12.22 APDUs, either opened to a host or
+	accepted by the pool's listener.  Complete APDUs are framed out of the
+	received data using their BER length.
+	"""
+	def __init__(self, sock_h, host = None):
+		self.sock_h = sock_h
+		self.host = host
+		self.pending = OrderedDict()
+		self.last_activity = time()
+		self.__recv_buffer__ = bytearray()
+	
+	def __repr__(self):
+		return '<' + self.__class__.__name__ + ' host=' + str(self.host) + ' pending=' + str(len(self.pending)) + ' >'
+	
+	def fileno(self):
+		return self.sock_h.fileno()
+	
+	@property
+	def idle(self):
+		return len(self.pending) == 0
+	
+	def send(self, data):
+		self.sock_h.sendall(data)
+		self.last_activity = time()
+	
+	def feed(self, chunk):
+		"""
+		Add received data to the buffer and return a list of any APDUs
+		that are now complete.
+		"""
+		self.__recv_buffer__ += chunk
+		self.last_activity = time()
+		try:
+			return split_apdus(self.__recv_buffer__)
+		except ValueError:
+			del self.__recv_buffer__[:]
+			raise C1222IOError('invalid start byte in received data')
+	
+	def close(self):
+		self.sock_h.close()
+
+class C1222PoolSession(object):
+	"""
+	A lightweight handle for talking to one called AP title through a
+	C1222Pool.  Sessions do not own a socket, any number of them can share
+	the pool's connections.
+	"""
+	def __init__(self, pool, host, called_ap):
+		self.pool = pool
+		self.host = host
+		if not isinstance(called_ap, C1222CalledAPTitle):
+			called_ap = C1222CalledAPTitle(called_ap)
+		self.called_ap = called_ap
+	
+	def __repr__(self):
+		return '<' + self.__class__.__name__ + ' host=' + self.host[0] + ':' + str(self.host[1]) + ' called_ap=' + str(self.called_ap) + ' >'
+	
+	def send_request(self, data):
+		return self.pool.send_request(self.host, self.called_ap, data)
+	
+	def send_requests(self, requests):
+		futures = [self.send_request(request) for request in requests]
+		return [future.result() for future in futures]
+	
+	def start(self):
+		try:
+			response = self.send_request(C1222IdentRequest()).result()
+		except C1222IOError:
+			self.pool.logger.error('received incorrect response to identification service request')
+			return False
+		if not isinstance(response, C1222EPSEM) or str(response.data)[:1] != '\x00':
+			self.pool.logger.error('received incorrect response to identification service request')
+			return False
+		return True
+
+class C1222Pool(object):
+	def __init__(self, calling_ap, max_sockets = 16, bind_host = None, read_timeout = 3.0):
+		"""
+		A C12.22 client which shares a bounded set of sockets between any
+		number of called AP titles.  Connections to a host are reused
+		while they are open and requests to the same host are pipelined
+		over a single socket.  When the limit is reached the least
+		recently used idle connection is closed to make room.
+		
+		@type calling_ap: String
+		@param calling_ap: The calling AP title to send requests as.
+		
+		@type max_sockets: Integer
+		@param max_sockets: The maximum number of outbound connections.
+		
+		@type bind_host: Tuple
+		@param bind_host: An optional address to listen on for responses
+		delivered by the node connecting back, the listener is shared by
+		all sessions.
+		
+		@type read_timeout: Float
+		@param read_timeout: The number of seconds to wait for a response.
+		"""
+		self.logger = logging.getLogger('c1222.pool')
+		if not isinstance(calling_ap, C1222CallingAPTitle):
+			calling_ap = C1222CallingAPTitle(calling_ap)
+		self.calling_ap = calling_ap
+		self.max_sockets = max_sockets
+		self.read_timeout = read_timeout
+		self.channels = OrderedDict()
+		self.callback_channels = []
+		self.__pending__ = {}
+		self.__unsolicited__ = deque(maxlen = UNSOLICITED_QUEUE_SIZE)
+		self.server_sock_h = None
+		if bind_host != None:
+			self.server_sock_h = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+			self.server_sock_h.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+			self.server_sock_h.bind(bind_host)
+			self.server_sock_h.listen(socket.SOMAXCONN)
+			self.logger.info('listening for callback connections on: ' + bind_host[0] + ':' + str(bind_host[1]))
+	
+	def session(self, host, called_ap):
+		"""
+		Return a session for communicating with a called AP title through
+		the specified host.
+		
+		@type host: Tuple
+		@param host: The (address, port) of the node or relay.
+		
+		@type called_ap: String
+		@param called_ap: The AP title of the node.
+		"""
+		return C1222PoolSession(self, host, called_ap)
+	
+	@property
+	def requests_pending(self):
+		return len(self.__pending__)
+	
+	def get_unsolicited(self):
+		"""
+		Return and remove the packets which were received but did not
+		match an outstanding request, such as notifications sent by nodes.
+		"""
+		packets = list(self.__unsolicited__)
+		self.__unsolicited__.clear()
+		return packets
+	
+	def get_channel(self, host):
+		"""
+		Return an open channel to host, reusing an existing one if
+		possible.
+		"""
+		channel = self.channels.get(host)
+		if channel != None:
+			del self.channels[host]
+			self.channels[host] = channel
+			return channel
+		while len(self.channels) >= self.max_sockets:
+			idle = [chan for chan in self.channels.values() if chan.idle]
+			if idle:
+				self.close_channel(idle[0])
+				continue
+			self.dispatch()
+		channel = C1222Channel(socket.create_connection(host, self.read_timeout), host)
+		self.channels[host] = channel
+		self.logger.debug('opened a connection to: ' + host[0] + ':' + str(host[1]) + ' (' + str(len(self.channels)) + ' open)')
+		return channel
+	
+	def close_channel(self, channel, error = None):
+		channel.close()
+		if channel.host in self.channels and self.channels[channel.host] is channel:
+			del self.channels[channel.host]
+		if channel in self.callback_channels:
+			self.callback_channels.remove(channel)
+		for invocation_id, future in channel.pending.items():
+			self.__pending__.pop(invocation_id, None)
+			future.set_exception(error or C1222IOError('the connection was closed'))
+		channel.pending.clear()
+	
+	def __new_invocation_id__(self):
+		invocation_id = randint(0, 999999)
+		while invocation_id in self.__pending__:
+			invocation_id = randint(0, 999999)
+		return invocation_id
+	
+	def send_request(self, host, called_ap, data):
+		"""
+		Send a request without waiting for the response and return a
+		C1222Future for it.
+		"""
+		channel = self.get_channel(host)
+		invocation_id = self.__new_invocation_id__()
+		future = C1222Future(self, invocation_id, data)
+		pkt = C1222Packet(called_ap, self.calling_ap, invocation_id, data = C1222UserInformation(C1222EPSEM(data)))
+		try:
+			channel.send(str(pkt))
+		except socket.error as error:
+			self.close_channel(channel)
+			raise C1222IOError('could not send to ' + host[0] + ':' + str(host[1]) + ': ' + str(error))
+		self.__pending__[invocation_id] = (channel, future)
+		channel.pending[invocation_id] = future
+		return future
+	
+	def __deliver__(self, channel, apdu):
+		try:
+			pkt = C1222Packet.parse(apdu)
+		except Exception as error:
+			raise C1222IOError('received an invalid packet: ' + str(error))
+		invocation_id = pkt.called_ap_invocation_id
+		if invocation_id != None:
+			invocation_id = int(invocation_id)
+		if invocation_id in self.__pending__:
+			owner, future = self.__pending__.pop(invocation_id)
+			owner.pending.pop(invocation_id, None)
+		elif invocation_id == None and len(channel.pending):
+			invocation_id, future = channel.pending.popitem(last = False)
+			self.__pending__.pop(invocation_id, None)
+		else:
+			self.logger.debug('received an unsolicited packet from: ' + str(pkt.calling_ap))
+			self.__unsolicited__.append(pkt)
+			return
+		if not isinstance(pkt.data, C1222UserInformation):
+			future.set_result(pkt.data)
+			return
+		try:
+			future.set_result(C1222EPSEM.parse(pkt.data.data))
+		except Exception as error:
+			future.set_exception(error)
+	
+	def dispatch(self, timeout = None):
+		"""
+		Wait for data on any of the pool's sockets and deliver complete
+		responses to their requests.  Connections which have outstanding
+		requests but have not received anything within the read timeout
+		are closed and their requests are failed with a C1222IOError.
+		"""
+		if timeout == None:
+			timeout = self.read_timeout
+		readers = list(self.channels.values()) + self.callback_channels
+		if self.server_sock_h != None:
+			readers.append(self.server_sock_h)
+		if not readers:
+			raise C1222IOError('there are no open connections')
+		readable = select(readers, [], [], timeout)[0]
+		if not readable:
+			self.__expire_channels__()
+			return
+		for reader in readable:
+			if reader is self.server_sock_h:
+				(sock_h, addr) = self.server_sock_h.accept()
+				self.logger.info("received connection from {0}:{1}".format(addr[0], addr[1]))
+				self.callback_channels.append(C1222Channel(sock_h))
+				continue
+			try:
+				chunk = reader.sock_h.recv(8192)
+			except socket.error as error:
+				self.close_channel(reader, C1222IOError(str(error)))
+				continue
+			if not chunk:
+				self.close_channel(reader)
+				continue
+			try:
+				apdus = reader.feed(chunk)
+			except C1222IOError as error:
+				self.close_channel(reader, error)
+				continue
+			try:
+				for apdu in apdus:
+					self.__deliver__(reader, apdu)
+			except C1222IOError as error:
+				self.close_channel(reader, error)
+		self.__expire_channels__()
+	
+	def __expire_channels__(self):
+		expired = time() - self.read_timeout
+		for channel in list(self.channels.values()) + self.callback_channels:
+			if channel.pending and channel.last_activity <= expired:
+				self.close_channel(channel, C1222IOError('timed out waiting for a response'))
+	
+	def close(self):
+		for channel in list(self.channels.values()) + self.callback_channels:
+			self.close_channel(channel)
+		if self.server_sock_h != None:
+			self.server_sock_h.close()
+			self.server_sock_h = None
@@ -17,7 +17,7 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #  MA 02110-1301, USA.
 
-from struct import pack, unpack
+from struct import pack, unpack, unpack_from
 import string
 from binascii import hexlify, unhexlify
 import CrcMoose # Get it from: http://www.nightmare.com/~ryb/code/CrcMoose.py
@@ -26,9 +26,237 @@ crc = CrcMoose.CRC_HDLC.calcString
 crc_str = lambda x: pack("<H", crc(x))
 
 def data_chksum(data):
-	chksum = 0
-	for i in unpack('B' * len(data), data):
-		chksum += i
-	return (((chksum - 1) & 0xff) ^ 0xff)
+	return (((sum(bytearray(data)) - 1) & 0xff) ^ 0xff)
 
 data_chksum_str = lambda x: chr(data_chksum(x))
+
+def ber_decode_length(data, offset = 1):
+	"""
+	Decode the BER encoded length which starts at offset in data, both the
+	short and long forms are supported.  Returns a tuple of the length and
+	the number of bytes used to encode it, or None if data does not yet
+	contain the complete length.
+	
+	@type data: String or bytearray
+	@param data: The data to decode the length from.
+	
+	@type offset: Integer
+	@param offset: The position of the first byte of the length.
+	"""
+	if len(data) <= offset:
+		return None
+	first = unpack_from('B', data, offset)[0]
+	if not first & 0x80:
+		return (first, 1)
+	size = first & 0x7f
+	if size == 0:
+		raise ValueError('indefinite lengths are not supported')
+	if len(data) < offset + 1 + size:
+		return None
+	length = 0
+	for octet in unpack_from('B' * size, data, offset + 1):
+		length = (length << 8) | octet
+	return (length, size + 1)
+
+def ber_element_size(data, offset = 0):
+	"""
+	Calculate the total size, including the tag and length, of the BER
+	element which starts at offset in data.  Returns None if data does not
+	yet contain enough of the element to determine it's size.
+	
+	@type data: String or bytearray
+	@param data: The data containing the element.
+	
+	@type offset: Integer
+	@param offset: The position of the element's tag.
+	"""
+	length = ber_decode_length(data, offset + 1)
+	if length == None:
+		return None
+	return 1 + length[1] + length[0]
+
+def split_apdus(buffer):
+	"""
+	Remove and return all of the complete APDUs at the start of buffer,
+	any partial APDU is left in place.  Raises ValueError if the buffer
+	does not start with an ACSE APDU.
+	
+	@type buffer: bytearray
+	@param buffer: The received data, it is modified in place.
+	"""
+	apdus = []
+	while len(buffer):
+		if buffer[0] != 0x60:
+			raise ValueError('invalid start byte')
+		size = ber_element_size(buffer)
+		if size == None or len(buffer) < size:
+			break
+		apdus.append(str(buffer[:size]))
+		del buffer[:size]
+	return apdus
+
+def ber_encode_length(length):
+	"""
+	Encode a length using the BER definite form, the short form is used
+	for lengths less than 128 and the long form for everything else.
+	
+	@type length: Integer
+	@param length: The length to encode.
+	"""
+	if length < 0x80:
+		return chr(length)
+	octets = ''
+	while length:
+		octets = chr(length & 0xff) + octets
+		length >>= 8
+	return chr(0x80 | len(octets)) + octets
+
+# encodings of the small, fixed shape elements used in C12.22 packets are
+# memoized since the AP titles do not change during a session
+__ber_encode_cache__ = {}
+__ber_decode_cache__ = {}
+BER_CACHE_SIZE = 1024
+
+def __cache_set__(cache, key, value):
+	if len(cache) >= BER_CACHE_SIZE:
+		cache.clear()
+	cache[key] = value
+	return value
+
+def ber_encode_oid(oid):
+	"""
+	Encode an object identifier, including the universal tag and length.
+	
+	@type oid: String or tuple
+	@param oid: The object identifier in dotted notation or as a tuple of
+	integers.
+	"""
+	if isinstance(oid, str):
+		arcs = tuple(int(arc) for arc in oid.split('.'))
+	else:
+		arcs = tuple(oid)
+	if len(arcs) < 2 or arcs[0] > 2 or (arcs[0] < 2 and arcs[1] > 39):
+		raise ValueError('invalid object identifier')
+	body = ''
+	for arc in ((arcs[0] * 40) + arcs[1],) + arcs[2:]:
+		if arc < 0:
+			raise ValueError('invalid object identifier')
+		octets = chr(arc & 0x7f)
+		arc >>= 7
+		while arc:
+			octets = chr(0x80 | (arc & 0x7f)) + octets
+			arc >>= 7
+		body += octets
+	return '\x06' + ber_encode_length(len(body)) + body
+
+def ber_decode_oid(data):
+	"""
+	Decode an object identifier, including the universal tag and length,
+	and return it in dotted notation.
+	
+	@type data: String
+	@param data: The encoded object identifier.
+	"""
+	if data[:1] != '\x06':
+		raise ValueError('invalid tag for an object identifier')
+	length = ber_decode_length(data, 1)
+	if length == None or len(data) != 1 + length[1] + length[0] or length[0] == 0:
+		raise ValueError('invalid length for an object identifier')
+	arcs = []
+	arc = 0
+	for octet in unpack_from('B' * length[0], data, 1 + length[1]):
+		arc = (arc << 7) | (octet & 0x7f)
+		if not octet & 0x80:
+			arcs.append(arc)
+			arc = 0
+	if octet & 0x80:
+		raise ValueError('truncated object identifier')
+	first = arcs[0]
+	if first < 80:
+		arcs[0:1] = [first // 40, first % 40]
+	else:
+		arcs[0:1] = [2, first - 80]
+	return '.'.join(str(arc) for arc in arcs)
+
+def ber_encode_integer(value):
+	"""
+	Encode an integer, including the universal tag and length.
+	
+	@type value: Integer
+	@param value: The value to encode.
+	"""
+	octets = ''
+	while True:
+		octets = chr(value & 0xff) + octets
+		value >>= 8
+		if (value == 0 and not ord(octets[0]) & 0x80) or (value == -1 and ord(octets[0]) & 0x80):
+			break
+	return '\x02' + ber_encode_length(len(octets)) + octets
+
+def ber_decode_integer(data):
+	"""
+	Decode an integer, including the universal tag and length.
+	
+	@type data: String
+	@param data: The encoded integer.
+	"""
+	if data[:1] != '\x02':
+		raise ValueError('invalid tag for an integer')
+	length = ber_decode_length(data, 1)
+	if length == None or len(data) != 1 + length[1] + length[0] or length[0] == 0:
+		raise ValueError('invalid length for an integer')
+	value = 0
+	for octet in unpack_from('B' * length[0], data, 1 + length[1]):
+		value = (value << 8) | octet
+	if unpack_from('B', data, 1 + length[1])[0] & 0x80:
+		value -= 1 << (8 * length[0])
+	return value
+
+def ber_encode_context(tag, data):
+	"""
+	Wrap data in a constructed, context specific tag as is done for the
+	explicitly tagged elements of an ACSE APDU.
+	
+	@type tag: Integer
+	@param tag: The context specific tag number (less than 31).
+	
+	@type data: String
+	@param data: The encoded element to wrap.
+	"""
+	return chr(0xa0 | tag) + ber_encode_length(len(data)) + data
+
+def ber_decode_context(tag, data):
+	"""
+	Remove a constructed, context specific tag and return the element it
+	contains.
+	
+	@type tag: Integer
+	@param tag: The expected context specific tag number.
+	
+	@type data: String
+	@param data: The tagged element.
+	"""
+	if data[:1] != chr(0xa0 | tag):
+		raise ValueError('invalid context specific tag')
+	length = ber_decode_length(data, 1)
+	if length == None or len(data) != 1 + length[1] + length[0]:
+		raise ValueError('invalid length for a context specific element')
+	return data[1 + length[1]:]
+
+def ber_encode_context_oid(tag, oid):
+	key = (tag, oid)
+	if key in __ber_encode_cache__:
+		return __ber_encode_cache__[key]
+	return __cache_set__(__ber_encode_cache__, key, ber_encode_context(tag, ber_encode_oid(oid)))
+
+def ber_decode_context_oid(tag, data):
+	key = (tag, data)
+	if key in __ber_decode_cache__:
+		return __ber_decode_cache__[key]
+	return __cache_set__(__ber_decode_cache__, key, ber_decode_oid(ber_decode_context(tag, data)))
+
+def ber_encode_context_integer(tag, value):
+	return ber_encode_context(tag, ber_encode_integer(value))
+
+def ber_decode_context_integer(tag, data):
+	return ber_decode_integer(ber_decode_context(tag, data))
@@ -26,11 +26,12 @@ import logging.handlers
 from binascii import unhexlify
 from serial.serialutil import SerialException
 from framework.errors import FrameworkConfigurationError, FrameworkRuntimeError
+from framework.export import ModuleResult, open_exporter
 from framework.options import AdvancedOptions, Options
 from framework.templates import module_template, optical_module_template
+from framework.transport import open_transport
 from framework.utils import FileWalker, Namespace, GetDefaultSerialSettings
-from c1218.connection import Connection
-from c1218.errors import C1218IOError, C1218ReadTableError
+from c1219.errors import C1219IOError, C1219ReadTableError
 
 class Framework(object):
 	"""
@@ -38,7 +39,7 @@ class Framework(object):
 	manages the serial connection as well as all of the loaded 
 	modules.
 	"""
-	def __init__(self, stdout = None):
+	def __init__(self, stdout = None, load_modules = True):
 		self.modules = { }
 		self.__package__ = '.'.join(self.__module__.split('.')[:-1])
 		package_path = __import__(self.__package__, None, None, ['__path__']).__path__[0]	# that's some python black magic trickery for you
@@ -72,7 +73,7 @@ class Framework(object):
 		# on their respective types.  See framework/templates.py for more info.
 		self.options = Options(self.directories)
 		self.options.addBoolean('USECOLOR', 'enable color on the console interface', default = False)
-		self.options.addString('CONNECTION', 'serial connection string')
+		self.options.addString('CONNECTION', 'serial device or connection url (rfc2217://, socket://, c1222://)')
 		self.options.addString('USERNAME', 'serial username', default = '0000')
 		self.options.addInteger('USERID', 'serial userid', default = 0)
 		self.options.addString('PASSWORD', 'serial c12.18 password', default = '00000000000000000000')
@@ -85,6 +86,11 @@ class Framework(object):
 		self.advanced_options.addInteger('STOPBITS', 'serial connection stop bits', default = serial.STOPBITS_ONE)
 		self.advanced_options.addInteger('NBRPKTS', 'c12.18 maximum packets for reassembly', default = 2)
 		self.advanced_options.addInteger('PKTSIZE', 'c12.18 maximum packet size', default = 512)
+		self.advanced_options.addString('CAPTUREFILE', 'record the serial session to this file for replay://', required = False)
+		self.advanced_options.addString('CALLEDAP', 'c12.22 called ap title for c1222:// connections', required = False)
+		self.advanced_options.addString('CALLINGAP', 'c12.22 calling ap title for c1222:// connections', required = False)
+		self.advanced_options.addString('EXPORTFILE', 'append structured module results to this file (.gz to compress)', required = False)
+		self.advanced_options.addString('EXPORTFORMAT', 'format of the export file (jsonl, columnar)', default = 'jsonl')
 		if sys.platform.startswith('linux'):
 			self.options.setOption('USECOLOR', 'True')
 		
@@ -111,6 +117,8 @@ class Framework(object):
 		if not os.path.isdir(modules_path):
 			self.logger.critical('path to modules not found')
 			raise FrameworkConfigurationError('path to modules not found')
+		if not load_modules:
+			return
 		for module_path in FileWalker(modules_path, absolute_path = True, skip_dirs = True):
 			module_path = module_path.replace(os.path.sep, '/')
 			if not module_path.endswith('.py'):
@@ -171,7 +179,23 @@ class Framework(object):
 			raise FrameworkRuntimeError('invalid module requested for reload')
 		
 		self.logger.info('reloading module: ' + module_path)
-		module_instance = self.import_module(module_path, reload_module = True)
+		module_instance = self.load_module(module_path, reload_module = True)
+		if self.current_module != None:
+			if self.current_module.path == module_instance.path:
+				self.current_module = module_instance
+		return True
+	
+	def load_module(self, module_path, reload_module = False):
+		"""
+		Load a single module into the framework and return it.  This is
+		used to run a module without loading every module when the
+		framework was initialized with load_modules set to False.
+		
+		@type module_path: String
+		@param module_path: The path of the module to load, such as
+		'get_info'.
+		"""
+		module_instance = self.import_module(module_path, reload_module = reload_module)
 		if not isinstance(module_instance, module_template):
 			self.logger.error('module: ' + module_path + ' is not derived from the module_template class')
 			raise FrameworkRuntimeError('module: ' + module_path + ' is not derived from the module_template class')
@@ -184,10 +208,7 @@ class Framework(object):
 		module_instance.name = module_path.split('/')[-1]
 		module_instance.path = module_path
 		self.modules[module_path] = module_instance
-		if self.current_module != None:
-			if self.current_module.path == module_instance.path:
-				self.current_module = module_instance
-		return True
+		return module_instance
 	
 	def run(self, module = None):
 		if not isinstance(module, module_template) and not isinstance(self.current_module, module_template):
@@ -195,7 +216,7 @@ class Framework(object):
 		if module == None:
 			module = self.current_module
 		if isinstance(module, optical_module_template):
-			if not self.is_serial_connected:
+			if not self.is_serial_connected():
 				raise FrameworkRuntimeError('the serial interface is disconnected')
 		# if isinstance(module, rfcat_module_template):
 		# 	self.rfcat_connect()
@@ -212,8 +233,31 @@ class Framework(object):
 			raise error
 		# if isinstance(module, rfcat_module_template):
 		# 	self.rfcat_disconnect()
+		if isinstance(result, ModuleResult) and self.advanced_options['EXPORTFILE']:
+			self.export(result)
 		return result
 	
+	def export(self, result, file_h = None, export_format = None):
+		"""
+		Write a module's result to the export file.
+		
+		@type result: framework.export.ModuleResult
+		@param result: The result to export.
+		
+		@type file_h: String or file
+		@param file_h: Where to write the result, defaults to EXPORTFILE.
+		
+		@type export_format: String
+		@param export_format: The name of the exporter, defaults to
+		EXPORTFORMAT.
+		"""
+		exporter = open_exporter((export_format or self.advanced_options['EXPORTFORMAT']), (file_h or self.advanced_options['EXPORTFILE']))
+		try:
+			exporter.write(result)
+		finally:
+			exporter.close()
+		self.logger.info('exported ' + str(exporter.records_written) + ' records from module: ' + result.module)
+	
 	@property
 	def use_colors(self):
 		return self.options['USECOLOR']
@@ -310,8 +354,8 @@ class Framework(object):
 		if self.__serial_connected__:
 			try:
 				self.serial_connection.close()
-			except C1218IOError as error:
-				self.logger.error('caught C1218IOError: ' + str(error))
+			except C1219IOError as error:
+				self.logger.error('caught ' + error.__class__.__name__ + ': ' + str(error))
 			except SerialException as error:
 				self.logger.error('caught SerialException: ' + str(error))
 			self.__serial_connected__ = False
@@ -344,12 +388,20 @@ class Framework(object):
 		frmwk_serial_settings['bytesize'] = self.advanced_options['BYTESIZE']
 		frmwk_serial_settings['stopbits'] = self.advanced_options['STOPBITS']
 		
-		self.logger.info('opening serial device: ' + self.options['CONNECTION'])
+		self.logger.info('opening connection: ' + self.options['CONNECTION'])
 		
 		try:
-			self.serial_connection = Connection(self.options['CONNECTION'], c1218_settings = frmwk_c1218_settings, serial_settings = frmwk_serial_settings, enable_cache = self.advanced_options['CACHETBLS'])
+			self.serial_connection = open_transport(
+				self.options['CONNECTION'],
+				c1218_settings = frmwk_c1218_settings,
+				serial_settings = frmwk_serial_settings,
+				enable_cache = self.advanced_options['CACHETBLS'],
+				capture_file = self.advanced_options['CAPTUREFILE'],
+				called_ap = self.advanced_options['CALLEDAP'],
+				calling_ap = self.advanced_options['CALLINGAP']
+			)
 		except Exception as error:
-			self.logger.error('could not open the serial device')
+			self.logger.error('could not open the connection')
 			raise error
 		
 		try:
@@ -357,13 +409,13 @@ class Framework(object):
 			if not self.serial_connection.login(username, userid):
 				self.logger.error('the meter has rejected the username and userid')
 				raise FrameworkConfigurationError('the meter has rejected the username and userid')
-		except C1218IOError as error:
+		except C1219IOError as error:
 			self.logger.error('serial connection has been opened but the meter is unresponsive')
 			raise error
 		
 		try:
 			general_config_table = self.serial_connection.get_table_data(0)
-		except C1218ReadTableError as error:
+		except C1219ReadTableError as error:
 			self.logger.error('serial connection as been opened but the general configuration table (table #0) could not be read')
 			raise error
 		
@@ -376,7 +428,7 @@ class Framework(object):
 		
 		try:
 			self.serial_connection.stop()
-		except C1218IOError as error:
+		except C1219IOError as error:
 			self.logger.error('serial connection has been opened but the meter is unresponsive')
 			raise error
 		
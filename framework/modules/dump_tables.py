@@ -21,7 +21,7 @@ from time import sleep
 import os
 from framework.templates import optical_module_template
 from c1219.data import C1219_TABLES
-from c1218.errors import C1218ReadTableError
+from c1219.errors import C1219ReadTableError
 
 class Module(optical_module_template):
 	def __init__(self, *args, **kwargs):
@@ -48,7 +48,7 @@ class Module(optical_module_template):
 		for tableid in xrange(lower_boundary, (upper_boundary + 1)):
 			try:
 				data = conn.get_table_data(tableid)
-			except C1218ReadTableError as error:
+			except C1219ReadTableError as error:
 				data = None
 				if error.errCode == 10:	# ISSS
 					conn.stop()
@@ -58,7 +58,7 @@ class Module(optical_module_template):
 						logger.warning('meter login failed, some tables may not be accessible')
 					try:
 						data = conn.get_table_data(tableid)
-					except C1218ReadTableError as error:
+					except C1219ReadTableError as error:
 						data = None
 						if error.errCode == 10:
 							raise error	# tried to re-sync communications but failed, you should reconnect and rerun the module
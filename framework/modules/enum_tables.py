@@ -19,7 +19,7 @@
 
 from framework.templates import optical_module_template
 from time import sleep
-from c1218.data import C1218ReadRequest, C1218_RESPONSE_CODES
+from c1218.data import C1218_RESPONSE_CODES
 from c1219.data import C1219_TABLES
 
 class Module(optical_module_template):
@@ -43,7 +43,7 @@ class Module(optical_module_template):
 		self.frmwk.print_status('Enumerating tables, please wait...')
 		tables_found = 0
 		for tableid in xrange(lower_boundary, (upper_boundary + 1)):
-			data = self.get_table_data_ex(conn, tableid, 4)
+			data = conn.get_table_data_raw(tableid, 4, 0)
 			if data[0] == '\x00':
 				self.frmwk.print_status('Found readable table, ID: ' + str(tableid) + ' Name: ' + (C1219_TABLES.get(tableid) or 'UNKNOWN'))
 				tables_found += 1
@@ -62,8 +62,3 @@ class Module(optical_module_template):
 			sleep(0.25)
 		self.frmwk.print_status('Found ' + str(tables_found) + ' table(s).')
 		return
-
-	def get_table_data_ex(self, conn, tableid, octetcount = 244):
-		conn.send(C1218ReadRequest(tableid, 0, octetcount))
-		data = conn.recv()
-		return data
@@ -17,8 +17,9 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #  MA 02110-1301, USA.
 
+from framework.export import ModuleResult
 from framework.templates import optical_module_template
-from c1218.errors import C1218ReadTableError
+from c1219.errors import C1219ReadTableError
 from c1219.access.general import C1219GeneralAccess
 
 class Module(optical_module_template):
@@ -39,9 +40,9 @@ class Module(optical_module_template):
 		
 		try:
 			generalCtl = C1219GeneralAccess(conn)
-		except C1218ReadTableError:
+		except C1219ReadTableError:
 			self.frmwk.print_error('Could not read the necessary tables')
-			return
+			return False
 		conn.stop()
 		
 		meter_info = {}
@@ -80,4 +81,4 @@ class Module(optical_module_template):
 		keys.sort()
 		for key in keys:
 			self.frmwk.print_status(fmt_string.format(key, meter_info[key]))
-		return
+		return ModuleResult(self.path, [meter_info])
@@ -17,11 +17,15 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #  MA 02110-1301, USA.
 
+from framework.export import ModuleResult
 from framework.templates import optical_module_template
-from c1218.errors import C1218ReadTableError
+from c1219.errors import C1219ReadTableError
 from c1219.data import C1219_EVENT_CODES
-from c1219.access.log import C1219LogAccess
+from c1219.access.log import C1219LogAccess, C1219LogReader
+from c1219.constants import GENERAL_MFG_ID_TBL
 from struct import pack, unpack
+import json
+import os
 
 class Module(optical_module_template):
 	def __init__(self, *args, **kwargs):
@@ -29,7 +33,8 @@ class Module(optical_module_template):
 		self.version = 1
 		self.author = [ 'Spencer McIntyre <smcintyre@securestate.net>' ]
 		self.description = 'Get Information About The Meter\'s Logs'
-		self.detailed_description = 'This module reads various C1219 tables from decade 70 to gather log information from the smart meter. If successful the parsed contents of the logs will be displayed.'
+		self.detailed_description = 'This module reads various C1219 tables from decade 70 to gather log information from the smart meter. If successful the parsed contents of the logs will be displayed. If a state file is set only the entries added since the last run against the same meter are read.'
+		self.options.addString('STATEFILE', 'file to track the last log entry read from each meter in', required = False)
 	
 	def run(self):
 		conn = self.frmwk.serial_connection
@@ -37,19 +42,24 @@ class Module(optical_module_template):
 		if not self.frmwk.serial_login():	# don't alert on failed logins
 			logger.warning('meter login failed')
 		
+		state_file = self.options['STATEFILE']
 		try:
-			logCtl = C1219LogAccess(conn)
-		except C1218ReadTableError:
+			if state_file:
+				logs = self.read_new_entries(conn, state_file)
+			else:
+				logs = C1219LogAccess(conn).logs
+		except C1219ReadTableError:
 			self.frmwk.print_error('Could not read necessary tables, logging may not be enabled')
-			return
+			return False
 		conn.stop()
 		
-		if len(logCtl.logs) == 0:
-			self.frmwk.print_status('Log History Table Contains No Entries')
-			return
+		result = ModuleResult(self.path)
+		if len(logs) == 0:
+			self.frmwk.print_status('Log History Table Contains No ' + ('New ' if state_file else '') + 'Entries')
+			return result
 		else:
-			self.frmwk.print_status('Log History Table Contains ' + str(logCtl.nbr_history_entries) + ' Entries')
-		log_entry = logCtl.logs[0]
+			self.frmwk.print_status('Log History Table Contains ' + str(len(logs)) + ' ' + ('New ' if state_file else '') + 'Entries')
+		log_entry = logs[0]
 		topline = ''
 		line = ''
 		if 'Time' in log_entry:
@@ -62,7 +72,10 @@ class Module(optical_module_template):
 		line += "{0:<6} {1:<58} {2}".format('---', '----------------', '---------')
 		self.frmwk.print_line(topline)
 		self.frmwk.print_line(line)
-		for log_entry in logCtl.logs:
+		# export the time stamps as seconds since the epoch, the formatted
+		# strings are only used for display
+		times = logs.times
+		for index, log_entry in enumerate(logs):
 			line = ''
 			if 'Time' in log_entry:
 				topline += "{0:<19} ".format('Time Stamp')
@@ -72,4 +85,22 @@ class Module(optical_module_template):
 				line += "{0:<5} ".format(log_entry['Event Number'])
 			line += "{0:<6} {1:<58} {2}".format(log_entry['User ID'], C1219_EVENT_CODES[log_entry['Procedure Number']], log_entry['Arguments'].encode('hex'))
 			self.frmwk.print_line(line)
-			
+			record = dict(log_entry, Event = C1219_EVENT_CODES[log_entry['Procedure Number']], Arguments = log_entry['Arguments'].encode('hex'))
+			if times != None:
+				record['Time'] = times[index]
+			result.add(record)
+		return result
+	
+	def read_new_entries(self, conn, state_file):
+		general_mfg_table = conn.get_table_data(GENERAL_MFG_ID_TBL)
+		meter_id = general_mfg_table[0:4].strip() + ':' + general_mfg_table[16:].encode('hex')
+		state = {}
+		if os.path.isfile(state_file):
+			with open(state_file, 'r') as file_h:
+				state = json.load(file_h)
+		reader = C1219LogReader(conn, state.get(meter_id))
+		logs = reader.read_history()
+		state[meter_id] = reader.state
+		with open(state_file, 'w') as file_h:
+			json.dump(state, file_h)
+		return logs
@@ -18,7 +18,7 @@
 #  MA 02110-1301, USA.
 
 from framework.templates import optical_module_template
-from c1218.errors import C1218ReadTableError
+from c1219.errors import C1219ReadTableError
 from c1219.data import C1219_CALL_STATUS_FLAGS
 from c1219.access.telephone import C1219TelephoneAccess
 from struct import pack, unpack
@@ -39,9 +39,9 @@ class Module(optical_module_template):
 		
 		try:
 			telephoneCtl = C1219TelephoneAccess(conn)
-		except C1218ReadTableError:
+		except C1219ReadTableError:
 			self.frmwk.print_error('Could not read necessary tables, a modem is not likely present')
-			return
+			return False
 		conn.stop()
 		
 		info = {}
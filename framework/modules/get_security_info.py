@@ -17,8 +17,9 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #  MA 02110-1301, USA.
 
+from framework.export import ModuleResult
 from framework.templates import optical_module_template
-from c1218.errors import C1218ReadTableError
+from c1219.errors import C1219ReadTableError
 from c1219.access.security import C1219SecurityAccess
 from c1219.constants import C1219_TABLES, C1219_PROCEDURE_NAMES
 
@@ -38,9 +39,9 @@ class Module(optical_module_template):
 		
 		try:
 			securityCtl = C1219SecurityAccess(conn)
-		except C1218ReadTableError:
+		except C1219ReadTableError:
 			self.frmwk.print_error('Could not read necessary tables')
-			return
+			return False
 		conn.stop()
 		
 		security_info = {}
@@ -48,6 +49,8 @@ class Module(optical_module_template):
 		security_info['Max Password Length'] = securityCtl.password_len
 		security_info['Number of Keys'] = securityCtl.nbr_keys
 		security_info['Number of Permissions'] = securityCtl.nbr_perm_used
+		result = ModuleResult(self.path)
+		result.add(security_info, type = 'summary')
 		
 		self.frmwk.print_status('Security Information:')
 		fmt_string = "    {0:.<38}.{1}"
@@ -62,6 +65,7 @@ class Module(optical_module_template):
 		self.frmwk.print_status(fmt_string.format('-----', '-----------------', '-----------'))
 		for idx, entry in securityCtl.passwords.items():
 			self.frmwk.print_status(fmt_string.format(idx, entry['password'].encode('hex'), entry['groups']))
+			result.add(type = 'password', index = idx, password = entry['password'].encode('hex'), groups = entry['groups'])
 		
 		self.frmwk.print_status('Table Permissions:')
 		fmt_string = "    {0:<64} {1:<14} {2:<14}"
@@ -70,6 +74,7 @@ class Module(optical_module_template):
 		fmt_string = "    {0:.<64} {1:<14} {2:<14}"
 		for idx, entry in securityCtl.table_permissions.items():
 			self.frmwk.print_status(fmt_string.format('#' + str(idx) + ' ' + (C1219_TABLES.get(idx) or 'Unknown'), str(entry['anyread']), str(entry['anywrite'])))
+			result.add(type = 'table_permission', index = idx, name = (C1219_TABLES.get(idx) or 'Unknown'), anyread = entry['anyread'], anywrite = entry['anywrite'])
 			
 		self.frmwk.print_status('Procedure Permissions:')
 		fmt_string = "    {0:<64} {1:<14} {2:<16}"
@@ -78,6 +83,7 @@ class Module(optical_module_template):
 		fmt_string = "    {0:.<64} {1:<14} {2:<16}"
 		for idx, entry in securityCtl.procedure_permissions.items():
 			self.frmwk.print_status(fmt_string.format('#' + str(idx) + ' ' + (C1219_PROCEDURE_NAMES.get(idx) or 'Unknown'), str(entry['anyread']), str(entry['anywrite'])))
+			result.add(type = 'procedure_permission', index = idx, name = (C1219_PROCEDURE_NAMES.get(idx) or 'Unknown'), anyread = entry['anyread'], anywrite = entry['anywrite'])
 		
 		if len(securityCtl.keys):
 			self.frmwk.print_status('Stored Keys:')
@@ -86,4 +92,5 @@ class Module(optical_module_template):
 			self.frmwk.print_status(fmt_string.format('-----', '---------'))
 			for idx, entry in securityCtl.keys.items():
 				self.frmwk.print_status(fmt_string.format(idx, entry.encode('hex')))
-		return
+				result.add(type = 'key', index = idx, key = entry.encode('hex'))
+		return result
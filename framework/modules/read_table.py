@@ -19,7 +19,7 @@
 
 from framework.templates import optical_module_template
 from c1218.utils import find_strings
-from c1218.errors import C1218ReadTableError
+from c1219.errors import C1219ReadTableError
 
 class Module(optical_module_template):
 	def __init__(self, *args, **kwargs):
@@ -38,10 +38,10 @@ class Module(optical_module_template):
 			logger.warning('meter login failed')
 		try:
 			data = conn.get_table_data(tableid)
-		except C1218ReadTableError as error:
-			self.frmwk.print_error('Caught C1218ReadTableError: ' + str(error))
+		except C1219ReadTableError as error:
+			self.frmwk.print_error('Caught ' + error.__class__.__name__ + ': ' + str(error))
 			conn.stop()
-			return
+			return False
 		conn.stop()
 		
 		self.frmwk.print_status('Read ' + str(len(data)) + ' bytes')
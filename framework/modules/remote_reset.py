@@ -18,8 +18,7 @@
 #  MA 02110-1301, USA.
 
 from framework.templates import optical_module_template
-from c1219.errors import C1219ProcedureError
-from c1218.errors import C1218ReadTableError, C1218WriteTableError
+from c1219.errors import C1219ProcedureError, C1219ReadTableError, C1219WriteTableError
 
 class Module(optical_module_template):
 	def __init__(self, *args, **kwargs):
@@ -51,8 +50,10 @@ class Module(optical_module_template):
 		try:
 			errCode, data = conn.run_procedure(9, False, chr(params))
 			self.frmwk.print_good('Sucessfully Reset The Meter')
-		except (C1218ReadTableError, C1218WriteTableError, C1219ProcedureError) as error:
+		except (C1219ReadTableError, C1219WriteTableError, C1219ProcedureError) as error:
 			self.logger.error('caught ' + error.__class__.__name__ + ': ' + str(error))
 			self.frmwk.print_error('Caught ' + error.__class__.__name__ + ': ' + str(error))
+			conn.stop()
+			return False
 		conn.stop()
 		return
@@ -40,15 +40,16 @@ class Module(optical_module_template):
 			logger.info('device id stored in 20 byte string')
 			if len(meterid) > 20:
 				self.frmwk.print_error('METERID length exceeds the allowed 20 bytes')
-				return
+				return False
 		else:
 			logger.info('device id stored in BCD(10)')
 			if len(meterid) > 10:
 				self.frmwk.print_error('METERID length exceeds the allowed 10 bytes')
-				return
+				return False
 		if genCtl.set_device_id(meterid):
 			self.frmwk.print_error('Could not set the Meter\'s ID')
-		else:
-			self.frmwk.print_status('Successfully updated the Meter\'s ID to: ' + meterid)
+			conn.stop()
+			return False
+		self.frmwk.print_status('Successfully updated the Meter\'s ID to: ' + meterid)
 		conn.stop()
 		return
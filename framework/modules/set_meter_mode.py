@@ -18,9 +18,8 @@
 #  MA 02110-1301, USA.
 
 from framework.templates import optical_module_template
-from c1219.errors import C1219ProcedureError
+from c1219.errors import C1219ProcedureError, C1219ReadTableError, C1219WriteTableError
 from c1219.constants import C1219_METER_MODE_NAMES
-from c1218.errors import C1218ReadTableError, C1218WriteTableError
 
 class Module(optical_module_template):
 	def __init__(self, *args, **kwargs):
@@ -43,25 +42,27 @@ class Module(optical_module_template):
 		mode_dict = C1219_METER_MODE_NAMES
 		if not mode in mode_dict:
 			self.frmwk.print_error('unknown mode, please use METERING, TEST, METERSHOP, or FACTORY')
-			return
+			return False
 		
 		if not self.frmwk.serial_login():
 			logger.warning('meter login failed')
 			self.frmwk.print_error('Meter login failed, can not execute procedure')
-			return
+			return False
 		
 		logger.info('setting mode to: ' + mode)
 		self.frmwk.print_status('Setting Mode To: ' + mode)
 		
 		mode = mode_dict[mode]
 		errCode, data = None, ''
+		success = False
 		try:
 			errCode, data = conn.run_procedure(6, False, chr(mode))
 			self.frmwk.print_good('Sucessfully Changed The Mode')
-		except C1218ReadTableError as error:
+			success = True
+		except C1219ReadTableError as error:
 			logger.error('caught ' + error.__class__.__name__ + ': ' + str(error))
 			self.frmwk.print_error('Caught ' + error.__class__.__name__ + ': ' + str(error))
-		except C1218WriteTableError as error:
+		except C1219WriteTableError as error:
 			if error.errCode == 4:	# onp/operation not possible
 				self.frmwk.print_error('Meter responded that it can not set the mode to the desired type')
 			else:
@@ -71,4 +72,4 @@ class Module(optical_module_template):
 			logger.error('caught ' + error.__class__.__name__ + ': ' + str(error))
 			self.frmwk.print_error('Caught ' + error.__class__.__name__ + ': ' + str(error))
 		conn.stop()
-		return
+		return success
@@ -20,7 +20,7 @@
 import re
 from binascii import unhexlify
 from framework.templates import optical_module_template
-from c1218.errors import C1218WriteTableError
+from c1219.errors import C1219WriteTableError
 
 class Module(optical_module_template):
 	def __init__(self, *args, **kwargs):
@@ -44,17 +44,19 @@ class Module(optical_module_template):
 			hex_regex = re.compile('^([0-9a-fA-F]{2})+$')
 			if hex_regex.match(data) == None:
 				self.frmwk.print_error('Non-hex characters found in \'DATA\'')
-				return
+				return False
 			data = unhexlify(data)
 		
 		if not self.frmwk.serial_login():
 			logger.warning('meter login failed')
 			self.frmwk.print_error('Meter login failed')
-			return
+			return False
 		
 		try:
 			conn.set_table_data(tableid, data, offset)
 			self.frmwk.print_status('Successfully Wrote Data')
-		except C1218WriteTableError as error:
-			self.frmwk.print_error('Caught C1218WriteTableError: ' + str(error))
+		except C1219WriteTableError as error:
+			self.frmwk.print_error('Caught ' + error.__class__.__name__ + ': ' + str(error))
+			conn.stop()
+			return False
 		conn.stop()
@@ -0,0 +1,153 @@
+#  framework/transport.py
+#  
+#  Copyright 2013 Spencer J. McIntyre <SMcIntyre [at] SecureState [dot] net>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+import abc
+import urlparse
+from framework.errors import FrameworkConfigurationError
+import c1218.connection
+import c1222.connection
+
+TRANSPORT_FACTORIES = {}
+
+class Transport(object):
+	"""
+	The interface which connections to a meter provide, modules are
+	written against this so they can run over any registered transport.
+	c1218.connection.Connection and c1222.connection.Connection are both
+	registered as implementations.
+	"""
+	__metaclass__ = abc.ABCMeta
+	
+	@abc.abstractmethod
+	def start(self):
+		"""Initialize communications with the device."""
+		pass
+	
+	@abc.abstractmethod
+	def stop(self):
+		"""End communications with the device."""
+		pass
+	
+	@abc.abstractmethod
+	def login(self, username = '0000', userid = 0, password = None):
+		"""Log into the device, returns True on success."""
+		pass
+	
+	@abc.abstractmethod
+	def logoff(self):
+		"""Log off of the device."""
+		pass
+	
+	@abc.abstractmethod
+	def send_password(self, password, userid = 0):
+		"""
+		Send only a security request within the current session and return
+		the response code, 0 indicates that the password was accepted.
+		"""
+		pass
+	
+	@abc.abstractmethod
+	def get_table_data(self, tableid, octetcount = None, offset = None):
+		"""Read and return data from a table."""
+		pass
+	
+	@abc.abstractmethod
+	def get_table_data_raw(self, tableid, octetcount = None, offset = None):
+		"""
+		Send a read request and return the response from the device as is,
+		the first byte is the response code.  No error is raised when the
+		request is rejected.
+		"""
+		pass
+	
+	@abc.abstractmethod
+	def set_table_data(self, tableid, data, offset = None):
+		"""Write data to a table."""
+		pass
+	
+	@abc.abstractmethod
+	def run_procedure(self, process_number, std_vs_mfg, params = ''):
+		"""Run a C12.19 procedure and return the result code and data."""
+		pass
+	
+	@abc.abstractmethod
+	def close(self):
+		"""Close the underlying connection."""
+		pass
+
+Transport.register(c1218.connection.Connection)
+Transport.register(c1222.connection.Connection)
+
+def register_transport(scheme, factory):
+	"""
+	Register a function to open connections for URLs using scheme.  The
+	factory is called with the connection string and the settings passed
+	to open_transport as keyword arguments and must return a Transport.
+	
+	@type scheme: String
+	@param scheme: The URL scheme such as 'c1222', or None for strings
+	without a scheme such as serial device paths.
+	
+	@type factory: Function
+	@param factory: The function to create the connection with.
+	"""
+	TRANSPORT_FACTORIES[scheme] = factory
+
+def get_transport_scheme(connection_string):
+	if not '://' in connection_string:
+		return None
+	return connection_string.split('://', 1)[0].lower()
+
+def open_transport(connection_string, **settings):
+	"""
+	Open a connection to a meter using the transport registered for the
+	scheme of connection_string.
+	
+	@type connection_string: String
+	@param connection_string: The device or URL to connect to.
+	"""
+	scheme = get_transport_scheme(connection_string)
+	factory = TRANSPORT_FACTORIES.get(scheme)
+	if factory == None:
+		raise FrameworkConfigurationError('no transport is available for the connection scheme: ' + str(scheme))
+	return factory(connection_string, **settings)
+
+def open_c1218(connection_string, c1218_settings = {}, serial_settings = None, enable_cache = True, capture_file = None, **kwargs):
+	return c1218.connection.Connection(connection_string, c1218_settings = c1218_settings, serial_settings = serial_settings, enable_cache = enable_cache, capture_file = capture_file)
+
+def open_c1222(connection_string, enable_cache = True, called_ap = None, calling_ap = None, **kwargs):
+	"""
+	Open a C12.22 connection from a URL in the format of
+	c1222://host:port/called_ap?calling_ap=calling_ap, the AP titles may
+	be omitted from the URL and passed as settings instead.
+	"""
+	url = urlparse.urlsplit(connection_string)
+	query = urlparse.parse_qs(url.query)
+	called_ap = url.path.strip('/') or called_ap
+	calling_ap = query.get('calling_ap', [calling_ap])[0]
+	if not url.hostname:
+		raise FrameworkConfigurationError('the c12.22 connection string must include a host')
+	if not called_ap or not calling_ap:
+		raise FrameworkConfigurationError('the c12.22 called and calling ap titles must be set')
+	return c1222.connection.Connection((url.hostname, (url.port or 1153)), called_ap, calling_ap, enable_cache = enable_cache, bind_host = None)
+
+register_transport(None, open_c1218)
+for scheme in ('rfc2217', 'socket', 'loop', 'hwgrep', 'spy', 'replay'):
+	register_transport(scheme, open_c1218)
+register_transport('c1222', open_c1222)
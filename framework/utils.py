@@ -18,9 +18,13 @@
 #  MA 02110-1301, USA.
 
 import os
+import bz2
 import copy
+import gzip
+import mmap
+import string
 import serial
-import itertools
+from binascii import unhexlify
 
 DEFAULT_SERIAL_SETTINGS = {
 	'parity': serial.PARITY_NONE,
@@ -134,9 +138,12 @@ def unique(seq, idfunc = None):
 	return preserved_type(result)
 
 class StringGenerator:
-	def __init__(self, startlen, endlen = None, charset = None):
+	def __init__(self, startlen, endlen = None, charset = None, start = 0, stop = None):
 		"""
-		This class is used to generate raw strings for bruteforcing.
+		This class is used to generate raw strings for bruteforcing.  The
+		strings make up a keyspace which is ordered first by length and
+		then by character, each string can be retreived by it's index so
+		the keyspace can be split up and resumed at an arbitrary position.
 		
 		@type startlen: Integer
 		@param startlen: The minimum size of the string to bruteforce.
@@ -147,6 +154,14 @@ class StringGenerator:
 		@type charset: String, Tuple or None
 		@param charset: the character set to use while generating the 
 		strings.  If None, the full binary space will be used (0 - 255).
+		
+		@type start: Integer
+		@param start: The index of the first string in the keyspace to
+		generate.
+		
+		@type stop: Integer or None
+		@param stop: The index to stop generating strings at, if None the
+		entire keyspace will be generated.
 		"""
 		self.startlen = startlen
 		if endlen == None:
@@ -160,11 +175,278 @@ class StringGenerator:
 		charset = unique(charset)
 		charset.sort()
 		self.charset = tuple(charset)
+		self.__buckets__ = []
+		for length in xrange(self.startlen, self.endlen + 1):
+			self.__buckets__.append((length, len(self.charset) ** length))
+		self.size = sum(size for length, size in self.__buckets__)
+		self.start = max(start, 0)
+		if stop == None:
+			self.stop = self.size
+		else:
+			self.stop = min(stop, self.size)
+		self.stop = max(self.stop, self.start)
+		self.position = self.start
+	
+	def __repr__(self):
+		return '<' + self.__class__.__name__ + ' start: ' + str(self.start) + ' stop: ' + str(self.stop) + ' position: ' + str(self.position) + ' >'
+	
+	def __len__(self):
+		"""
+		The number of strings within this generator's range.  Large
+		keyspaces can not be represented by len() and will raise an
+		OverflowError, use the count property instead.
+		"""
+		return self.count
+	
+	@property
+	def count(self):
+		return self.stop - self.start
+	
+	@property
+	def remaining(self):
+		return self.stop - self.position
+	
+	def __getitem__(self, index):
+		"""
+		Return the string at the index relative to the start of this
+		generator's range.
+		
+		@type index: Integer
+		@param index: The index of the string to retreive.
+		"""
+		if index < 0:
+			index += self.count
+		if not 0 <= index < self.count:
+			raise IndexError('index out of range')
+		return self.decode(self.start + index)
+	
+	def __locate__(self, index):
+		for length, size in self.__buckets__:
+			if index < size:
+				return length, index
+			index -= size
+		raise IndexError('index out of range')
+	
+	def __digits__(self, index, length):
+		radix = len(self.charset)
+		digits = [0] * length
+		position = length - 1
+		while position >= 0:
+			index, digits[position] = divmod(index, radix)
+			position -= 1
+		return digits
+	
+	def decode(self, index):
+		"""
+		Return the string at an absolute index within the keyspace.
+		
+		@type index: Integer
+		@param index: The index of the string to retreive.
+		"""
+		length, index = self.__locate__(index)
+		return ''.join([self.charset[digit] for digit in self.__digits__(index, length)])
+	
+	def slice(self, start, stop):
+		"""
+		Return a new generator for a portion of this generator's range.
+		
+		@type start: Integer
+		@param start: The relative index to start the new generator at.
+		
+		@type stop: Integer
+		@param stop: The relative index to stop the new generator at.
+		"""
+		start = min(self.start + max(start, 0), self.stop)
+		stop = min(self.start + max(stop, 0), self.stop)
+		return StringGenerator(self.startlen, self.endlen, list(self.charset), start, stop)
+	
+	def split(self, parts):
+		"""
+		Split this generator's range into a list of generators of nearly
+		equal size, for example to distribute the work between processes.
+		
+		@type parts: Integer
+		@param parts: The number of generators to split the range into.
+		"""
+		count = self.count
+		return [self.slice((count * part) // parts, (count * (part + 1)) // parts) for part in xrange(parts)]
+	
+	def seek(self, position):
+		"""
+		Set the absolute index that iteration will continue from.  While
+		iterating, the position attribute is the index of the last string
+		that was returned until the next one is requested, so it can be
+		saved as a checkpoint and passed to this method to resume (and
+		retry the interrupted string) where a previous iteration stopped.
+		
+		@type position: Integer
+		@param position: The index of the next string to generate.
+		"""
+		if not self.start <= position <= self.stop:
+			raise IndexError('position out of range')
+		self.position = position
 	
 	def __iter__(self):
-		length = self.startlen
-		while (length <= self.endlen):
-			for string in itertools.product(self.charset, repeat = length):
-				yield ''.join(string)
-			length += 1
-		raise StopIteration
+		radix = len(self.charset)
+		while self.position < self.stop:
+			length, index = self.__locate__(self.position)
+			digits = self.__digits__(index, length)
+			chars = [self.charset[digit] for digit in digits]
+			remaining = min(self.stop - self.position, (radix ** length) - index)
+			while remaining:
+				yield ''.join(chars)
+				self.position += 1
+				remaining -= 1
+				position = length - 1
+				while position >= 0:
+					digits[position] += 1
+					if digits[position] < radix:
+						chars[position] = self.charset[digits[position]]
+						break
+					digits[position] = 0
+					chars[position] = self.charset[0]
+					position -= 1
+
+class WordList:
+	def __init__(self, path, usehex = False, max_length = None, batch_size = 4096):
+		"""
+		This class is used to iterate over the unique candidates stored in
+		a word list file.  Plain files are memory mapped and files ending
+		in .gz or .bz2 are decompressed as they are read.  Lines are
+		validated and decoded in batches, blank lines are ignored.
+		
+		@type path: String
+		@param path: The path to the word list file.
+		
+		@type usehex: Boolean
+		@param usehex: Whether or not each line is a hex encoded value.
+		
+		@type max_length: Integer or None
+		@param max_length: If set, candidates longer than this are skipped.
+		
+		@type batch_size: Integer
+		@param batch_size: The number of lines to process at a time.
+		"""
+		if not os.path.isfile(path):
+			raise Exception(path + ' is not a file')
+		self.path = path
+		self.usehex = usehex
+		self.max_length = max_length
+		self.batch_size = batch_size
+		self.invalid_lines = []
+		self.skipped = 0
+		self.duplicates = 0
+		self.__count__ = None
+	
+	def __len__(self):
+		"""
+		The number of candidates that will be returned, the first call
+		reads the entire file to validate it and count the candidates.
+		"""
+		if self.__count__ == None:
+			self.invalid_lines = []
+			self.skipped = 0
+			self.duplicates = 0
+			count = 0
+			for candidate in self.candidates(record = True):
+				count += 1
+			self.__count__ = count
+		return self.__count__
+	
+	def __iter__(self):
+		return self.candidates()
+	
+	def open(self):
+		"""
+		Open the word list and return an object that can be iterated over
+		to retreive each line.
+		"""
+		if self.path.endswith('.gz'):
+			return gzip.open(self.path, 'rb')
+		if self.path.endswith('.bz2'):
+			return bz2.BZ2File(self.path, 'r')
+		file_h = open(self.path, 'rb')
+		if os.path.getsize(self.path) == 0:
+			return file_h
+		mapped_h = mmap.mmap(file_h.fileno(), 0, access = mmap.ACCESS_READ)
+		file_h.close()
+		return mapped_h
+	
+	def batches(self):
+		"""
+		Yield lists of tuples of line numbers and stripped lines.
+		"""
+		wordlist_h = self.open()
+		if isinstance(wordlist_h, mmap.mmap):
+			lines = iter(wordlist_h.readline, '')
+		else:
+			lines = wordlist_h
+		batch = []
+		lineno = 0
+		for line in lines:
+			lineno += 1
+			if self.usehex:
+				line = line.strip()
+			else:
+				line = line.rstrip()
+			if not line:
+				continue
+			batch.append((lineno, line))
+			if len(batch) == self.batch_size:
+				yield batch
+				batch = []
+		if batch:
+			yield batch
+		wordlist_h.close()
+	
+	def decode_batch(self, batch, record = False):
+		"""
+		Decode a batch of hex encoded lines.  The whole batch is checked
+		and decoded at once, lines are only handled individually when the
+		batch contains an invalid line.
+		"""
+		lines = [line for lineno, line in batch]
+		joined = ''.join(lines)
+		if not joined.translate(None, string.hexdigits) and not any(len(line) & 1 for line in lines):
+			decoded = unhexlify(joined)
+			candidates = []
+			position = 0
+			for line in lines:
+				length = len(line) >> 1
+				candidates.append(decoded[position:position + length])
+				position += length
+			return candidates
+		candidates = []
+		for lineno, line in batch:
+			if line.translate(None, string.hexdigits) or len(line) & 1:
+				if record:
+					self.invalid_lines.append(lineno)
+				continue
+			candidates.append(unhexlify(line))
+		return candidates
+	
+	def candidates(self, record = False):
+		"""
+		Yield each unique candidate from the word list.
+		
+		@type record: Boolean
+		@param record: Whether or not to record the line numbers of invalid
+		lines and the number of skipped and duplicate candidates.
+		"""
+		seen = set()
+		for batch in self.batches():
+			if self.usehex:
+				batch = self.decode_batch(batch, record)
+			else:
+				batch = [line for lineno, line in batch]
+			for candidate in batch:
+				if self.max_length != None and len(candidate) > self.max_length:
+					if record:
+						self.skipped += 1
+					continue
+				if candidate in seen:
+					if record:
+						self.duplicates += 1
+					continue
+				seen.add(candidate)
+				yield candidate
@@ -0,0 +1,67 @@
+#!/usr/bin/python -B
+#
+#  meter_emulator.py
+#  
+#  Copyright 2013 Spencer J. McIntyre <SMcIntyre [at] SecureState [dot] net>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+import logging
+import time
+from argparse import ArgumentParser
+from c1218.emulator import C1218Emulator
+
+__version__ = '0.1.0'
+
+def main():
+	parser = ArgumentParser(description = 'Termineter: C12.18 Meter Emulator', conflict_handler='resolve')
+	parser.add_argument('-v', '--version', action = 'version', version = parser.prog + ' Version: ' + __version__)
+	parser.add_argument('-L', '--log', dest = 'loglvl', action = 'store', choices = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], default = 'INFO', help = 'set the logging level')
+	parser.add_argument('-t', '--tables', dest = 'tables', action = 'store', default = None, help = 'csv file created by the dump_tables module to serve')
+	parser.add_argument('-l', '--listen', dest = 'listen', action = 'store', default = None, help = 'serve on a tcp host:port instead of a pseudo terminal')
+	parser.add_argument('-p', '--password', dest = 'password', action = 'store', default = None, help = 'password required to write to tables (in hex)')
+	parser.add_argument('--latency', dest = 'latency', action = 'store', type = float, default = 0.0, help = 'seconds to wait before each response')
+	parser.add_argument('--nack-rate', dest = 'nack_rate', action = 'store', type = float, default = 0.0, help = 'probability of answering a valid frame with a nack')
+	parser.add_argument('--crc-error-rate', dest = 'crc_error_rate', action = 'store', type = float, default = 0.0, help = 'probability of sending a frame with an invalid crc')
+	parser.add_argument('--baudrate', dest = 'baudrate', action = 'store', type = int, default = None, help = 'emulate the transmission time at this baud rate')
+	arguments = parser.parse_args()
+	
+	logging.getLogger('').setLevel(logging.DEBUG)
+	console_log_handler = logging.StreamHandler()
+	console_log_handler.setLevel(getattr(logging, arguments.loglvl))
+	console_log_handler.setFormatter(logging.Formatter("%(levelname)-8s %(message)s"))
+	logging.getLogger('').addHandler(console_log_handler)
+	
+	password = arguments.password
+	if password != None:
+		password = password.decode('hex')
+	emulator = C1218Emulator(arguments.tables, password = password, latency = arguments.latency, nack_rate = arguments.nack_rate, crc_error_rate = arguments.crc_error_rate, baudrate = arguments.baudrate)
+	if arguments.listen:
+		host, port = arguments.listen.rsplit(':', 1)
+		device = emulator.start_tcp(host, int(port))
+	else:
+		device = emulator.start_pty()
+	print('Serving ' + str(len(emulator.tables)) + ' tables, set CONNECTION to: ' + device)
+	try:
+		while True:
+			time.sleep(1)
+	except KeyboardInterrupt:
+		pass
+	emulator.stop()
+	logging.shutdown()
+
+if __name__ == '__main__':
+	main()
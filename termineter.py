@@ -19,24 +19,114 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #  MA 02110-1301, USA.
 
+import json
 import logging
+import sys
 from argparse import ArgumentParser
 from framework.interface import InteractiveInterpreter
 
 __version__ = '0.1.0'
 
+EXIT_SUCCESS = 0
+EXIT_MODULE_ERROR = 1
+EXIT_CONFIGURATION_ERROR = 2
+EXIT_CONNECTION_ERROR = 3
+
+def setup_logging(loglvl):
+	logging.getLogger('').setLevel(logging.DEBUG)
+	console_log_handler = logging.StreamHandler()
+	console_log_handler.setLevel(getattr(logging, loglvl))
+	console_log_handler.setFormatter(logging.Formatter("%(levelname)-8s %(message)s"))
+	logging.getLogger('').addHandler(console_log_handler)
+	return console_log_handler
+
+def set_batch_option(option_sets, option):
+	if not '=' in option:
+		raise ValueError('options must be in the format NAME=VALUE')
+	name, value = option.split('=', 1)
+	name = name.upper()
+	for options in option_sets:
+		if name in options:
+			options.setOption(name, value)
+			return
+	raise ValueError('unknown option: ' + name)
+
+def run_batch(args):
+	"""
+	Run a single module without the interactive interface and return an
+	exit status, this is intended for scheduled jobs such as cron.
+	"""
+	from framework.core import Framework
+	from framework.errors import FrameworkRuntimeError
+	from framework.export import ModuleResult, normalize
+	from framework.templates import optical_module_template
+	
+	parser = ArgumentParser(prog = 'termineter.py run', description = 'Termineter: Run a module non-interactively')
+	parser.add_argument('-L', '--log', dest = 'loglvl', action = 'store', choices = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], default = 'CRITICAL', help = 'set the logging level')
+	parser.add_argument('-o', '--option', dest = 'options', action = 'append', default = [], metavar = 'NAME=VALUE', help = 'set a framework or module option')
+	parser.add_argument('--json', dest = 'json', action = 'store_true', default = False, help = 'write the module\'s results to stdout as JSON lines')
+	parser.add_argument('module', action = 'store', help = 'the module to run')
+	arguments = parser.parse_args(args)
+	setup_logging(arguments.loglvl)
+	
+	# with --json stdout is reserved for the results
+	stdout = (sys.stderr if arguments.json else sys.stdout)
+	frmwk = Framework(stdout = stdout, load_modules = False)
+	frmwk.use_colors = stdout.isatty()
+	try:
+		module = frmwk.load_module(arguments.module)
+	except FrameworkRuntimeError:
+		frmwk.print_error('Failed to load module: ' + arguments.module)
+		return EXIT_CONFIGURATION_ERROR
+	frmwk.current_module = module
+	option_sets = (module.options, module.advanced_options, frmwk.options, frmwk.advanced_options)
+	for option in arguments.options:
+		try:
+			set_batch_option(option_sets, option)
+		except Exception as error:
+			frmwk.print_error('Invalid option ' + option + ': ' + str(error))
+			return EXIT_CONFIGURATION_ERROR
+	missing_options = module.get_missing_options()
+	if missing_options:
+		frmwk.print_error('The following options must be set: ' + ', '.join(missing_options))
+		return EXIT_CONFIGURATION_ERROR
+	
+	if isinstance(module, optical_module_template):
+		try:
+			frmwk.serial_connect()
+		except Exception as error:
+			frmwk.print_error('Caught ' + error.__class__.__name__ + ': ' + str(error))
+			return EXIT_CONNECTION_ERROR
+	try:
+		result = frmwk.run(module)
+	except Exception as error:
+		frmwk.logger.exception('caught ' + error.__class__.__name__ + ': ' + str(error))
+		frmwk.print_error('Caught ' + error.__class__.__name__ + ': ' + str(error))
+		return EXIT_MODULE_ERROR
+	finally:
+		frmwk.serial_disconnect()
+	# modules return False when they fail
+	if result == False:
+		return EXIT_MODULE_ERROR
+	if arguments.json and isinstance(result, ModuleResult):
+		for record in result:
+			sys.stdout.write(json.dumps(normalize(record), sort_keys = True) + '\n')
+		sys.stdout.flush()
+	return EXIT_SUCCESS
+
 def main():
-	parser = ArgumentParser(description = 'Termineter: Python Smart Meter Testing Framework', conflict_handler='resolve')
+	if sys.argv[1:2] == ['run']:
+		status = run_batch(sys.argv[2:])
+		logging.shutdown()
+		sys.exit(status)
+	
+	parser = ArgumentParser(description = 'Termineter: Python Smart Meter Testing Framework', conflict_handler='resolve', epilog = 'use "%(prog)s run -h" to run a module non-interactively')
 	parser.add_argument('-v', '--version', action = 'version', version = parser.prog + ' Version: ' + __version__)
 	parser.add_argument('-L', '--log', dest = 'loglvl', action = 'store', choices = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], default = 'CRITICAL', help = 'set the logging level')
 	parser.add_argument('-r', '--rc-file', dest = 'resource_file', action = 'store', default = True, help = 'execute a resource file')
 	arguments = parser.parse_args()
 	
-	logging.getLogger('').setLevel(logging.DEBUG)
-	console_log_handler = logging.StreamHandler()
-	console_log_handler.setLevel(getattr(logging, arguments.loglvl))
-	console_log_handler.setFormatter(logging.Formatter("%(levelname)-8s %(message)s"))
-	logging.getLogger('').addHandler(console_log_handler)
+	console_log_handler = setup_logging(arguments.loglvl)
 	rc_file = arguments.resource_file
 	del arguments, parser
 	